@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+from cachetools import TTLCache
+
+
+class SingleFlightTtlCache:
+    """
+    Thread-safe TTL cache where concurrent misses for the same key wait for a single call of the loader
+    instead of each loading the value themselves.
+    Values of None are returned to the callers of that load but are not cached.
+    """
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.loading: Dict[Hashable, Future] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self.lock:
+            if key in self.cache:
+                return self.cache[key]
+            future = self.loading.get(key)
+            if future is None:
+                future = self.loading[key] = Future()
+                is_loader = True
+            else:
+                is_loader = False
+        if not is_loader:
+            return future.result()
+        try:
+            value = loader()
+        except BaseException as e:
+            with self.lock:
+                if self.loading.get(key) is future:
+                    del self.loading[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            # Only cache the value if the key was not invalidated while it was loading
+            if self.loading.get(key) is future:
+                del self.loading[key]
+                if value is not None:
+                    self.cache[key] = value
+        future.set_result(value)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        with self.lock:
+            self.loading.pop(key, None)
+            self.cache[key] = value
+
+    def invalidate(self, key: Hashable):
+        with self.lock:
+            self.loading.pop(key, None)
+            self.cache.pop(key, None)
@@ -1,8 +1,10 @@
+import os
 from concurrent.futures import ThreadPoolExecutor
 from functools import reduce
 from operator import iconcat
 from typing import List, Iterable, Optional, Callable
 
+from exporter.cache import SingleFlightTtlCache
 from exporter.metadata.resource import MetadataResource
 from exporter.metadata.service import MetadataService
 
@@ -15,11 +17,31 @@ from .link.process import ProcessLink
 from .link.protocol import ProtocolLink
 
 
+# Complete experiment graphs shared by the GraphCrawlers given it, so that the manifest and Terra exporters
+# running in this process crawl the graph of a process version once per TTL
+EXPERIMENT_GRAPH_CACHE = SingleFlightTtlCache(
+    ttl=float(os.environ.get('EXPERIMENT_GRAPH_CACHE_TTL', '60')),
+    maxsize=int(os.environ.get('EXPERIMENT_GRAPH_CACHE_SIZE', '16'))
+)
+
+
 class GraphCrawler:
-    def __init__(self, metadata_service: MetadataService):
+    def __init__(self, metadata_service: MetadataService, graph_cache: SingleFlightTtlCache = None):
         self.metadata_service = metadata_service
+        self.graph_cache = graph_cache
 
     def generate_complete_experiment_graph(self, process: MetadataResource, project: MetadataResource) -> ExperimentGraph:
+        """
+        With a graph_cache the graph may be shared with other callers, so it must not be modified
+        """
+        if self.graph_cache is None:
+            return self._crawl_complete_experiment_graph(process, project)
+        return self.graph_cache.get(
+            (process.uuid, process.dcp_version),
+            lambda: self._crawl_complete_experiment_graph(process, project)
+        )
+
+    def _crawl_complete_experiment_graph(self, process: MetadataResource, project: MetadataResource) -> ExperimentGraph:
         experiment_process_graph = self.generate_experiment_graph(process)
         supplementary_files_graph = self.generate_supplementary_files_graph(project)
 
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, TYPE_CHECKING
+
+from cachetools import TTLCache
+
+from exporter.session_context import SessionContext
+
+if TYPE_CHECKING:
+    from exporter.ingest.service import IngestService
+
+
+@dataclass
+class ExportJobProgress:
+    expected_assays: Optional[int] = field(default=None)
+    confirmed_assays: int = field(default=0)
+    unconfirmed_assays: int = field(default=0)
+
+    def could_be_complete(self) -> bool:
+        if self.expected_assays is None:
+            return True
+        return self.confirmed_assays + self.unconfirmed_assays >= self.expected_assays
+
+
+class ExportJobCompletionTracker:
+    """
+    Aggregates the progress of export jobs from the assays exported by this process.
+    The number of exported entities is only requested from ingest-core when the locally known counts say
+    that a job could be complete, otherwise the check is batched and done at most once every check_interval
+    seconds per job. Assays exported by other replicas are picked up by those checks.
+    """
+    def __init__(self, ingest_service: IngestService, check_interval: float = 30, logger_name: str = __name__):
+        self.ingest_service = ingest_service
+        self.check_interval = check_interval
+        self.logger = SessionContext.register_logger(logger_name)
+        self.jobs: Dict[str, ExportJobProgress] = {}
+        self.completed_jobs = TTLCache(maxsize=1024, ttl=60 * 60)
+        self.lock = threading.RLock()
+        self.stopped = threading.Event()
+        self.checker: Optional[threading.Thread] = None
+
+    def record_exported(self, job_id: str, count: int = 1):
+        with self.lock:
+            if job_id in self.completed_jobs:
+                self.logger.info(f'Export job {job_id} has already been completed')
+                return
+            progress = self.jobs.setdefault(job_id, ExportJobProgress())
+            progress.unconfirmed_assays += count
+            check_now = progress.could_be_complete()
+        if check_now:
+            self.check_job(job_id)
+        else:
+            self.__ensure_checker()
+
+    def check_job(self, job_id: str):
+        with self.lock:
+            progress = self.jobs.get(job_id)
+            if not progress:
+                return
+            unconfirmed = progress.unconfirmed_assays
+            progress.unconfirmed_assays = 0
+        try:
+            if progress.expected_assays is None:
+                progress.expected_assays = self.ingest_service.get_job(job_id).num_expected_assays
+            self.logger.info(f'export_job.num_expected_assays: {progress.expected_assays}')
+            complete_entities = self.ingest_service.get_num_complete_entities_for_job(job_id)
+            self.logger.info(f'complete_entities_for_job: {complete_entities}')
+        except Exception as e:
+            self.logger.error(f'Could not check completion of export job {job_id}, will retry: {str(e) if str(e) else e.__class__.__name__}')
+            with self.lock:
+                progress.unconfirmed_assays += unconfirmed
+            self.__ensure_checker()
+            return
+        with self.lock:
+            if job_id in self.completed_jobs:
+                return
+            progress.confirmed_assays = complete_entities
+            if progress.expected_assays != complete_entities:
+                self.logger.info('job not yet complete')
+                return
+            self.jobs.pop(job_id, None)
+            self.completed_jobs[job_id] = True
+        try:
+            self.ingest_service.complete_job(job_id)
+            self.logger.info('job complete')
+        except Exception as e:
+            self.logger.error(f'Could not complete export job {job_id}, will retry: {str(e) if str(e) else e.__class__.__name__}')
+            with self.lock:
+                self.completed_jobs.pop(job_id, None)
+                self.jobs.setdefault(job_id, progress).unconfirmed_assays += max(unconfirmed, 1)
+            self.__ensure_checker()
+
+    def check_pending_jobs(self):
+        for job_id in self.pending_jobs():
+            self.check_job(job_id)
+
+    def pending_jobs(self) -> List[str]:
+        with self.lock:
+            return [job_id for job_id, progress in self.jobs.items() if progress.unconfirmed_assays > 0]
+
+    def stop(self):
+        self.stopped.set()
+        self.check_pending_jobs()
+
+    def __ensure_checker(self):
+        with self.lock:
+            if self.checker and self.checker.is_alive():
+                return
+            self.checker = threading.Thread(target=self.__run_checks, name='ExportJobCompletionChecker', daemon=True)
+            self.checker.start()
+
+    def __run_checks(self):
+        while not self.stopped.wait(self.check_interval):
+            self.check_pending_jobs()
+            with self.lock:
+                if not self.pending_jobs():
+                    self.checker = None
+                    return
@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import atexit
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import List, Optional, TYPE_CHECKING
+
+from requests import HTTPError
+
+from exporter.ingest.completion import ExportJobCompletionTracker
+from exporter.ingest.export_job import ExportEntity
+from exporter.session_context import SessionContext
+
+if TYPE_CHECKING:
+    from exporter.ingest.service import IngestService
+
+
+@dataclass
+class _PendingEntity:
+    job_id: str
+    entity: ExportEntity
+    written: Future = field(default_factory=Future)
+    attempts: int = 0
+    # time.monotonic() before which a failed entity is not retried
+    not_before: float = 0
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Client errors other than timeouts and rate limiting fail the same way on every attempt
+    """
+    if isinstance(error, HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return not (400 <= status < 500) or status in (408, 429)
+    return True
+
+
+class ExportEntityWriter:
+    """
+    Buffers the ExportEntities of finished assays and writes them to ingest-core in batches,
+    once batch_size entities are waiting or every flush_interval seconds, whichever comes first.
+    ingest-core has no bulk endpoint for export job entities, so a batch is posted by a bounded pool of
+    max_workers concurrent requests. Written entities are reported to the completion tracker.
+    add returns a future that is done once the entity is written, so callers acknowledge the message
+    of an assay only after its entity reached ingest. Failed entities are retried by the flushes after a backoff
+    of retry_backoff seconds, doubled on every attempt, up to max_attempts, and client errors are not retried,
+    after which their future fails.
+    Buffered entities are flushed when the writer is closed, at the latest when the interpreter exits.
+    """
+    def __init__(self, ingest_service: IngestService, completion_tracker: ExportJobCompletionTracker,
+                 batch_size: int = 50, flush_interval: float = 5, max_workers: int = 4, max_attempts: int = 5,
+                 retry_backoff: float = 1, logger_name: str = __name__):
+        self.ingest_service = ingest_service
+        self.completion_tracker = completion_tracker
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.logger = SessionContext.register_logger(logger_name)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ExportEntityWriter')
+        self.buffer: List[_PendingEntity] = []
+        self.condition = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.closed = False
+        self.flusher: Optional[threading.Thread] = None
+
+    def add(self, job_id: str, entity: ExportEntity) -> Future:
+        pending = _PendingEntity(job_id, entity)
+        with self.condition:
+            self.buffer.append(pending)
+            self.__ensure_flusher()
+            if len(self.buffer) >= self.batch_size:
+                self.condition.notify()
+        return pending.written
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Writes the buffered entities that are not waiting for a retry, or all of them once the writer is closed
+        :param timeout: seconds to wait for a flush already in progress, waits indefinitely when None
+        :return: whether the buffer was flushed, False if the flush in progress did not finish in time
+        """
+        if not self.flush_lock.acquire(timeout=-1 if timeout is None else timeout):
+            return False
+        try:
+            with self.condition:
+                if self.closed:
+                    batch, self.buffer = self.buffer, []
+                else:
+                    now = time.monotonic()
+                    batch = [pending for pending in self.buffer if pending.not_before <= now]
+                    self.buffer = [pending for pending in self.buffer if pending.not_before > now]
+            if batch:
+                self.__write_batch(batch)
+        finally:
+            self.flush_lock.release()
+        return True
+
+    def close(self, timeout: float = None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        if self.flusher:
+            self.flusher.join(timeout)
+        self.flush(None if deadline is None else max(deadline - time.monotonic(), 0))
+        with self.condition:
+            unwritten, self.buffer = self.buffer, []
+        if unwritten:
+            self.logger.error(f'Could not write {len(unwritten)} export entities before closing')
+        for pending in unwritten:
+            pending.written.set_exception(RuntimeError('The export entity writer was closed before the entity was written'))
+        self.executor.shutdown(wait=False)
+
+    def __write_batch(self, batch: List[_PendingEntity]):
+        written = Counter()
+        failed = []
+        futures = {
+            self.executor.submit(self.ingest_service.post_export_entity, pending.job_id, pending.entity): pending
+            for pending in batch
+        }
+        for future in as_completed(futures):
+            pending = futures[future]
+            pending.attempts += 1
+            try:
+                future.result()
+            except Exception as e:
+                error = str(e) if str(e) else e.__class__.__name__
+                if is_retryable(e) and pending.attempts < self.max_attempts:
+                    backoff = self.retry_backoff * 2 ** (pending.attempts - 1)
+                    self.logger.warning(f'Could not write export entity for assay {pending.entity.assay_process_id} of '
+                                        f'export job {pending.job_id}, will retry in {backoff} seconds: {error}')
+                    pending.not_before = time.monotonic() + backoff
+                    failed.append(pending)
+                else:
+                    self.logger.error(f'Giving up writing export entity for assay {pending.entity.assay_process_id} of '
+                                      f'export job {pending.job_id} after {pending.attempts} attempts: {error}')
+                    pending.written.set_exception(e)
+                continue
+            written[pending.job_id] += 1
+            pending.written.set_result(pending.entity)
+        if failed:
+            with self.condition:
+                self.buffer[:0] = failed
+        for job_id, count in written.items():
+            self.completion_tracker.record_exported(job_id, count)
+
+    def __ready_count(self) -> int:
+        now = time.monotonic()
+        return sum(1 for pending in self.buffer if pending.not_before <= now)
+
+    def __ensure_flusher(self):
+        if self.closed or (self.flusher and self.flusher.is_alive()):
+            return
+        if not self.flusher:
+            atexit.register(self.close)
+        self.flusher = threading.Thread(target=self.__run_flushes, name='ExportEntityWriter', daemon=True)
+        self.flusher.start()
+
+    def __run_flushes(self):
+        while True:
+            with self.condition:
+                if self.closed:
+                    return
+                # Entities waiting for a retry do not count towards a full batch
+                if self.__ready_count() < self.batch_size:
+                    self.condition.wait(self.flush_interval)
+                if self.closed:
+                    return
+            self.flush()
@@ -1,51 +1,84 @@
+import os
+from concurrent.futures import Future
+from typing import List
+
 from hca_ingest.api.ingestapi import IngestApi
 
+from exporter.cache import SingleFlightTtlCache
+from exporter.ingest.completion import ExportJobCompletionTracker
+from exporter.ingest.entity_writer import ExportEntityWriter
 from exporter.ingest.export_job import ExportEntity, ExportJobState, ExportJob, ExportContextState
+from exporter.metadata.datafile import DataFile
 from exporter.metadata.resource import MetadataResource
 from exporter.session_context import SessionContext
 
+# Export job state shared by every IngestService in this process,
+# so that the handlers see each other's updates to a job and load it once per TTL
+EXPORT_JOB_CACHE = SingleFlightTtlCache(ttl=float(os.environ.get('EXPORT_JOB_CACHE_TTL', '5')))
+
 
 class IngestService:
-    def __init__(self, ingest_client: IngestApi):
+    def __init__(self, ingest_client: IngestApi, completion_check_interval: float = None,
+                 entity_batch_size: int = None, entity_flush_interval: float = None,
+                 job_cache: SingleFlightTtlCache = None):
         self.api = ingest_client
         self.logger = SessionContext.register_logger(__name__)
+        self.job_cache = job_cache if job_cache is not None else EXPORT_JOB_CACHE
+        self.completion_tracker = ExportJobCompletionTracker(
+            self,
+            check_interval=completion_check_interval if completion_check_interval is not None else 30
+        )
+        self.entity_writer = ExportEntityWriter(
+            self,
+            self.completion_tracker,
+            batch_size=entity_batch_size if entity_batch_size is not None else 50,
+            flush_interval=entity_flush_interval if entity_flush_interval is not None else 5
+        )
 
-    def create_export_entity(self, job_id: str, assay_process_id: str):
+    def close(self, timeout: float = None):
+        """
+        :param timeout: seconds to wait for the buffered export entities to be written, waits indefinitely when None
+        """
+        self.entity_writer.close(timeout)
+        self.completion_tracker.stop()
+
+    def create_export_entity(self, job_id: str, assay_process_id: str) -> Future:
+        """
+        Buffers the export entity of the assay, the returned future is done once it is written to ingest
+        """
         assay_export_entity = ExportEntity(assay_process_id, [])
+        return self.entity_writer.add(job_id, assay_export_entity)
+
+    def post_export_entity(self, job_id: str, export_entity: ExportEntity):
         create_export_entity_url = self.get_export_entities_url(job_id)
         self.api.post(
             create_export_entity_url,
-            json=assay_export_entity.to_dict()
+            json=export_entity.to_dict()
         )
-        self._maybe_complete_job(job_id)
-
-    def _maybe_complete_job(self, job_id):
-        export_job = self.get_job(job_id)
-        self.logger.info(f'export_job.num_expected_assays: {export_job.num_expected_assays}')
-        complete_entities_for_job = self.get_num_complete_entities_for_job(job_id)
-        self.logger.info(f'complete_entities_for_job: {complete_entities_for_job}')
-        if export_job.num_expected_assays == complete_entities_for_job:
-            self.complete_job(job_id)
-            self.logger.info('job complete')
-        else:
-            self.logger.info('job not yet complete')
 
     def complete_job(self, job_id: str):
         job_url = self.get_job_url(job_id)
         self.api.patch(job_url, json={"status": ExportJobState.EXPORTED.value})
+        self.job_cache.invalidate(job_id)
+
+    def fail_job(self, job_id: str):
+        job_url = self.get_job_url(job_id)
+        self.api.patch(job_url, json={"status": ExportJobState.FAILED.value})
+        self.job_cache.invalidate(job_id)
 
     def get_job(self, job_id: str) -> ExportJob:
-        job_dict = self.__get_job(job_id)
+        job_dict = self.job_cache.get(job_id, lambda: self.__get_job(job_id))
+        if job_dict is None:
+            job_dict = self.__get_job(job_id)
         return ExportJob(job_dict)
 
     def get_job_if_exists(self, job_id: str):
-        job_url = self.get_job_url(job_id)
-        response = self.api.session.get(job_url, headers=self.api.get_headers())
-        if response.ok:
-            return ExportJob(response.json())
+        job_dict = self.__get_cached_job_if_exists(job_id)
+        if job_dict:
+            return ExportJob(job_dict)
 
     def job_exists_with_submission(self, job_id) -> bool:
-        job_dict = self.__get_job_if_exists(job_id)
+        job_dict = self.__get_cached_job_if_exists(job_id)
         submission_link = self.api.get_link_from_resource(job_dict, "submission")
         return submission_link and not submission_link.endswith('/submissionEnvelopes')
 
@@ -61,6 +94,12 @@ class IngestService:
     def get_submission(self, submission_uuid):
         return self.api.get_submission_by_uuid(submission_uuid)
 
+    def get_submission_data_files(self, submission: dict) -> List[DataFile]:
+        return [
+            DataFile.from_file_metadata(MetadataResource.from_dict(file))
+            for file in self.api.get_related_entities('files', submission, 'files')
+        ]
+
     def get_submission_dcp_version_from_uuid(self, submission_uuid: str) -> str:
         submission = self.get_submission(submission_uuid)
         return self.get_submission_dcp_version(submission)
@@ -83,14 +122,24 @@ class IngestService:
     def set_data_file_transfer(self, export_job_id: str, state: ExportContextState) -> ExportJob:
         return self.__set_export_job_context_state(export_job_id, "dataFileTransfer", state)
 
+    def set_data_file_transfer_progress(self, export_job_id: str, progress: dict) -> ExportJob:
+        job_url = self.get_job_url(export_job_id)
+        job_json = self.api.patch(f'{job_url}/context', json={"dataFileTransferProgress": progress}).json()
+        self.job_cache.put(export_job_id, job_json)
+        return ExportJob(job_json)
+
     def set_spreadsheet_generation(self, export_job_id: str, state: ExportContextState) -> ExportJob:
         return self.__set_export_job_context_state(export_job_id, "spreadsheetGeneration", state)
 
     def __set_export_job_context_state(self, job_id: str, context: str, state: ExportContextState) -> ExportJob:
         job_url = self.get_job_url(job_id)
         job_json = self.api.patch(f'{job_url}/context', json={context: state.value}).json()
+        self.job_cache.put(job_id, job_json)
         return ExportJob(job_json)
 
+    def __get_cached_job_if_exists(self, job_id: str) -> dict:
+        return self.job_cache.get(job_id, lambda: self.__get_job_if_exists(job_id) or None) or {}
+
     def __get_job(self, job_id: str):
         job_url = self.get_job_url(job_id)
         return self.api.get(job_url).json()
@@ -0,0 +1,77 @@
+import signal
+import threading
+import time
+from typing import Any, Callable, List, Tuple
+
+from exporter.session_context import SessionContext
+
+
+class LifecycleManager:
+    """
+    Shuts the exporters down on SIGTERM/SIGINT instead of killing in-flight exports mid-write.
+    Every worker is first asked to stop consuming, then each worker thread is given until the drain deadline
+    to finish the messages it is handling, and finally the buffered publishes and export job updates are flushed.
+    Messages that were not finished by the deadline are not acknowledged and are redelivered by the broker.
+    """
+    def __init__(self, drain_timeout: float = 60, logger_name: str = __name__):
+        self.drain_timeout = drain_timeout
+        self.logger = SessionContext.register_logger(logger_name)
+        self.workers: List[Tuple[str, threading.Thread, Callable[[float], Any]]] = []
+        self.flushes: List[Tuple[str, Callable[[float], Any]]] = []
+        self.stop_requested = threading.Event()
+
+    def add_worker(self, name: str, thread: threading.Thread, stop: Callable[[float], Any]):
+        """
+        :param thread: a daemon thread, so that a worker still running after the drain deadline does not keep
+                       the process alive
+        :param stop: asks the worker to stop consuming and drain within the given number of seconds,
+                     must return without waiting for the drain
+        """
+        self.workers.append((name, thread, stop))
+
+    def add_flush(self, name: str, flush: Callable[[float], Any]):
+        """
+        :param flush: flushes buffered work within the given number of seconds, run in order of registration
+                      after all workers have stopped
+        """
+        self.flushes.append((name, flush))
+
+    def install_signal_handlers(self, signals=(signal.SIGTERM, signal.SIGINT)):
+        for signum in signals:
+            signal.signal(signum, self.__on_signal)
+
+    def run_until_stopped(self, poll_interval: float = 1):
+        self.install_signal_handlers()
+        while not self.stop_requested.wait(poll_interval):
+            if not any(thread.is_alive() for _, thread, _ in self.workers):
+                self.logger.warning('All workers have stopped')
+                break
+        self.shutdown()
+
+    def shutdown(self):
+        deadline = time.monotonic() + self.drain_timeout
+        self.logger.info(f'Shutting down, draining in-flight messages for up to {self.drain_timeout} seconds')
+        for name, _, stop in self.workers:
+            self.__run_step(name, stop, self.__remaining(deadline))
+        for name, thread, _ in self.workers:
+            thread.join(self.__remaining(deadline))
+            if thread.is_alive():
+                self.logger.error(f'{name} did not stop before the drain deadline')
+        for name, flush in self.flushes:
+            self.__run_step(name, flush, self.__remaining(deadline))
+        self.logger.info('Shutdown complete')
+
+    def __on_signal(self, signum, _frame):
+        self.logger.info(f'Received {signal.Signals(signum).name}')
+        self.stop_requested.set()
+
+    def __run_step(self, name: str, step: Callable[[float], Any], timeout: float):
+        try:
+            step(timeout)
+        except Exception as e:
+            self.logger.error(f'Could not stop {name}: {str(e) if str(e) else e.__class__.__name__}')
+            self.logger.exception(e)
+
+    @staticmethod
+    def __remaining(deadline: float) -> float:
+        return max(deadline - time.monotonic(), 0)
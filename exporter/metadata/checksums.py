@@ -1,8 +1,14 @@
+import base64
+import hashlib
 from dataclasses import dataclass
-from typing import Dict
+from typing import Dict, Optional, IO
+
+import crc32c
 
 from exporter.metadata.exceptions import MetadataParseException
 
+CHUNK_SIZE = 1024 * 1024
+
 
 @dataclass
 class FileChecksums:
@@ -11,6 +17,13 @@ class FileChecksums:
     sha1: str
     s3_etag: str
 
+    def crc32c_base64(self) -> Optional[str]:
+        # Cloud Storage reports crc32c as the base64 encoding of its big-endian bytes, ingest as hexadecimal
+        try:
+            return base64.b64encode(bytes.fromhex(str(self.crc32c).zfill(8))).decode()
+        except ValueError:
+            return None
+
     @staticmethod
     def from_dict(data: Dict) -> 'FileChecksums':
         try:
@@ -22,3 +35,29 @@ class FileChecksums:
             return FileChecksums(sha256, crc32c, sha1, s3_etag)
         except (KeyError, TypeError) as e:
             raise MetadataParseException(e) from e
+
+
+class StreamingChecksums:
+    """
+    Computes the sha256, sha1 and crc32c checksums and the size of a file in one pass over chunks of it,
+    so that the file never has to be held in memory.
+    """
+    def __init__(self):
+        self.sha256 = hashlib.sha256()
+        self.sha1 = hashlib.sha1()
+        self.crc32c = 0
+        self.size = 0
+
+    def update(self, data: bytes):
+        self.sha256.update(data)
+        self.sha1.update(data)
+        self.crc32c = crc32c.crc32c(data, self.crc32c)
+        self.size += len(data)
+
+    def read(self, stream: IO[bytes], chunk_size: int = CHUNK_SIZE) -> 'StreamingChecksums':
+        while chunk := stream.read(chunk_size):
+            self.update(chunk)
+        return self
+
+    def file_checksums(self, s3_etag: str = None) -> FileChecksums:
+        return FileChecksums(self.sha256.hexdigest(), f'{self.crc32c:08x}', self.sha1.hexdigest(), s3_etag)
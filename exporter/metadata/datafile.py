@@ -21,6 +21,16 @@ class DataFile:
     def source_key(self) -> str:
         return self.cloud_url.split("//")[1].split("/", 1)[1]
 
+    @staticmethod
+    def data_file_uuid(file_metadata: MetadataResource) -> str:
+        """
+        The uuid of the data file of file_metadata, without parsing the rest of the DataFile
+        """
+        try:
+            return file_metadata.full_resource["dataFileUuid"]
+        except (KeyError, TypeError) as e:
+            raise MetadataParseException(e)
+
     @staticmethod
     def from_file_metadata(file_metadata: MetadataResource) -> 'DataFile':
         if file_metadata.full_resource is not None:
@@ -1,24 +1,34 @@
 from copy import deepcopy
-from typing import List
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Tuple
 
 from exporter.metadata.resource import MetadataResource
 
 
 class MetadataNodeSet:
-
+    """
+    Nodes of a metadata graph, unique by uuid, in insertion order and indexed by metadata type.
+    get_nodes returns copies that callers may modify, nodes_of_type and nodes_by_type return the nodes themselves,
+    which callers must not modify.
+    """
     def __init__(self):
         self.obj_uuids = set()
         self.objs = []
+        self.objs_by_type: Dict[str, List[MetadataResource]] = {}
 
     def __contains__(self, item: MetadataResource):
         return item.uuid in self.obj_uuids
 
+    def __len__(self):
+        return len(self.objs)
+
     def add_node(self, node: MetadataResource):
         if node.uuid in self.obj_uuids:
             pass
         else:
             self.obj_uuids.add(node.uuid)
             self.objs.append(node)
+            self.objs_by_type.setdefault(node.metadata_type, []).append(node)
 
     def add_nodes(self, nodes: List[MetadataResource]):
         for node in nodes:
@@ -26,3 +36,9 @@ class MetadataNodeSet:
 
     def get_nodes(self) -> List[MetadataResource]:
         return [deepcopy(obj) for obj in self.objs]
+
+    def nodes_of_type(self, metadata_type: str) -> Tuple[MetadataResource, ...]:
+        return tuple(self.objs_by_type.get(metadata_type, ()))
+
+    def nodes_by_type(self) -> Mapping[str, Tuple[MetadataResource, ...]]:
+        return MappingProxyType({metadata_type: tuple(nodes) for metadata_type, nodes in self.objs_by_type.items()})
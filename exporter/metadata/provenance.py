@@ -1,5 +1,7 @@
 import re
 from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Optional, Tuple
 
 from packaging import version
 
@@ -55,19 +57,27 @@ class MetadataProvenance:
             submission_date = data['submissionDate']
             update_date = data['updateDate']
 
-            # Populate the major and minor schema versions from the URL in the describedBy field
-            schema_semver = re.findall(r'\d+\.\d+\.\d+', data["content"]["describedBy"])[0]
-            concrete_type = data['content']['describedBy'].rsplit('/', 1)[-1]
-            version_with_schema_fields = SCHEMA_VERSIONS_WITHOUT_SCHEMA_FIELDS.get(concrete_type)
-            if MetadataProvenance.version_has_schema_fields(schema_semver, version_with_schema_fields):
-                schema_major_version, schema_minor_version = [int(x) for x in schema_semver.split(".")][:2]
-                return MetadataProvenance(uuid, submission_date, update_date, schema_major_version,
-                                          schema_minor_version)
-            else:
-                return MetadataProvenance(uuid, submission_date, update_date)
+            schema_major_version, schema_minor_version = MetadataProvenance.schema_versions(data['content']['describedBy'])
+            return MetadataProvenance(uuid, submission_date, update_date, schema_major_version, schema_minor_version)
         except (KeyError, TypeError) as e:
             raise MetadataParseException(e)
 
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def schema_versions(described_by: str) -> Tuple[Optional[int], Optional[int]]:
+        """
+        The major and minor schema versions from the URL in the describedBy field,
+        or None for schema versions older than the provenance schema fields.
+        A few dozen schema URLs are shared by every entity, so they are parsed once each.
+        """
+        schema_semver = re.findall(r'\d+\.\d+\.\d+', described_by)[0]
+        concrete_type = described_by.rsplit('/', 1)[-1]
+        version_with_schema_fields = SCHEMA_VERSIONS_WITHOUT_SCHEMA_FIELDS.get(concrete_type)
+        if MetadataProvenance.version_has_schema_fields(schema_semver, version_with_schema_fields):
+            schema_major_version, schema_minor_version = [int(x) for x in schema_semver.split(".")][:2]
+            return schema_major_version, schema_minor_version
+        return None, None
+
     @staticmethod
     def version_has_schema_fields(schema_semver, version_with_schema_fields):
         return not version_with_schema_fields or version.parse(schema_semver) >= version.parse(
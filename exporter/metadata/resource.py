@@ -1,4 +1,6 @@
+import re
 from dataclasses import dataclass, field, asdict
+from functools import lru_cache
 from typing import Dict
 
 from hca_ingest.utils.date import parse_date_string
@@ -7,6 +9,8 @@ from exporter.metadata.exceptions import MetadataParseException
 from exporter.metadata.provenance import MetadataProvenance
 
 DCP_VERSION_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+# The UTC timestamps ingest returns, with up to 6 decimal places of seconds
+INGEST_DATE_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})(?:\.(\d{1,6}))?Z')
 
 
 @dataclass
@@ -40,7 +44,16 @@ class MetadataResource:
             raise MetadataParseException(e) from e
 
     @staticmethod
+    @lru_cache(maxsize=65536)
     def to_dcp_version(date_str: str):
+        """
+        Normalizes the timestamps ingest returns by padding their fractional seconds,
+        falling back to parsing dates in other formats
+        """
+        match = INGEST_DATE_PATTERN.fullmatch(date_str)
+        if match:
+            date_time, fraction = match.groups()
+            return f'{date_time}.{(fraction or "").ljust(6, "0")}Z'
         date = parse_date_string(date_str)
         return date.strftime(DCP_VERSION_FORMAT)
 
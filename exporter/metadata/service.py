@@ -1,51 +1,90 @@
-from typing import List, Dict
+import json
+from typing import Callable, Dict, List, Optional
 
 from hca_ingest.api.ingestapi import IngestApi
 
 from exporter.metadata.resource import MetadataResource
 
+try:
+    import orjson
+    json_loads: Callable = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# The links of entities that are followed after parsing them, the other links of batch parsed entities are dropped
+FOLLOWED_LINKS = frozenset({
+    'self', 'projects', 'derivedByProcesses', 'inputToProcesses', 'derivedBiomaterials', 'derivedFiles',
+    'inputBiomaterials', 'inputFiles', 'protocols', 'supplementaryFiles'
+})
+
 
 class MetadataService:
 
-    def __init__(self, ingest_client: IngestApi):
+    def __init__(self, ingest_client: IngestApi, batch_pages: bool = False):
+        """
+        With batch_pages, pages of related entities are fetched and decoded here, with orjson when it is installed,
+        and parsed a page at a time, rather than parsing the entities IngestApi yields one at a time
+        """
         self.ingest_client = ingest_client
+        self.batch_pages = batch_pages
 
     def fetch_resource(self, resource_link: str) -> MetadataResource:
         raw_metadata = self.ingest_client.get_entity_by_callback_link(resource_link)
         return MetadataResource.from_dict(raw_metadata)
 
     def get_derived_by_processes(self, experiment_material: MetadataResource) -> List[MetadataResource]:
-        return MetadataService.parse_metadata_resources(
-            self.ingest_client.get_related_entities('derivedByProcesses', experiment_material.full_resource,
-                                                    'processes'))
+        return self.get_related_resources('derivedByProcesses', experiment_material, 'processes')
 
     def get_input_to_processes(self, experiment_material: MetadataResource) -> List[MetadataResource]:
-        return MetadataService.parse_metadata_resources(
-            self.ingest_client.get_related_entities('inputToProcesses', experiment_material.full_resource, 'processes'))
+        return self.get_related_resources('inputToProcesses', experiment_material, 'processes')
 
     def get_derived_biomaterials(self, process: MetadataResource) -> List[MetadataResource]:
-        return MetadataService.parse_metadata_resources(
-            self.ingest_client.get_related_entities('derivedBiomaterials', process.full_resource, 'biomaterials'))
+        return self.get_related_resources('derivedBiomaterials', process, 'biomaterials')
 
     def get_derived_files(self, process: MetadataResource) -> List[MetadataResource]:
-        return MetadataService.parse_metadata_resources(
-            self.ingest_client.get_related_entities('derivedFiles', process.full_resource, 'files'))
+        return self.get_related_resources('derivedFiles', process, 'files')
 
     def get_input_biomaterials(self, process: MetadataResource) -> List[MetadataResource]:
-        return MetadataService.parse_metadata_resources(
-            self.ingest_client.get_related_entities('inputBiomaterials', process.full_resource, 'biomaterials'))
+        return self.get_related_resources('inputBiomaterials', process, 'biomaterials')
 
     def get_input_files(self, process: MetadataResource) -> List[MetadataResource]:
-        return MetadataService.parse_metadata_resources(
-            self.ingest_client.get_related_entities('inputFiles', process.full_resource, 'files'))
+        return self.get_related_resources('inputFiles', process, 'files')
 
     def get_protocols(self, process: MetadataResource) -> List[MetadataResource]:
-        return MetadataService.parse_metadata_resources(
-            self.ingest_client.get_related_entities('protocols', process.full_resource, 'protocols'))
+        return self.get_related_resources('protocols', process, 'protocols')
 
     def get_supplementary_files(self, metadata: MetadataResource) -> List[MetadataResource]:
-        return MetadataService.parse_metadata_resources(
-            self.ingest_client.get_related_entities('supplementaryFiles', metadata.full_resource, 'files'))
+        return self.get_related_resources('supplementaryFiles', metadata, 'files')
+
+    def get_related_resources(self, relation: str, metadata: MetadataResource, entity_type: str) -> List[MetadataResource]:
+        if not self.batch_pages:
+            return MetadataService.parse_metadata_resources(
+                self.ingest_client.get_related_entities(relation, metadata.full_resource, entity_type))
+        relation_link = metadata.full_resource['_links'].get(relation)
+        if not relation_link:
+            return []
+        resources = []
+        page = self.__get_page(relation_link['href'], params={'size': self.ingest_client.page_size})
+        while page:
+            resources.extend(MetadataService.parse_metadata_page(page, entity_type))
+            next_link = page['_links'].get('next')
+            page = self.__get_page(next_link['href']) if next_link else None
+        return resources
+
+    def __get_page(self, url: str, **kwargs) -> Dict:
+        return json_loads(self.ingest_client.get(url, **kwargs).content)
+
+    @staticmethod
+    def parse_metadata_page(page: Dict, entity_type: str) -> List[MetadataResource]:
+        """
+        Parses the entities embedded in a page of entity_type, keeping only the FOLLOWED_LINKS of each
+        """
+        entities = page.get('_embedded', {}).get(entity_type, [])
+        for entity in entities:
+            links: Optional[Dict] = entity.get('_links')
+            if links:
+                entity['_links'] = {name: links[name] for name in FOLLOWED_LINKS.intersection(links)}
+        return MetadataService.parse_metadata_resources(entities)
 
     @staticmethod
     def parse_metadata_resources(metadata_resources: List[Dict]) -> List[MetadataResource]:
@@ -27,7 +27,10 @@ class QueueConfig:
         return Queue(self.name, exchange, self.routing_key, queue_arguments=self.queue_arguments)
 
     def send_message(self, producer: Producer, body: dict):
-        producer.publish(
+        """
+        Returns what the producer returns, a future of the publication for a QueuePublisher
+        """
+        return producer.publish(
             body,
             exchange=self.exchange,
             routing_key=self.routing_key,
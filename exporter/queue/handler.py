@@ -1,7 +1,9 @@
 from abc import ABC
+from typing import Union
 
 from kombu import Message, Producer
 
+from exporter.queue.publisher import QueuePublisher
 from exporter.session_context import SessionContext
 
 
@@ -16,6 +18,6 @@ class MessageHandler(ABC):
     def handle_message(self, body: dict, msg: Message):
         pass
 
-    def add_producer(self, producer: Producer):
+    def add_producer(self, producer: Union[Producer, QueuePublisher]):
         self.logger.info(f'Running Listener')
         self.producer = producer
@@ -1,42 +1,94 @@
 import json
-from concurrent.futures import ThreadPoolExecutor
-from typing import Type, List
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Type, List, Set
 
 from kombu import Connection, Consumer, Message
 from kombu.mixins import ConsumerProducerMixin
 
 from exporter.queue.config import QueueConfig
 from exporter.queue.handler import MessageHandler
+from exporter.queue.publisher import QueuePublisher
+from exporter.session_context import SessionContext
 
 
 class QueueListener(ConsumerProducerMixin):
-    def __init__(self, watch_queue: QueueConfig, handler: MessageHandler, executor: ThreadPoolExecutor = None):
+    def __init__(self, watch_queue: QueueConfig, handler: MessageHandler, executor: ThreadPoolExecutor = None,
+                 publisher: QueuePublisher = None, prefetch_count: int = 1):
         self.connection = None
         self.watch_queue = watch_queue
         self.handler = handler
         self.executor = executor if executor else ThreadPoolExecutor()
+        self.publisher = publisher
+        self.prefetch_count = prefetch_count
+        self.logger = SessionContext.register_logger(__name__)
+        self.in_flight: Set[Future] = set()
+        self.in_flight_lock = threading.Lock()
+        self.drain_timeout = None
 
     def add_connection(self, connection: Connection):
         self.connection = connection
-        self.handler.add_producer(self.producer)
+        self.handler.add_producer(self.publisher if self.publisher else self.producer)
 
     def get_consumers(self, _consumer: Type[Consumer], channel) -> List[Consumer]:
         experiment_consumer = _consumer(
             [self.watch_queue.queue_from_config()],
             callbacks=[self.experiment_message_handler],
-            prefetch_count=1
+            prefetch_count=self.prefetch_count
         )
         return [experiment_consumer]
 
     def experiment_message_handler(self, body: str, msg: Message):
-        return self.executor.submit(lambda: self.try_handle_or_reject(body, msg))
+        future = self.executor.submit(lambda: self.try_handle_or_reject(body, msg))
+        self.__track(future)
+        return future
+
+    def stop(self, drain_timeout: float = None):
+        """
+        Stops consuming new messages. Messages already being handled are given drain_timeout seconds to finish
+        before the connection is closed, so that their acknowledgements reach the broker.
+        """
+        self.drain_timeout = drain_timeout
+        self.should_stop = True
+
+    def drain(self, timeout: float = None) -> bool:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            # Handled messages may still be waiting to be settled, which adds to the in-flight futures
+            with self.in_flight_lock:
+                in_flight = set(self.in_flight)
+            if not in_flight:
+                return True
+            self.logger.info(f'Waiting for {len(in_flight)} in-flight messages to be handled')
+            remaining = max(deadline - time.monotonic(), 0) if deadline is not None else None
+            _, not_done = wait(in_flight, remaining)
+            if not_done:
+                self.logger.error(f'{len(not_done)} in-flight messages were not handled before the drain deadline')
+                return False
+
+    def on_consume_end(self, connection, channel):
+        self.drain(self.drain_timeout)
+        super().on_consume_end(connection, channel)
+
+    def __track(self, future: Future):
+        with self.in_flight_lock:
+            self.in_flight.add(future)
+        future.add_done_callback(self.__on_handled)
+
+    def __on_handled(self, future: Future):
+        with self.in_flight_lock:
+            self.in_flight.discard(future)
 
     def try_handle_or_reject(self, body: str, msg: Message):
         json_body: dict = json.loads(body)
         with self.handler.set_context(json_body) as s:
             s.logger.info(f'Message received')
             try:
-                self.handler.handle_message(json_body, msg)
+                settled = self.handler.handle_message(json_body, msg)
+                if isinstance(settled, Future):
+                    # The handler settles the message later, keep it in flight until then
+                    self.__track(settled)
             except Exception as e:
                 s.logger.error(f"Rejecting message: {body} due to error: {str(e) if str(e) else e.__class__.__name__}")
                 msg.reject(requeue=False)
@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import Future
+from queue import Full, Queue
+from typing import List
+
+from kombu import Connection, Producer
+
+from exporter.session_context import SessionContext
+
+_STOP = object()
+
+
+class QueuePublisher:
+    """
+    Publishes messages on behalf of any number of handler threads.
+    Messages are placed on a bounded outbound buffer, publish() blocks while the buffer is full,
+    and are published by a pool of publisher threads that each own their connection and Producer,
+    since kombu connections and channels must not be shared between threads.
+    With confirm_publish the broker confirms each message before the publisher thread moves on.
+    publish returns a future that is done once the message is published, or fails once max_attempts
+    attempts failed, so callers acknowledge the message they are responding to only after its response is sent.
+    Implements Producer.publish, so it can be given to handlers in place of a Producer.
+    """
+    def __init__(self, broker_url: str, workers: int = 1, max_buffer: int = 1000, confirm_publish: bool = False,
+                 max_attempts: int = 3, retry_interval: float = 1, logger_name: str = __name__):
+        self.broker_url = broker_url
+        self.workers = workers
+        self.confirm_publish = confirm_publish
+        self.max_attempts = max_attempts
+        self.retry_interval = retry_interval
+        self.logger = SessionContext.register_logger(logger_name)
+        self.buffer = Queue(maxsize=max_buffer)
+        self.pending = 0
+        self.pending_changed = threading.Condition()
+        self.threads: List[threading.Thread] = []
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def publish(self, body, **kwargs) -> Future:
+        self.__ensure_started()
+        published = Future()
+        with self.pending_changed:
+            self.pending += 1
+        self.buffer.put((body, kwargs, published))
+        return published
+
+    def flush(self, timeout: float = None) -> bool:
+        with self.pending_changed:
+            return self.pending_changed.wait_for(lambda: self.pending == 0, timeout)
+
+    def close(self, timeout: float = None) -> bool:
+        flushed = self.flush(timeout)
+        with self.lock:
+            self.closed = True
+            for _ in self.threads:
+                try:
+                    self.buffer.put_nowait(_STOP)
+                except Full:
+                    # The buffer is only full when the broker is unavailable, the daemon threads are not waited for
+                    break
+        if not flushed:
+            self.logger.error(f'Closing publisher with {self.pending} messages not yet published')
+        return flushed
+
+    def __ensure_started(self):
+        with self.lock:
+            if self.closed:
+                raise RuntimeError('Cannot publish, the publisher has been closed')
+            alive = [thread for thread in self.threads if thread.is_alive()]
+            if self.threads and len(alive) < self.workers:
+                self.logger.warning(f'Restarting {self.workers - len(alive)} stopped publisher threads')
+            # Threads that stopped on an unexpected error are replaced, so that buffered messages are still published
+            self.threads = alive
+            for i in range(len(alive), self.workers):
+                thread = threading.Thread(target=self.__run, name=f'QueuePublisher-{i}', daemon=True)
+                thread.start()
+                self.threads.append(thread)
+
+    def __run(self):
+        try:
+            self.__publish_buffered()
+        except Exception as e:
+            # Replaced by the next publish
+            self.logger.error(f'Publisher thread stopped due to error: {str(e) if str(e) else e.__class__.__name__}')
+
+    def __publish_buffered(self):
+        transport_options = {'confirm_publish': True} if self.confirm_publish else {}
+        with Connection(self.broker_url, transport_options=transport_options) as connection:
+            producer = Producer(connection)
+            while True:
+                item = self.buffer.get()
+                if item is _STOP:
+                    return
+                body, kwargs, published = item
+                try:
+                    self.__publish(producer, body, kwargs)
+                    published.set_result(None)
+                except Exception as e:
+                    self.logger.error(f'Could not publish message: {body} after {self.max_attempts} attempts '
+                                      f'due to error: {str(e) if str(e) else e.__class__.__name__}')
+                    published.set_exception(e)
+                finally:
+                    with self.pending_changed:
+                        self.pending -= 1
+                        self.pending_changed.notify_all()
+
+    def __publish(self, producer: Producer, body, kwargs: dict):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                return producer.publish(body, **kwargs)
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    raise
+                self.logger.warning(f'Could not publish message, attempt {attempt} of {self.max_attempts}: '
+                                    f'{str(e) if str(e) else e.__class__.__name__}')
+                time.sleep(self.retry_interval * attempt)
@@ -6,6 +6,10 @@ class UploadPollingException(Exception):
     pass
 
 
+class UploadVerificationException(Exception):
+    pass
+
+
 class ExperimentMessageParseException(Exception):
     pass
 
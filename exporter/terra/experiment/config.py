@@ -5,12 +5,14 @@ from hca_ingest.api.ingestapi import IngestApi
 from hca_ingest.utils.s2s_token_client import ServiceCredential, S2STokenClient
 from hca_ingest.utils.token_manager import TokenManager
 
-from exporter.graph.crawler import GraphCrawler
+from exporter.graph.crawler import EXPERIMENT_GRAPH_CACHE, GraphCrawler
 from exporter.ingest.service import IngestService
+from exporter.lifecycle import LifecycleManager
 from exporter.metadata.service import MetadataService
 from exporter.queue.config import QueueConfig, AmqpConnConfig
 from exporter.queue.connector import QueueConnector
 from exporter.queue.listener import QueueListener
+from exporter.queue.publisher import QueuePublisher
 from exporter.schema.service import SchemaService
 from exporter.terra.config import TerraConfig
 from exporter.terra.storage import TerraStorageClient
@@ -45,7 +47,7 @@ EXPERIMENT_COMPLETE_CONFIG = QueueConfig(
 )
 
 
-def setup_terra_experiment_exporter() -> Thread:
+def setup_terra_experiment_exporter(lifecycle: LifecycleManager = None) -> Thread:
     rabbit_host = os.environ.get('RABBIT_HOST', 'localhost')
     rabbit_port = int(os.environ.get('RABBIT_PORT', '5672'))
     amqp_conn_config = AmqpConnConfig(rabbit_host, rabbit_port)
@@ -53,25 +55,42 @@ def setup_terra_experiment_exporter() -> Thread:
     ingest_client = new_ingest_client()
 
     metadata_service_page_size = int(os.environ.get('METADATA_SERVICE_PAGE_SIZE', '20'))
-    metadata_service = MetadataService(new_ingest_client(page_size=metadata_service_page_size))
+    metadata_batch_pages = os.environ.get('METADATA_BATCH_PAGES', 'true').lower() == 'true'
+    metadata_service = MetadataService(new_ingest_client(page_size=metadata_service_page_size), batch_pages=metadata_batch_pages)
 
     schema_service = SchemaService(ingest_client)
-    graph_crawler = GraphCrawler(metadata_service)
+    graph_crawler = GraphCrawler(metadata_service, EXPERIMENT_GRAPH_CACHE)
 
     gcp_config = GcpConfig.from_env()
     gcs_storage = GcsStorage(gcp_config.gcp_project, gcp_config.gcp_credentials_path, LOGGER_NAME)
     terra_config = TerraConfig.from_env()
     terra_client = TerraStorageClient(gcs_storage, schema_service, terra_config.terra_bucket_name, terra_config.terra_bucket_prefix, LOGGER_NAME)
-    ingest_service = IngestService(ingest_client)
+    completion_check_interval = float(os.environ.get('EXPORT_JOB_COMPLETION_CHECK_INTERVAL', '30'))
+    entity_batch_size = int(os.environ.get('EXPORT_ENTITY_BATCH_SIZE', '50'))
+    entity_flush_interval = float(os.environ.get('EXPORT_ENTITY_FLUSH_INTERVAL', '5'))
+    ingest_service = IngestService(
+        ingest_client,
+        completion_check_interval=completion_check_interval,
+        entity_batch_size=entity_batch_size,
+        entity_flush_interval=entity_flush_interval
+    )
     terra_exporter = TerraExperimentExporter(ingest_service, graph_crawler, terra_client, LOGGER_NAME)
 
     handler = TerraExperimentHandler(terra_exporter, ingest_service, EXPERIMENT_COMPLETE_CONFIG, LOGGER_NAME)
-    listener = QueueListener(EXPERIMENT_QUEUE_CONFIG, handler)
+    publish_confirms = os.environ.get('RABBIT_PUBLISH_CONFIRMS', 'false').lower() == 'true'
+    publisher = QueuePublisher(amqp_conn_config.broker_url(), confirm_publish=publish_confirms, logger_name=LOGGER_NAME)
+    # Messages are acknowledged once their export entity is written, allow a batch of them to be unacknowledged
+    prefetch_count = int(os.environ.get('EXPERIMENT_PREFETCH', str(entity_batch_size)))
+    listener = QueueListener(EXPERIMENT_QUEUE_CONFIG, handler, publisher=publisher, prefetch_count=prefetch_count)
     connector = QueueConnector(amqp_conn_config, listener)
 
-    terra_exporter_listener_process = Thread(target=lambda: connector.run())
+    terra_exporter_listener_process = Thread(target=lambda: connector.run(), daemon=True)
     terra_exporter_listener_process.start()
 
+    if lifecycle:
+        lifecycle.add_worker(LOGGER_NAME, terra_exporter_listener_process, listener.stop)
+        lifecycle.add_flush(f'{LOGGER_NAME} publisher', publisher.close)
+        lifecycle.add_flush(f'{LOGGER_NAME} export job updates', ingest_service.close)
     return terra_exporter_listener_process
 
 
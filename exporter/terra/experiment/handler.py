@@ -1,3 +1,6 @@
+from concurrent.futures import Future
+from typing import Optional
+
 from kombu import Message
 
 from exporter.ingest.service import IngestService
@@ -42,7 +45,40 @@ class TerraExperimentHandler(MessageHandler):
         self.logger.info(f'Received experiment export message.')
         self.experiment_exporter.export(exp.process_uuid)
         self.logger.info('Experiment export finished, informing ingest')
-        self.ingest_service.create_export_entity(exp.job_id, exp.process_id)
-        self.publish_queue.send_message(self.producer, body)
-        self.logger.info(f'Acknowledging experiment export message')
-        msg.ack()
+        written = self.ingest_service.create_export_entity(exp.job_id, exp.process_id)
+        # The message is only settled once the export entity has been written by the batching entity writer
+        settled = Future()
+        written.add_done_callback(lambda f: self.__on_entity_written(f, body, msg, settled))
+        return settled
+
+    def __on_entity_written(self, written: Future, body: dict, msg: Message, settled: Future):
+        with self.set_context(body):
+            try:
+                written.result()
+                published = self.publish_queue.send_message(self.producer, body)
+            except Exception as e:
+                return self.__reject(msg, settled, 'the export entity was not written', e)
+        if isinstance(published, Future):
+            published.add_done_callback(lambda f: self.__on_published(f, body, msg, settled))
+        else:
+            self.__on_published(None, body, msg, settled)
+
+    def __on_published(self, published: Optional[Future], body: dict, msg: Message, settled: Future):
+        with self.set_context(body):
+            try:
+                if published:
+                    published.result()
+            except Exception as e:
+                return self.__reject(msg, settled, 'the export notification was not published', e)
+            self.logger.info(f'Acknowledging experiment export message')
+            try:
+                msg.ack()
+            finally:
+                settled.set_result(None)
+
+    def __reject(self, msg: Message, settled: Future, reason: str, error: Exception):
+        self.logger.error(f'Rejecting experiment export message, {reason}: {str(error) if str(error) else error.__class__.__name__}')
+        try:
+            msg.reject(requeue=False)
+        finally:
+            settled.set_result(None)
@@ -1,43 +1,156 @@
+import base64
 import json
 import logging
+import math
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from io import BufferedReader, StringIO
 from time import sleep
-from typing import Union, IO, Any
+from typing import Union, IO, Any, Callable, Dict, List, Optional
 
-from google.api_core.exceptions import PreconditionFailed, ServiceUnavailable
+import crc32c
+from google.api_core.exceptions import NotFound, PreconditionFailed, ServiceUnavailable
 from google.api_core.retry import Retry, if_exception_type
 from google.cloud.storage import Client, Blob, Bucket
 from google.oauth2.service_account import Credentials
 
-from exporter.terra.exceptions import UploadPollingException
+from exporter.terra.exceptions import UploadPollingException, UploadVerificationException
 
 Streamable = Union[BufferedReader, StringIO, IO[Any]]
 
+# Cloud Storage composes at most 32 objects in one request
+MAX_COMPOSE_SOURCES = 32
+
 
 class GcsStorage:
-    def __init__(self, project_id: str, credentials_path: str, logger_name: str = __name__):
+    def __init__(self, project_id: str, credentials_path: str, logger_name: str = __name__,
+                 composite_threshold: int = 64 * 1024 * 1024, composite_part_size: int = 16 * 1024 * 1024,
+                 composite_workers: int = 8, throttle: Callable[[], Any] = None):
         with open(credentials_path) as source:
             info = json.load(source)
         credentials: Credentials = Credentials.from_service_account_info(info)
         self.client = Client(project=project_id, credentials=credentials)
         self.logger = logging.getLogger(logger_name)
+        # Files from composite_threshold bytes are overwritten by a composite upload of parts uploaded in parallel
+        self.composite_threshold = composite_threshold
+        self.composite_part_size = composite_part_size
+        self.composite_workers = composite_workers
+        # Called before every Cloud Storage request when given, e.g. to rate limit them
+        self.throttle = throttle
 
     def write(self, bucket_name: str, key: str, data_stream: Streamable, overwrite=False):
         bucket: Bucket = self.client.bucket(bucket_name)
         blob: Blob = bucket.blob(key, chunk_size=1024 * 256 * 20)
-        if overwrite:
+        if overwrite and self.__composite_size(data_stream) >= self.composite_threshold:
+            self.write_composite(bucket, blob, data_stream.name)
+        elif overwrite:
             self.__overwrite(blob, data_stream)
         else:
             self.__write(blob, data_stream)
 
+    def write_composite(self, bucket: Bucket, blob: Blob, path: str):
+        """
+        Uploads the file in parts concurrently and composes them into the blob, replacing it in one step.
+        The parts are deleted whether or not the upload succeeds, and the blob is only marked complete
+        once its size and crc32c match the file.
+        """
+        size = os.path.getsize(path)
+        part_size = max(self.composite_part_size, math.ceil(size / MAX_COMPOSE_SOURCES))
+        offsets = range(0, size, part_size)
+        upload_id = uuid.uuid4().hex
+        parts: List[Blob] = [bucket.blob(f'{blob.name}.part-{upload_id}-{index}') for index in range(len(offsets))]
+        self.logger.info(f'Uploading {blob.name} in {len(parts)} parts')
+        try:
+            with ThreadPoolExecutor(max_workers=self.composite_workers) as executor:
+                uploads = [
+                    executor.submit(self.__upload_part, part, path, offset, min(part_size, size - offset))
+                    for part, offset in zip(parts, offsets)
+                ]
+                file_crc32c = executor.submit(self.__file_crc32c, path)
+                for upload in uploads:
+                    upload.result()
+            # Compose sets the content type of the blob from the request, it is not kept from the replaced object
+            blob.content_type = blob.content_type or 'application/octet-stream'
+            self.__request(blob.compose, parts)
+        finally:
+            for part in parts:
+                self.__delete_blob(part)
+        if blob.size != size or blob.crc32c != file_crc32c.result():
+            raise UploadVerificationException(f'Composed blob {blob.name} does not match {path}: '
+                                              f'{blob.size} bytes with crc32c {blob.crc32c}, '
+                                              f'expected {size} bytes with crc32c {file_crc32c.result()}')
+        self.__mark_complete(blob)
+
+    def delete(self, bucket_name: str, key: str):
+        self.__delete_blob(self.client.bucket(bucket_name).blob(key))
+
+    def read_json(self, bucket_name: str, key: str) -> Optional[Dict]:
+        blob: Blob = self.__request(self.client.bucket(bucket_name).get_blob, key)
+        return json.loads(self.__request(blob.download_as_bytes)) if blob else None
+
+    def get_crc32c(self, bucket_name: str, key: str) -> Optional[str]:
+        """
+        :return: the base64 crc32c checksum of the object, None if it does not exist
+        """
+        blob: Blob = self.__request(self.client.bucket(bucket_name).get_blob, key)
+        return blob.crc32c if blob else None
+
+    def list_crc32c(self, bucket_name: str, prefix: str) -> Dict[str, str]:
+        """
+        :return: the base64 crc32c checksum of every object under the prefix, by object name relative to the prefix
+        """
+        blobs = self.client.list_blobs(bucket_name, prefix=prefix, fields='items(name,crc32c),nextPageToken')
+        crc32c_by_name = {}
+        # Each page is fetched by its own request
+        pages = blobs.pages
+        while (page := self.__request(next, pages, None)) is not None:
+            crc32c_by_name.update({blob.name[len(prefix):]: blob.crc32c for blob in page})
+        return crc32c_by_name
+
+    @staticmethod
+    def __composite_size(data_stream: Streamable) -> int:
+        # Only files on disk can be read by several part uploads at once
+        path = getattr(data_stream, 'name', None)
+        if isinstance(path, str) and os.path.isfile(path):
+            return os.path.getsize(path)
+        return 0
+
+    def __upload_part(self, part: Blob, path: str, offset: int, size: int):
+        with open(path, 'rb') as source:
+            source.seek(offset)
+            self.__request(part.upload_from_file, source, size=size)
+
+    @staticmethod
+    def __file_crc32c(path: str, chunk_size: int = 1024 * 1024) -> str:
+        """
+        :return: the crc32c checksum of the file, base64 encoded as reported by Cloud Storage
+        """
+        checksum = 0
+        with open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(chunk_size), b''):
+                checksum = crc32c.crc32c(chunk, checksum)
+        return base64.b64encode(checksum.to_bytes(4, 'big')).decode()
+
+    def __delete_blob(self, blob: Blob):
+        try:
+            self.__request(blob.delete)
+        except NotFound:
+            pass
+
+    def __request(self, method: Callable, *args, **kwargs):
+        if self.throttle:
+            self.throttle()
+        return method(*args, **kwargs)
+
     def __overwrite(self, blob: Blob, data_stream: Streamable):
-        blob.upload_from_file(data_stream)
+        self.__request(blob.upload_from_file, data_stream)
         self.__mark_complete(blob)
 
     def __write(self, blob: Blob, data_stream: Streamable):
         try:
-            if not blob.exists():
-                blob.upload_from_file(data_stream, if_generation_match=0)
+            if not self.__request(blob.exists):
+                self.__request(blob.upload_from_file, data_stream, if_generation_match=0)
                 self.__mark_complete(blob)
             else:
                 self.__assert_file_uploaded(blob)
@@ -47,14 +160,13 @@ class GcsStorage:
             # and instead poll for its completion
             self.__assert_file_uploaded(blob)
 
-    @staticmethod
-    def __mark_complete(blob: Blob):
+    def __mark_complete(self, blob: Blob):
         blob.metadata = {"export_completed": True}
         retry_patch = Retry(
             predicate=if_exception_type(ServiceUnavailable),
             deadline=600
         )
-        retry_patch(lambda: blob.patch())()
+        retry_patch(lambda: self.__request(blob.patch))()
 
     def __assert_file_uploaded(self, blob: Blob, sleep_time: float = 0.1, max_sleep_time: float = 60 * 60):
         if sleep_time > max_sleep_time:
@@ -62,7 +174,7 @@ class GcsStorage:
                                          f'wait time of {str(max_sleep_time)} seconds')
         else:
             sleep(sleep_time)
-            blob.reload()
+            self.__request(blob.reload)
 
             export_completed = blob.metadata is not None and blob.metadata.get("export_completed")
             if export_completed:
@@ -0,0 +1,51 @@
+import threading
+
+import google_auth_httplib2
+import googleapiclient.discovery
+import googleapiclient.http
+import httplib2
+from google.oauth2.service_account import Credentials
+from googleapiclient import discovery_cache
+from googleapiclient._auth import with_scopes
+from googleapiclient.discovery import Resource
+
+SCOPES = ['https://www.googleapis.com/auth/cloud-platform']
+
+
+class TransferClientFactory:
+    """
+    Builds the Storage Transfer service once, from the discovery document bundled with google-api-python-client,
+    instead of loading and parsing the discovery document and building the service for every call.
+    The service object is shared between threads, the HTTP objects it sends requests with are not:
+    httplib2 is not thread-safe, so every thread sends its requests through its own AuthorizedHttp.
+    See: https://googleapis.github.io/google-api-python-client/docs/thread_safety.html
+    """
+    def __init__(self, credentials: Credentials, api: str = 'storagetransfer', version: str = 'v1'):
+        # AuthorizedHttp requires credentials with scopes
+        # When using googleapiclient.discovery.build without requestBuilder and using credentials directly,
+        # the client adds the scopes for you automatically but not when using with requestBuilder and AuthorizedHttp
+        self.credentials = with_scopes(credentials, SCOPES)
+        self.api = api
+        self.version = version
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self._service = None
+
+    def service(self) -> Resource:
+        with self.lock:
+            if self._service is None:
+                self._service = googleapiclient.discovery.build_from_document(
+                    discovery_cache.get_static_doc(self.api, self.version),
+                    http=self.http(),
+                    requestBuilder=self.__build_request
+                )
+            return self._service
+
+    def http(self) -> google_auth_httplib2.AuthorizedHttp:
+        http = getattr(self.local, 'http', None)
+        if http is None:
+            http = self.local.http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http())
+        return http
+
+    def __build_request(self, _http, *args, **kwargs) -> googleapiclient.http.HttpRequest:
+        return googleapiclient.http.HttpRequest(self.http(), *args, **kwargs)
@@ -1,6 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List
 
 from google.cloud.pubsub_v1 import SubscriberClient
 
@@ -17,13 +17,15 @@ class TransferJob:
     dest_bucket: str
     dest_path: str
     notification_topic: str
+    # Relative to source_path, the Storage Transfer Service accepts at most 1000 per job
+    include_prefixes: List[str] = field(default=None)
 
     def __post_init__(self):
         self.notification_topic = SubscriberClient.topic_path(self.project_id, self.notification_topic)
 
     def to_dict(self) -> Dict:
         start_date = datetime.now()
-        return {
+        transfer_job = {
             'name': self.name,
             'description': self.description,
             'status': 'ENABLED',
@@ -63,3 +65,8 @@ class TransferJob:
                 'payloadFormat': 'JSON'
             }
         }
+        if self.include_prefixes:
+            transfer_job['transferSpec']['objectConditions'] = {
+                'includePrefixes': self.include_prefixes
+            }
+        return transfer_job
@@ -0,0 +1,99 @@
+import heapq
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+MAX_INCLUDE_PREFIXES = 1000
+SHARD_JOB_NAME = re.compile(r'^transferJobs/(?P<export_job_id>.+)-shard-(?P<shard>\d+)-of-(?P<shard_count>\d+)$')
+
+
+@dataclass(frozen=True)
+class TransferJobName:
+    export_job_id: str
+    shard: Optional[int] = field(default=None)
+    shard_count: Optional[int] = field(default=None)
+
+    @property
+    def name(self) -> str:
+        if self.is_shard:
+            return f'transferJobs/{self.export_job_id}-shard-{self.shard}-of-{self.shard_count}'
+        return f'transferJobs/{self.export_job_id}'
+
+    @property
+    def is_shard(self) -> bool:
+        return self.shard is not None
+
+    def group(self) -> List['TransferJobName']:
+        if not self.is_shard:
+            return [self]
+        return [TransferJobName(self.export_job_id, shard, self.shard_count) for shard in range(1, self.shard_count + 1)]
+
+    @staticmethod
+    def parse(transfer_job_name: str) -> Optional['TransferJobName']:
+        if not transfer_job_name.startswith('transferJobs/'):
+            return None
+        match = SHARD_JOB_NAME.match(transfer_job_name)
+        if match:
+            return TransferJobName(match['export_job_id'], int(match['shard']), int(match['shard_count']))
+        return TransferJobName(transfer_job_name.replace('transferJobs/', ''))
+
+
+class TransferShardPlanner:
+    """
+    Splits the files of an upload area into at most `shards` groups of include prefixes, one per transfer job,
+    balanced by file size.
+    Files are included by their exact name while every shard can list its files within max_prefixes,
+    otherwise by their key prefixes of the longest length that fits.
+    A prefix that starts with another prefix is merged into it, so that no file is transferred by two shards.
+    """
+    def __init__(self, shards: int, max_prefixes: int = MAX_INCLUDE_PREFIXES):
+        self.shards = shards
+        self.max_prefixes = max_prefixes
+
+    def plan(self, files: Dict[str, int]) -> List[List[str]]:
+        if not files:
+            return []
+        return self.__pack(self.__prefix_groups(files))
+
+    def __prefix_groups(self, files: Dict[str, int]) -> List[Tuple[str, int]]:
+        limit = self.shards * self.max_prefixes
+        groups = self.__group_by_prefix(files, None)
+        if len(groups) <= limit:
+            return groups
+        # The number of groups only grows with the prefix length, so look for the longest prefix length that fits
+        low, high = 1, max(len(name) for name in files)
+        best = self.__group_by_prefix(files, low)
+        while low < high:
+            length = (low + high + 1) // 2
+            candidate = self.__group_by_prefix(files, length)
+            if len(candidate) <= limit:
+                low, best = length, candidate
+            else:
+                high = length - 1
+        return best
+
+    @staticmethod
+    def __group_by_prefix(files: Dict[str, int], length: Optional[int]) -> List[Tuple[str, int]]:
+        sizes: Dict[str, int] = {}
+        for name, size in files.items():
+            prefix = name[:length] if length else name
+            sizes[prefix] = sizes.get(prefix, 0) + max(size or 0, 1)
+        groups: List[Tuple[str, int]] = []
+        for prefix in sorted(sizes):
+            # Keys starting with a kept prefix sort directly after it
+            if groups and prefix.startswith(groups[-1][0]):
+                groups[-1] = (groups[-1][0], groups[-1][1] + sizes[prefix])
+            else:
+                groups.append((prefix, sizes[prefix]))
+        return groups
+
+    def __pack(self, groups: List[Tuple[str, int]]) -> List[List[str]]:
+        shard_count = min(self.shards, len(groups))
+        shards: List[List[str]] = [[] for _ in range(shard_count)]
+        lightest = [(0, index) for index in range(shard_count)]
+        for prefix, size in sorted(groups, key=lambda group: group[1], reverse=True):
+            load, index = heapq.heappop(lightest)
+            shards[index].append(prefix)
+            if len(shards[index]) < self.max_prefixes:
+                heapq.heappush(lightest, (load + size, index))
+        return [sorted(prefixes) for prefixes in shards]
@@ -0,0 +1,168 @@
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field, fields
+from typing import Dict, Iterable, List, Set
+
+from cachetools import TTLCache
+
+from exporter.session_context import SessionContext
+from .exceptions import TransferOperationsParseError
+from .transfer import GcsTransfer
+
+
+@dataclass
+class TransferCounters:
+    objects_found: int = 0
+    bytes_found: int = 0
+    objects_copied: int = 0
+    bytes_copied: int = 0
+    objects_failed: int = 0
+    bytes_failed: int = 0
+
+    @staticmethod
+    def from_operation(operation: dict) -> 'TransferCounters':
+        # int64 fields of the Storage Transfer API are serialised as strings
+        counters = operation.get('metadata', {}).get('counters', {})
+        return TransferCounters(
+            objects_found=int(counters.get('objectsFoundFromSource', 0)),
+            bytes_found=int(counters.get('bytesFoundFromSource', 0)),
+            objects_copied=int(counters.get('objectsCopiedToSink', 0)),
+            bytes_copied=int(counters.get('bytesCopiedToSink', 0)),
+            objects_failed=int(counters.get('objectsFromSourceFailed', 0)),
+            bytes_failed=int(counters.get('bytesFromSourceFailed', 0))
+        )
+
+    def __add__(self, other: 'TransferCounters') -> 'TransferCounters':
+        return TransferCounters(*[getattr(self, f.name) + getattr(other, f.name) for f in fields(self)])
+
+
+@dataclass
+class TransferStatus:
+    job_name: str
+    operations: int = 0
+    done: bool = False
+    failed: bool = False
+    counters: TransferCounters = field(default_factory=TransferCounters)
+
+    @staticmethod
+    def from_operations(job_name: str, operations: List[dict]) -> 'TransferStatus':
+        counters = TransferCounters()
+        for operation in operations:
+            counters += TransferCounters.from_operation(operation)
+        return TransferStatus(
+            job_name=job_name,
+            operations=len(operations),
+            done=len(operations) > 0 and all(operation.get('done', False) for operation in operations),
+            failed=any(TransferStatus.__is_failed(operation) for operation in operations),
+            counters=counters
+        )
+
+    @staticmethod
+    def __is_failed(operation: dict) -> bool:
+        return 'error' in operation or operation.get('metadata', {}).get('status') in ('FAILED', 'ABORTED')
+
+
+class TransferStatusTracker:
+    """
+    Polls the status of every tracked transfer job with as few transferOperations.list calls as possible,
+    by filtering on up to batch_size job names per call.
+    A status is cached for ttl seconds, and a cache miss refreshes all tracked jobs at once,
+    so concurrent export jobs share one poll instead of each polling their own transfer.
+    Jobs stop being polled once all their operations are done.
+    """
+    def __init__(self, gcs_transfer: GcsTransfer, project_id: str, ttl: float = 30, batch_size: int = 100,
+                 logger_name: str = __name__):
+        self.gcs_transfer = gcs_transfer
+        self.project_id = project_id
+        self.batch_size = batch_size
+        self.logger = SessionContext.register_logger(logger_name)
+        self.statuses: TTLCache = TTLCache(maxsize=10000, ttl=ttl)
+        self.tracked: Set[str] = set()
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+
+    def track(self, job_name: str):
+        with self.lock:
+            self.tracked.add(job_name)
+
+    def untrack(self, job_name: str):
+        with self.lock:
+            self.tracked.discard(job_name)
+            self.statuses.pop(job_name, None)
+
+    def status(self, job_name: str) -> TransferStatus:
+        with self.lock:
+            if job_name in self.statuses:
+                return self.statuses[job_name]
+            self.tracked.add(job_name)
+        with self.refresh_lock:
+            # Another thread may have refreshed the status while this one was waiting
+            with self.lock:
+                if job_name in self.statuses:
+                    return self.statuses[job_name]
+            return self.__refresh().get(job_name, TransferStatus(job_name))
+
+    def refresh(self) -> Dict[str, TransferStatus]:
+        with self.refresh_lock:
+            return self.__refresh()
+
+    def job_statuses(self, job_names: List[str]) -> Dict[str, TransferStatus]:
+        """
+        The status of each of the given jobs, as status would return it, refreshing at most once for all of them
+        """
+        with self.lock:
+            self.tracked.update(job_names)
+            if all(job_name in self.statuses for job_name in job_names):
+                return {job_name: self.statuses[job_name] for job_name in job_names}
+        with self.refresh_lock:
+            # Another thread may have refreshed the statuses while this one was waiting
+            with self.lock:
+                missing = [job_name for job_name in job_names if job_name not in self.statuses]
+            refreshed = self.__refresh() if missing else {}
+            with self.lock:
+                return {
+                    job_name: self.statuses.get(job_name) or refreshed.get(job_name, TransferStatus(job_name))
+                    for job_name in job_names
+                }
+
+    def totals(self) -> TransferCounters:
+        with self.lock:
+            statuses = list(self.statuses.values())
+        totals = TransferCounters()
+        for status in statuses:
+            totals += status.counters
+        return totals
+
+    def __refresh(self) -> Dict[str, TransferStatus]:
+        with self.lock:
+            job_names = sorted(self.tracked)
+        statuses = self.__fetch(job_names)
+        self.__store(statuses)
+        self.logger.debug(f'Refreshed the status of {len(job_names)} transfer jobs')
+        return statuses
+
+    def __fetch(self, job_names: List[str]) -> Dict[str, TransferStatus]:
+        statuses = {}
+        for start in range(0, len(job_names), self.batch_size):
+            batch = job_names[start:start + self.batch_size]
+            statuses.update(self.__list_statuses(batch))
+        return statuses
+
+    def __store(self, statuses: Dict[str, TransferStatus]):
+        with self.lock:
+            for job_name, status in statuses.items():
+                self.statuses[job_name] = status
+                if status.done:
+                    self.tracked.discard(job_name)
+
+    def __list_statuses(self, job_names: Iterable[str]) -> Dict[str, TransferStatus]:
+        operations_by_job = defaultdict(list)
+        for operation in self.gcs_transfer.list_operations(self.project_id, list(job_names)):
+            try:
+                operations_by_job[operation['metadata']['transferJobName']].append(operation)
+            except (KeyError, TypeError) as e:
+                raise TransferOperationsParseError(f'Failed to parse transferOperations') from e
+        return {
+            job_name: TransferStatus.from_operations(job_name, operations_by_job.get(job_name, []))
+            for job_name in job_names
+        }
@@ -0,0 +1,97 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List
+
+from hca_ingest.api.ingestapi import IngestApi
+from hca_ingest.downloader.entity import Entity
+
+ENTITY_TYPES = ['biomaterials', 'processes', 'protocols', 'files']
+
+
+class ConcurrentDataCollector:
+    """
+    Collects the entities of a submission like hca_ingest's DataCollector,
+    fetching the project, the linking map and every page of every entity type concurrently
+    with at most max_workers requests in flight.
+    Requests go through the IngestApi session, so responses already in its cache are not fetched again.
+    Entities are returned in the order DataCollector returns them: project, biomaterials, processes,
+    protocols then files, each in page order.
+    """
+    def __init__(self, api: IngestApi, max_workers: int = 8):
+        self.api = api
+        self.max_workers = max_workers
+
+    def collect_data_by_submission_uuid(self, submission_uuid: str) -> Dict[str, Entity]:
+        submission = self.api.get_submission_by_uuid(submission_uuid)
+        submission_id = submission['_links']['self']['href'].split('/')[-1]
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='SpreadsheetFetch') as executor:
+            project = executor.submit(self.api.get_related_project, submission_id)
+            linking_map = executor.submit(self.__get_linking_map, submission)
+            first_pages = {
+                entity_type: executor.submit(self.__get_page, submission['_links'][entity_type]['href'], 0)
+                for entity_type in ENTITY_TYPES if entity_type in submission['_links']
+            }
+            pages: Dict[str, List[Future]] = {
+                entity_type: [first_page] + self.__submit_remaining_pages(executor, submission, entity_type, first_page.result())
+                for entity_type, first_page in first_pages.items()
+            }
+            project_json = project.result()
+            if not project_json:
+                raise Exception(f'There should be a project related to submission {submission_id} with uuid: {submission_uuid}')
+            entity_dict = {}
+            for entity_json in [project_json] + self.__entities_from_pages(pages):
+                entity = Entity(entity_json)
+                entity_dict[entity.id] = entity
+            self.__set_inputs(entity_dict, linking_map.result())
+        return entity_dict
+
+    def __submit_remaining_pages(self, executor: ThreadPoolExecutor, submission: dict, entity_type: str, first_page: dict) -> List[Future]:
+        if 'page' not in first_page:
+            # Not a paged resource, follow its next links instead
+            return [executor.submit(self.__follow_next_pages, first_page)]
+        url = submission['_links'][entity_type]['href']
+        return [executor.submit(self.__get_page, url, page) for page in range(1, first_page['page']['totalPages'])]
+
+    def __get_page(self, url: str, page: int) -> dict:
+        return self.api.get(url, params={'size': self.api.page_size, 'page': page}).json()
+
+    def __follow_next_pages(self, result: dict) -> dict:
+        entities = {}
+        while 'next' in result.get('_links', {}):
+            result = self.api.get(result['_links']['next']['href']).json()
+            for entity_type, embedded in result.get('_embedded', {}).items():
+                entities.setdefault(entity_type, []).extend(embedded)
+        return {'_embedded': entities}
+
+    @staticmethod
+    def __entities_from_pages(pages: Dict[str, List[Future]]) -> List[dict]:
+        entities = []
+        for entity_type in ENTITY_TYPES:
+            for page in pages.get(entity_type, []):
+                entities.extend(page.result().get('_embedded', {}).get(entity_type, []))
+        return entities
+
+    def __get_linking_map(self, submission: dict) -> dict:
+        headers = dict(self.api.get_headers())
+        headers.update({'Content-type': 'application/json', 'Accept': 'application/hal+json'})
+        return self.api.get(submission['_links']['linkingMap']['href'], headers=headers).json()
+
+    @staticmethod
+    def __set_inputs(entity_dict: Dict[str, Entity], linking_map: dict):
+        entities_with_inputs = list(linking_map['biomaterials'].keys()) + list(linking_map['files'].keys())
+        for entity_id in entities_with_inputs:
+            entity = entity_dict[entity_id]
+            entity_link = linking_map[entity.schema.domain_type + 's'][entity.id]
+            derived_by_processes = entity_link.get('derivedByProcesses')
+            if not derived_by_processes:
+                continue
+            # Spreadsheets cannot derive an entity from more than one process
+            if len(derived_by_processes) > 1:
+                raise ValueError(f'The {entity.schema.concrete_type} with {entity.uuid} '
+                                 f'has more than one processes which derived it')
+            process_link = linking_map['processes'][derived_by_processes[0]]
+            entity.set_input(
+                input_biomaterials=[entity_dict[input_id] for input_id in process_link['inputBiomaterials']],
+                input_files=[entity_dict[input_id] for input_id in process_link['inputFiles']],
+                process=entity_dict[derived_by_processes[0]],
+                protocols=[entity_dict[protocol_id] for protocol_id in process_link['protocols']]
+            )
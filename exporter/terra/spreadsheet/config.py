@@ -1,10 +1,13 @@
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
 from threading import Thread
 
 from hca_ingest.api.ingestapi import IngestApi
 from hca_ingest.utils.token_manager import TokenManager
 
 from exporter.ingest.service import IngestService
+from exporter.lifecycle import LifecycleManager
 from exporter.queue.config import QueueConfig, AmqpConnConfig
 from exporter.queue.connector import QueueConnector
 from exporter.queue.listener import QueueListener
@@ -15,6 +18,7 @@ from exporter.terra.gcs.config import GcpConfig
 from exporter.terra.gcs.storage import GcsStorage
 
 from .handler import SpreadsheetHandler
+from .worker import init_worker, shutdown_process_pool
 from ...session_context import SessionContext
 from ...utils import init_token_manager
 
@@ -31,7 +35,7 @@ SPREADSHEET_QUEUE_CONFIG = QueueConfig(
 )
 
 
-def setup_terra_spreadsheet_exporter() -> Thread:
+def setup_terra_spreadsheet_exporter(lifecycle: LifecycleManager = None) -> Thread:
     rabbit_host = os.environ.get('RABBIT_HOST', 'localhost')
     rabbit_port = int(os.environ.get('RABBIT_PORT', '5672'))
     amqp_conn_config = AmqpConnConfig(rabbit_host, rabbit_port)
@@ -48,10 +52,25 @@ def setup_terra_spreadsheet_exporter() -> Thread:
     terra_config = TerraConfig.from_env()
     terra_client = TerraStorageClient(gcs_storage, schema_service, terra_config.terra_bucket_name, terra_config.terra_bucket_prefix, LOGGER_NAME)
 
-    handler = SpreadsheetHandler(ingest_service, terra_client, LOGGER_NAME)
+    fetch_workers = int(os.environ.get('SPREADSHEET_FETCH_THREADS', '8'))
+    spreadsheet_processes = int(os.environ.get('SPREADSHEET_PROCESSES', '0'))
+    process_pool = None
+    if spreadsheet_processes > 0:
+        # Forking a process running listener threads can deadlock the child, so workers are spawned
+        process_pool = ProcessPoolExecutor(
+            max_workers=spreadsheet_processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(ingest_api_url, fetch_workers)
+        )
+    handler = SpreadsheetHandler(ingest_service, terra_client, LOGGER_NAME, fetch_workers, process_pool)
     listener = QueueListener(SPREADSHEET_QUEUE_CONFIG, handler)
     connector = QueueConnector(amqp_conn_config, listener)
 
-    spreadsheet_listener_process = Thread(target=lambda: connector.run())
+    spreadsheet_listener_process = Thread(target=lambda: connector.run(), daemon=True)
     spreadsheet_listener_process.start()
+    if lifecycle:
+        lifecycle.add_worker(LOGGER_NAME, spreadsheet_listener_process, listener.stop)
+        if process_pool:
+            lifecycle.add_flush(f'{LOGGER_NAME} processes', lambda timeout: shutdown_process_pool(process_pool, timeout))
     return spreadsheet_listener_process
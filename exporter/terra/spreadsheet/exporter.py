@@ -1,50 +1,124 @@
-import hashlib
 import logging
 import uuid
+from concurrent.futures import Executor, ThreadPoolExecutor, wait
 from tempfile import NamedTemporaryFile as TempFile
 
-import crc32c
-from hca_ingest.downloader.workbook import WorkbookDownloader
 from hca_ingest.utils.date import parse_date_string
 
 from exporter.graph.info.supplementary_files import SupplementaryFilesInfo
 from exporter.graph.experiment import ExperimentGraph
 from exporter.ingest.service import IngestService
+from exporter.metadata.checksums import FileChecksums
 from exporter.metadata.resource import MetadataResource as Metadata
+from exporter.terra.spreadsheet.worker import SpreadsheetDigest, build_spreadsheet, build_spreadsheet_in_worker
+from exporter.terra.spreadsheet.workbook import StreamingWorkbookGenerator
 from exporter.terra.storage import TerraStorageClient
 
+SUPPLEMENTARY_FILE = 'supplementary_file'
+
 
 class SpreadsheetExporter:
-    def __init__(self, ingest_service: IngestService, terra_client: TerraStorageClient, logger_name: str = __name__):
+    def __init__(self, ingest_service: IngestService, terra_client: TerraStorageClient, logger_name: str = __name__,
+                 fetch_workers: int = 8, process_pool: Executor = None):
         self.ingest = ingest_service
         self.terra = terra_client
-        self.downloader = WorkbookDownloader(self.ingest.api)
+        self.generator = StreamingWorkbookGenerator(self.ingest.api, fetch_workers)
+        # Spreadsheets are built in this process when not given a pool of worker processes
+        self.process_pool = process_pool
         self.logger = logging.getLogger(logger_name)
 
     def export_spreadsheet(self, project_uuid: str, submission_uuid: str):
-        self.logger.info("Generating Spreadsheet")
-        workbook = self.downloader.get_workbook_from_submission(submission_uuid)
-
-        self.logger.info("Generating Spreadsheet Metadata")
         dcp_version = self.ingest.get_submission_dcp_version_from_uuid(submission_uuid)
-        project_meta = self.ingest.get_metadata(entity_type='projects', uuid=project_uuid)
+        if self.is_spreadsheet_unchanged(project_uuid, submission_uuid, dcp_version):
+            self.logger.info(f"Spreadsheet of submission version {dcp_version} already exported, skipping generation")
+            return
         with TempFile() as spreadsheet_file:
-            workbook.save(spreadsheet_file.name)
+            self.logger.info("Generating Spreadsheet")
+            digest = self.build_spreadsheet(submission_uuid, spreadsheet_file.name)
+
+            self.logger.info("Generating Spreadsheet Metadata")
+            project_meta = self.ingest.get_metadata(entity_type='projects', uuid=project_uuid)
             # todo: make it available in broker as well.
-            file_meta = self.create_supplementary_file_metadata(spreadsheet_file, project_meta, submission_uuid, dcp_version)
+            file_meta = self.create_supplementary_file_metadata(digest, project_meta, submission_uuid, dcp_version)
             self.logger.info("Writing to Terra")
             self.write_to_terra(spreadsheet_file, project_meta, file_meta)
 
+    def build_spreadsheet(self, submission_uuid: str, path: str) -> SpreadsheetDigest:
+        if self.process_pool:
+            # Workbook building and checksumming hold the GIL, keep them out of the listener process
+            return self.process_pool.submit(build_spreadsheet_in_worker, submission_uuid, path).result()
+        return build_spreadsheet(self.generator, submission_uuid, path)
+
+    def is_spreadsheet_unchanged(self, project_uuid: str, submission_uuid: str, dcp_version: str) -> bool:
+        """
+        The file descriptor of an exported spreadsheet records the submission version and the checksums it was
+        generated from, so the spreadsheet is unchanged when the descriptor for this version exists
+        and the spreadsheet in the staging area still has its checksum.
+        """
+        # Descriptors are keyed by the normalized dcpVersion of the spreadsheet metadata, not the ingest timestamp
+        descriptor = self.terra.read_file_descriptor(project_uuid, SUPPLEMENTARY_FILE, self.metadata_uuid(submission_uuid),
+                                                     Metadata.to_dcp_version(dcp_version))
+        if not descriptor:
+            return False
+        uploaded_crc32c = self.terra.staging_object_crc32c(f'{project_uuid}/data/{descriptor["file_name"]}')
+        exported_crc32c = FileChecksums(descriptor.get('sha256'), descriptor.get('crc32c'), descriptor.get('sha1'), descriptor.get('s3_etag')).crc32c_base64()
+        return uploaded_crc32c is not None and uploaded_crc32c == exported_crc32c
+
+    @staticmethod
+    def metadata_uuid(submission_uuid: str) -> str:
+        return str(uuid.uuid5(uuid.NAMESPACE_DNS, f'{submission_uuid}_metadata'))
+
     def write_to_terra(self, spreadsheet_file: TempFile, project_meta: Metadata, file_meta: Metadata):
-        self.terra.write_metadata(file_meta, project_meta.uuid, overwrite=True)
-        self.write_links(file_meta, project_meta)
+        """
+        Writes the metadata, links and spreadsheet concurrently. If any write fails, the objects this attempt created
+        are deleted before the error is raised, so that a retry starts from a clean staging area.
+        Objects that were already staged before the attempt are left in place, they may belong to an earlier export,
+        and a retry overwrites them anyway.
+        """
+        data_object_key = f'{project_meta.uuid}/data/{file_meta.full_resource["fileName"]}'
+        writes = {
+            'metadata': (
+                lambda: self.terra.write_metadata(file_meta, project_meta.uuid, overwrite=True),
+                [TerraStorageClient.metadata_object_key(file_meta, project_meta.uuid),
+                 TerraStorageClient.file_descriptor_object_key(file_meta, project_meta.uuid)]
+            ),
+            'links': (
+                lambda: self.write_links(file_meta, project_meta),
+                [TerraStorageClient.links_object_key(file_meta.uuid, file_meta.dcp_version, project_meta.uuid)]
+            ),
+            'data': (
+                lambda: self.write_spreadsheet(spreadsheet_file, data_object_key),
+                [data_object_key]
+            )
+        }
+        object_keys = [object_key for _, keys in writes.values() for object_key in keys]
+        with ThreadPoolExecutor(max_workers=len(object_keys), thread_name_prefix='SpreadsheetWrite') as executor:
+            staged = dict(zip(object_keys, executor.map(self.terra.staging_object_crc32c, object_keys)))
+            futures = {name: executor.submit(write) for name, (write, _) in writes.items()}
+            wait(futures.values())
+        errors = {name: future.exception() for name, future in futures.items() if future.exception()}
+        if not errors:
+            return
+        for name, (_, keys) in writes.items():
+            for object_key in keys:
+                if staged[object_key] is None:
+                    self.__delete_written(object_key)
+        raise next(iter(errors.values()))
+
+    def write_spreadsheet(self, spreadsheet_file: TempFile, object_key: str):
         spreadsheet_file.seek(0)
         self.terra.write_to_staging_bucket(
-            object_key=f'{project_meta.uuid}/data/{file_meta.full_resource["fileName"]}',
+            object_key=object_key,
             data_stream=spreadsheet_file,
             overwrite=True
         )
 
+    def __delete_written(self, object_key: str):
+        try:
+            self.terra.delete_from_staging_bucket(object_key)
+        except Exception as e:
+            self.logger.error(f'Could not roll back {object_key}: {str(e) if str(e) else e.__class__.__name__}')
+
     def write_links(self, file_meta: Metadata, project_meta: Metadata):
         info = SupplementaryFilesInfo(for_entity=project_meta, files=[file_meta])
         experiment_graph = ExperimentGraph.from_supplementary_files_info(info, project_meta)
@@ -55,31 +129,26 @@ class SpreadsheetExporter:
             project_meta.uuid
         )
 
-    def create_supplementary_file_metadata(self, spreadsheet_file: TempFile, project_meta: Metadata, submission_uuid: str, dcp_version: str) -> Metadata:
-        schema_url = self.ingest.api.get_latest_schema_url('type', 'file', 'supplementary_file')
+    def create_supplementary_file_metadata(self, digest: SpreadsheetDigest, project_meta: Metadata, submission_uuid: str, dcp_version: str) -> Metadata:
+        schema_url = self.ingest.api.get_latest_schema_url('type', 'file', SUPPLEMENTARY_FILE)
         short_name = project_meta.metadata_json.get('project_core', {}).get('project_short_name', project_meta.uuid)
         date_suffix = parse_date_string(dcp_version).strftime('%d-%m-%Y')
         filename = f'{short_name}_metadata_{date_suffix}.xlsx'
-        spreadsheet_file.seek(0)
-        spreadsheet_bytes = spreadsheet_file.read()
-        spreadsheet_size = len(spreadsheet_bytes)
-        s256 = hashlib.sha256(spreadsheet_bytes)
-        s1 = hashlib.sha1(spreadsheet_bytes)
-        crc = f'{crc32c.crc32c(spreadsheet_bytes):08x}'
-        self.logger.info(f'crc: {crc}')
-        metadata_uuid = str(uuid.uuid5(uuid.NAMESPACE_DNS, f'{submission_uuid}_metadata'))
+        checksums = digest.checksums
+        self.logger.info(f'crc: {checksums.crc32c}')
+        metadata_uuid = self.metadata_uuid(submission_uuid)
         datafile_uuid = str(uuid.uuid5(uuid.NAMESPACE_DNS, f'{submission_uuid}_data'))
         return Metadata.from_dict({
             "fileName": filename,
             "dataFileUuid": datafile_uuid,
             "cloudUrl": None,
             "fileContentType": "xlsx",
-            "size": spreadsheet_size,
+            "size": digest.size,
             "checksums": {
-                "sha256": s256.hexdigest(),
-                "crc32c": crc,
-                "sha1": s1.hexdigest(),
-                "s3_etag": 'n/a - not in s3'
+                "sha256": checksums.sha256,
+                "crc32c": checksums.crc32c,
+                "sha1": checksums.sha1,
+                "s3_etag": checksums.s3_etag
             },
             "uuid": {"uuid": metadata_uuid},
             "dcpVersion": dcp_version,
@@ -1,3 +1,5 @@
+from concurrent.futures import Executor
+
 from kombu import Message
 
 from exporter.ingest.export_job import ExportContextState
@@ -11,10 +13,11 @@ from .message import SpreadsheetExporterMessage
 
 
 class SpreadsheetHandler(MessageHandler):
-    def __init__(self, ingest_service: IngestService, terra_client:  TerraStorageClient, logger_name: str = __name__):
+    def __init__(self, ingest_service: IngestService, terra_client:  TerraStorageClient, logger_name: str = __name__,
+                 fetch_workers: int = 8, process_pool: Executor = None):
         super().__init__(logger_name)
         self.ingest = ingest_service
-        self.exporter = SpreadsheetExporter(ingest_service, terra_client, logger_name)
+        self.exporter = SpreadsheetExporter(ingest_service, terra_client, logger_name, fetch_workers, process_pool)
 
     def set_context(self, body: dict) -> SessionContext:
         return SessionContext(
@@ -0,0 +1,211 @@
+import functools
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, asdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Iterable, List, Optional, Set
+
+from hca_ingest.api.ingestapi import IngestApi
+
+from exporter.session_context import SessionContext
+
+from .exporter import SpreadsheetExporter
+
+EXPORTED = 'exported'
+FAILED = 'failed'
+
+
+@dataclass(frozen=True)
+class ReexportTarget:
+    submission_uuid: str
+    project_uuid: str
+
+
+def read_targets(path: str) -> List[ReexportTarget]:
+    """
+    Reads one submission uuid and project uuid pair per line, separated by a comma or whitespace.
+    Blank lines and lines starting with # are skipped.
+    """
+    targets = []
+    with open(path) as targets_file:
+        for line_number, line in enumerate(targets_file, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            uuids = [uuid for uuid in re.split(r'[,\s]+', line) if uuid]
+            if len(uuids) != 2:
+                raise ValueError(f'Expected a submission uuid and a project uuid on line {line_number} of {path}')
+            targets.append(ReexportTarget(*uuids))
+    return targets
+
+
+def query_targets(ingest_api: IngestApi, project_uuids: Iterable[str], submission_states: Iterable[str] = None) -> List[ReexportTarget]:
+    """
+    Finds the submissions of the given projects in ingest, optionally only those in one of submission_states
+    """
+    states = set(submission_states) if submission_states else None
+    targets = []
+    for project_uuid in project_uuids:
+        project = ingest_api.get_project_by_uuid(project_uuid)
+        for submission in ingest_api.get_related_entities('submissionEnvelopes', project, 'submissionEnvelopes'):
+            if states is None or submission.get('submissionState') in states:
+                targets.append(ReexportTarget(submission['uuid']['uuid'], project_uuid))
+    return targets
+
+
+class CheckpointLedger:
+    """
+    Append-only json lines file recording the outcome of every re-export, flushed after each record,
+    so an interrupted run resumes with the targets that were not exported yet.
+    The last record of a target wins, so failed targets are retried by the next run.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def exported(self) -> Set[ReexportTarget]:
+        if not os.path.exists(self.path):
+            return set()
+        statuses = {}
+        with open(self.path) as ledger:
+            for line in ledger:
+                try:
+                    record = json.loads(line)
+                    statuses[ReexportTarget(record['submission_uuid'], record['project_uuid'])] = record['status']
+                except (ValueError, KeyError):
+                    # A run killed while writing leaves a partial last line
+                    continue
+        return {target for target, status in statuses.items() if status == EXPORTED}
+
+    def record(self, target: ReexportTarget, status: str, duration: float, error: str = None):
+        record = {
+            **asdict(target),
+            'status': status,
+            'duration': round(duration, 3),
+            'error': error,
+            'time': datetime.now(timezone.utc).isoformat()
+        }
+        with self.lock:
+            with open(self.path, 'a') as ledger:
+                ledger.write(json.dumps(record) + '\n')
+                ledger.flush()
+                os.fsync(ledger.fileno())
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket allowing rate calls per second on average, in bursts of up to burst calls
+    """
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Waiting callers reserve their token up front, taking the bucket below zero
+            wait = (1 - self.tokens) / self.rate if self.tokens < 1 else 0
+            self.tokens -= 1
+        if wait > 0:
+            time.sleep(wait)
+
+    def limit(self, target: Any, *method_names: str):
+        """
+        Rate limits calls of the given methods of target, shared with every other method limited by this limiter
+        """
+        for method_name in method_names:
+            setattr(target, method_name, self.__limited(getattr(target, method_name)))
+
+    def __limited(self, method: Callable) -> Callable:
+        @functools.wraps(method)
+        def limited(*args, **kwargs):
+            self.acquire()
+            return method(*args, **kwargs)
+        return limited
+
+
+@dataclass
+class ReexportSummary:
+    total: int
+    skipped: int = 0
+    exported: int = 0
+    failed: int = 0
+    elapsed: float = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.total - self.skipped - self.exported - self.failed
+
+    @property
+    def per_hour(self) -> float:
+        return (self.exported + self.failed) / self.elapsed * 3600 if self.elapsed else 0
+
+    @property
+    def eta_seconds(self) -> Optional[float]:
+        return self.remaining / self.per_hour * 3600 if self.per_hour else None
+
+    def __str__(self):
+        eta = f'{self.eta_seconds / 60:.1f} min' if self.eta_seconds is not None else 'n/a'
+        return (f'{self.exported} exported, {self.failed} failed, {self.skipped} already exported, '
+                f'{self.remaining} remaining of {self.total} in {self.elapsed / 60:.1f} min '
+                f'({self.per_hour:.1f} per hour, ETA {eta})')
+
+
+class SpreadsheetReexporter:
+    """
+    Re-exports the spreadsheets of many submissions with a pool of workers,
+    skipping the targets the ledger records as already exported
+    and logging the throughput and estimated time remaining every report_interval seconds.
+    """
+    def __init__(self, exporter: SpreadsheetExporter, ledger: CheckpointLedger, workers: int = 4,
+                 report_interval: float = 60, logger_name: str = __name__):
+        self.exporter = exporter
+        self.ledger = ledger
+        self.workers = workers
+        self.report_interval = report_interval
+        self.logger = SessionContext.register_logger(logger_name)
+
+    def run(self, targets: List[ReexportTarget]) -> ReexportSummary:
+        targets = list(dict.fromkeys(targets))
+        exported = self.ledger.exported()
+        pending = [target for target in targets if target not in exported]
+        summary = ReexportSummary(total=len(targets), skipped=len(targets) - len(pending))
+        self.logger.info(f'Re-exporting {len(pending)} spreadsheets, {summary.skipped} already exported')
+        start = time.monotonic()
+        last_report = start
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='SpreadsheetReexport') as executor:
+            futures = [executor.submit(self.__reexport, target) for target in pending]
+            for future in as_completed(futures):
+                if future.result():
+                    summary.exported += 1
+                else:
+                    summary.failed += 1
+                now = time.monotonic()
+                summary.elapsed = now - start
+                if now - last_report >= self.report_interval:
+                    last_report = now
+                    self.logger.info(f'Re-export progress: {summary}')
+        summary.elapsed = time.monotonic() - start
+        return summary
+
+    def __reexport(self, target: ReexportTarget) -> bool:
+        start = time.monotonic()
+        try:
+            self.exporter.export_spreadsheet(target.project_uuid, target.submission_uuid)
+        except Exception as e:
+            error = str(e) if str(e) else e.__class__.__name__
+            self.logger.error(f'Failed to re-export project {target.project_uuid}, submission {target.submission_uuid}: {error}')
+            self.ledger.record(target, FAILED, time.monotonic() - start, error)
+            return False
+        self.logger.info(f'Re-exported project {target.project_uuid}, submission {target.submission_uuid}')
+        self.ledger.record(target, EXPORTED, time.monotonic() - start)
+        return True
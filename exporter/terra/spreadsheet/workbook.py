@@ -0,0 +1,142 @@
+import json
+from tempfile import TemporaryFile
+from typing import Dict, IO, Iterable, List
+
+from hca_ingest.api.ingestapi import IngestApi
+from hca_ingest.downloader.downloader import BORDER_ROW_NO, BORDER_VALUE, DESCRIPTION_ALIGNMENT, DESCRIPTION_FONT, \
+    HEADER_PROTECTION, TITLE_ALIGNMENT, TITLE_FILL, TITLE_FONT
+from hca_ingest.downloader.entity import Entity
+from hca_ingest.downloader.flattener import Flattener
+from hca_ingest.downloader.schema_collector import SchemaCollector
+from hca_ingest.importer.spreadsheet.ingest_workbook import SCHEMAS_WORKSHEET
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+
+from .collector import ConcurrentDataCollector
+
+PROJECT_WORKSHEET = 'Project'
+
+
+class _SpilledWorksheet:
+    """
+    The headers of a worksheet, with its rows spilled to a temporary file as json lines
+    """
+    def __init__(self):
+        self.headers: Dict[str, dict] = {}
+        self.rows: IO = TemporaryFile(mode='w+', encoding='utf-8')
+
+    def add(self, headers: Dict[str, dict], rows: List[dict]):
+        for key, header in headers.items():
+            self.headers.setdefault(key, header)
+        for row in rows:
+            self.rows.write(json.dumps(row))
+            self.rows.write('\n')
+
+    def read_rows(self) -> Iterable[dict]:
+        self.rows.seek(0)
+        for line in self.rows:
+            yield json.loads(line)
+
+    def close(self):
+        self.rows.close()
+
+
+class StreamingWorkbookGenerator:
+    """
+    Generates the metadata spreadsheet of a submission like hca_ingest's WorkbookDownloader,
+    without building the workbook in memory.
+    Entities are flattened one at a time and their rows spilled to temporary files, since the columns of a worksheet
+    are only known once all its rows are flattened. The workbook is then written in write-only mode,
+    row by row, straight to the given file.
+    """
+    def __init__(self, api: IngestApi, fetch_workers: int = 8):
+        self.data_collector = ConcurrentDataCollector(api, fetch_workers)
+        self.schema_collector = SchemaCollector()
+
+    def write_workbook_from_submission(self, submission_uuid: str, path: str):
+        submission_entities = self.data_collector.collect_data_by_submission_uuid(submission_uuid)
+        entities_with_content = [entity for entity in submission_entities.values() if entity.content]
+        schemas = self.schema_collector.get_schemas_for_entities(entities_with_content)
+        self.write_workbook(entities_with_content, schemas, path)
+
+    def write_workbook(self, entities: List[Entity], schemas: dict, path: str):
+        if not schemas:
+            raise ValueError('The schema urls are missing')
+        worksheets = self.__spill_worksheets(entities, schemas)
+        try:
+            workbook = Workbook(write_only=True)
+            for title in sorted(worksheets, key=lambda ws_title: ws_title != PROJECT_WORKSHEET):
+                self.__write_worksheet(workbook.create_sheet(title), worksheets[title])
+            self.__write_schemas_worksheet(workbook.create_sheet(SCHEMAS_WORKSHEET), schemas)
+            workbook.save(path)
+        finally:
+            for worksheet in worksheets.values():
+                worksheet.close()
+
+    @staticmethod
+    def __spill_worksheets(entities: List[Entity], schemas: dict) -> Dict[str, _SpilledWorksheet]:
+        # Flatteners keep the workbook being flattened, so every generation uses its own
+        flattener = Flattener()
+        worksheets: Dict[str, _SpilledWorksheet] = {}
+        try:
+            for entity in entities:
+                flattened = flattener.flatten([entity], schemas)
+                flattened.pop(SCHEMAS_WORKSHEET, None)
+                for title, ws_elements in flattened.items():
+                    worksheet = worksheets.setdefault(title, _SpilledWorksheet())
+                    worksheet.add(ws_elements.get('headers', {}), ws_elements.get('values', []))
+        except Exception:
+            for worksheet in worksheets.values():
+                worksheet.close()
+            raise
+        return worksheets
+
+    @staticmethod
+    def __write_worksheet(worksheet: WriteOnlyWorksheet, spilled: _SpilledWorksheet):
+        headers = spilled.headers
+        titles, descriptions, guides, keys = [], [], [], []
+        for column, (key, header_info) in enumerate(headers.items(), start=1):
+            title = header_info.get('user_friendly', '')
+            if header_info.get('required', False):
+                title = f'{title} (Required)'
+            titles.append(StreamingWorkbookGenerator.__cell(worksheet, title, font=TITLE_FONT, fill=TITLE_FILL, alignment=TITLE_ALIGNMENT))
+            descriptions.append(StreamingWorkbookGenerator.__cell(worksheet, header_info.get('description', ''), font=DESCRIPTION_FONT, alignment=DESCRIPTION_ALIGNMENT))
+            guides.append(StreamingWorkbookGenerator.__cell(worksheet, StreamingWorkbookGenerator.__guide(header_info), font=DESCRIPTION_FONT, alignment=DESCRIPTION_ALIGNMENT))
+            keys.append(StreamingWorkbookGenerator.__cell(worksheet, key, protection=HEADER_PROTECTION))
+            # Column widths can only be set before the first row is written
+            worksheet.column_dimensions[get_column_letter(column)].width = max(len(title), len(key))
+        border_row = worksheet.row_dimensions[BORDER_ROW_NO]
+        border_row.font = TITLE_FONT
+        border_row.fill = TITLE_FILL
+
+        worksheet.append(titles)
+        worksheet.append(descriptions)
+        worksheet.append(guides)
+        worksheet.append(keys)
+        worksheet.append([StreamingWorkbookGenerator.__cell(worksheet, BORDER_VALUE, font=TITLE_FONT, fill=TITLE_FILL)])
+        for row in spilled.read_rows():
+            worksheet.append([row.get(key) for key in headers])
+
+    @staticmethod
+    def __write_schemas_worksheet(worksheet: WriteOnlyWorksheet, schemas: dict):
+        worksheet.append([SCHEMAS_WORKSHEET])
+        for schema_url in schemas:
+            worksheet.append([schema_url])
+
+    @staticmethod
+    def __guide(header_info: dict) -> str:
+        descriptions = []
+        if header_info.get('guidelines'):
+            descriptions.append(header_info['guidelines'])
+        if header_info.get('example'):
+            descriptions.append(f'For example: {header_info["example"]}')
+        return ' '.join(descriptions)
+
+    @staticmethod
+    def __cell(worksheet: WriteOnlyWorksheet, value, **styles) -> WriteOnlyCell:
+        cell = WriteOnlyCell(worksheet, value=value)
+        for name, style in styles.items():
+            setattr(cell, name, style)
+        return cell
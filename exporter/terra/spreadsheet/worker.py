@@ -0,0 +1,58 @@
+import threading
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Optional
+
+from hca_ingest.api.ingestapi import IngestApi
+
+from exporter.metadata.checksums import FileChecksums, StreamingChecksums
+from exporter.utils import init_token_manager
+
+from .workbook import StreamingWorkbookGenerator
+
+# The generator of a spreadsheet worker process, created by init_worker
+_generator: Optional[StreamingWorkbookGenerator] = None
+
+
+@dataclass
+class SpreadsheetDigest:
+    checksums: FileChecksums
+    size: int
+
+
+def build_spreadsheet(generator: StreamingWorkbookGenerator, submission_uuid: str, path: str) -> SpreadsheetDigest:
+    generator.write_workbook_from_submission(submission_uuid, path)
+    with open(path, 'rb') as spreadsheet_file:
+        digest = StreamingChecksums().read(spreadsheet_file)
+    return SpreadsheetDigest(digest.file_checksums(s3_etag='n/a - not in s3'), digest.size)
+
+
+def init_worker(ingest_api_url: str, fetch_workers: int):
+    """
+    Initializer of spreadsheet worker processes. The ingest client is not picklable,
+    so every worker process creates its own from the ingest url and the service credentials in its environment.
+    """
+    global _generator
+    ingest_api = IngestApi(url=ingest_api_url, token_manager=init_token_manager())
+    _generator = StreamingWorkbookGenerator(ingest_api, fetch_workers)
+
+
+def build_spreadsheet_in_worker(submission_uuid: str, path: str) -> SpreadsheetDigest:
+    """
+    Builds and checksums the spreadsheet in a worker process, only the digest is sent back
+    """
+    if _generator is None:
+        raise RuntimeError('The spreadsheet worker process was not initialised with init_worker')
+    return build_spreadsheet(_generator, submission_uuid, path)
+
+
+def shutdown_process_pool(process_pool: Executor, timeout: float):
+    """
+    Waits up to timeout seconds for the spreadsheets being built, then cancels the builds that have not started.
+    Builds already running in a worker process cannot be interrupted.
+    """
+    shutdown = threading.Thread(target=process_pool.shutdown, name='SpreadsheetPoolShutdown', daemon=True)
+    shutdown.start()
+    shutdown.join(timeout)
+    if shutdown.is_alive():
+        process_pool.shutdown(wait=False, cancel_futures=True)
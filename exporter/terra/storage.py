@@ -1,7 +1,7 @@
 import json
 import logging
 from io import StringIO
-from typing import Iterable, Dict, Tuple
+from typing import Iterable, Dict, Optional, Tuple
 
 import requests
 from jsonschema.exceptions import ValidationError
@@ -31,7 +31,7 @@ class TerraStorageClient:
 
     def write_metadata(self, metadata: MetadataResource, project_uuid: str, overwrite=False):
         # TODO1: only proceed if lastContentModified > last
-        dest_object_key = f'{project_uuid}/metadata/{metadata.concrete_type()}/{metadata.uuid}_{metadata.dcp_version}.json'
+        dest_object_key = self.metadata_object_key(metadata, project_uuid)
 
         metadata_json = metadata.get_content(with_provenance=True)
         data_stream = self.dict_to_json_stream(metadata_json)
@@ -45,18 +45,37 @@ class TerraStorageClient:
             self.write_file_descriptor(metadata, project_uuid, overwrite=overwrite)
 
     def write_links(self, link_set: LinkSet, process_uuid: str, process_version: str, project_uuid: str):
-        dest_object_key = f'{project_uuid}/links/{process_uuid}_{process_version}_{project_uuid}.json'
+        dest_object_key = self.links_object_key(process_uuid, process_version, project_uuid)
         links_json = self.generate_links_json(link_set)
         data_stream = self.dict_to_json_stream(links_json)
         self.write_to_staging_bucket(dest_object_key, data_stream)
 
     def write_file_descriptor(self, file_metadata: MetadataResource, project_uuid: str, overwrite=False):
-        dest_object_key = f'{project_uuid}/descriptors/{file_metadata.concrete_type()}/{file_metadata.uuid}_{file_metadata.dcp_version}.json'
+        dest_object_key = self.file_descriptor_object_key(file_metadata, project_uuid)
         file_descriptor_json = self.generate_file_descriptor_json(file_metadata)
         self.logger.info(f'Writing file descriptor with dataFileUuid: {file_descriptor_json.get("file_id")}')
         data_stream = self.dict_to_json_stream(file_descriptor_json)
         self.write_to_staging_bucket(dest_object_key, data_stream, overwrite=overwrite)
 
+    @staticmethod
+    def metadata_object_key(metadata: MetadataResource, project_uuid: str) -> str:
+        return f'{project_uuid}/metadata/{metadata.concrete_type()}/{metadata.uuid}_{metadata.dcp_version}.json'
+
+    @staticmethod
+    def links_object_key(process_uuid: str, process_version: str, project_uuid: str) -> str:
+        return f'{project_uuid}/links/{process_uuid}_{process_version}_{project_uuid}.json'
+
+    @staticmethod
+    def file_descriptor_object_key(file_metadata: MetadataResource, project_uuid: str) -> str:
+        return f'{project_uuid}/descriptors/{file_metadata.concrete_type()}/{file_metadata.uuid}_{file_metadata.dcp_version}.json'
+
+    def read_file_descriptor(self, project_uuid: str, concrete_type: str, file_uuid: str, file_version: str) -> Optional[Dict]:
+        object_key = f'{project_uuid}/descriptors/{concrete_type}/{file_uuid}_{file_version}.json'
+        return self.gcs_storage.read_json(self.bucket_name, f"{self.key_prefix}/{object_key}")
+
+    def staging_object_crc32c(self, object_key: str) -> Optional[str]:
+        return self.gcs_storage.get_crc32c(self.bucket_name, f"{self.key_prefix}/{object_key}")
+
     def generate_file_descriptor_json(self, file_metadata) -> Dict:
         file_descriptor = FileDescriptor.from_file_metadata(file_metadata)
 
@@ -70,6 +89,11 @@ class TerraStorageClient:
         self.logger.info(f'{"Overwriting" if overwrite else "Writing"} file: {file_key}')
         self.gcs_storage.write(self.bucket_name, file_key, data_stream, overwrite)
 
+    def delete_from_staging_bucket(self, object_key: str):
+        file_key = f"{self.key_prefix}/{object_key}"
+        self.logger.info(f'Deleting file: {file_key}')
+        self.gcs_storage.delete(self.bucket_name, file_key)
+
     def generate_links_json(self, link_set: LinkSet) -> Dict:
         json_doc = link_set.to_dict()
         json_doc["schema_type"] = "links"
@@ -6,6 +6,7 @@ from hca_ingest.api.ingestapi import IngestApi
 from hca_ingest.utils.token_manager import TokenManager
 
 from exporter.ingest.service import IngestService
+from exporter.lifecycle import LifecycleManager
 from exporter.queue.config import QueueConfig, AmqpConnConfig
 from exporter.queue.connector import QueueConnector
 from exporter.queue.listener import QueueListener
@@ -14,6 +15,7 @@ from exporter.terra.transfer import TerraTransferClient
 
 from .exporter import TerraSubmissionExporter
 from .handler import TerraSubmissionHandler
+from .progress import TransferProgressMonitor
 from .responder import TerraTransferResponder
 from ...utils import init_token_manager
 
@@ -30,7 +32,7 @@ SUBMISSION_QUEUE_CONFIG = QueueConfig(
 )
 
 
-def setup_terra_submissions_exporter() -> Tuple[Thread, Thread]:
+def setup_terra_submissions_exporter(lifecycle: LifecycleManager = None) -> Tuple[Thread, Thread]:
     rabbit_host = os.environ.get('RABBIT_HOST', 'localhost')
     rabbit_port = int(os.environ.get('RABBIT_PORT', '5672'))
     amqp_conn_config = AmqpConnConfig(rabbit_host, rabbit_port)
@@ -42,19 +44,38 @@ def setup_terra_submissions_exporter() -> Tuple[Thread, Thread]:
     ingest_client = IngestApi(ingest_api_url)
     ingest_service = IngestService(ingest_client)
     terra_client = TerraTransferClient.from_env()
-    terra_exporter = TerraSubmissionExporter(ingest_service, terra_client, LOGGER_NAME)
+    progress_monitor = TransferProgressMonitor(
+        terra_client.status_tracker,
+        ingest_service,
+        interval=float(os.environ.get('TRANSFER_PROGRESS_INTERVAL', '60')),
+        write_to_job=os.environ.get('TRANSFER_PROGRESS_IN_JOB_CONTEXT', 'false').lower() == 'true'
+    )
+    terra_exporter = TerraSubmissionExporter(ingest_service, terra_client, LOGGER_NAME,
+                                             list_data_files=terra_client.needs_file_list,
+                                             progress_monitor=progress_monitor)
 
     handler = TerraSubmissionHandler(terra_exporter, ingest_service, LOGGER_NAME)
     listener = QueueListener(SUBMISSION_QUEUE_CONFIG, handler)
     connector = QueueConnector(amqp_conn_config, listener)
 
-    terra_exporter_listener_process = Thread(target=lambda: connector.run())
+    terra_exporter_listener_process = Thread(target=lambda: connector.run(), daemon=True)
     terra_exporter_listener_process.start()
     gcp_config = GcpConfig.from_env()
-    terra_responder = TerraTransferResponder(ingest_service, gcp_config)
-    terra_transfer_complete_listener = Thread(target=lambda: terra_responder.listen())
+    terra_responder = TerraTransferResponder(
+        ingest_service,
+        gcp_config,
+        terra_client,
+        max_messages=int(os.environ.get('TRANSFER_RESPONDER_MAX_MESSAGES', '20')),
+        max_bytes=int(os.environ.get('TRANSFER_RESPONDER_MAX_BYTES', str(10 * 1024 * 1024))),
+        callback_threads=int(os.environ.get('TRANSFER_RESPONDER_THREADS', '10'))
+    )
+    terra_transfer_complete_listener = Thread(target=lambda: terra_responder.listen(), daemon=True)
     terra_transfer_complete_listener.start()
 
+    if lifecycle:
+        lifecycle.add_worker(LOGGER_NAME, terra_exporter_listener_process, listener.stop)
+        lifecycle.add_worker('TerraTransferResponder', terra_transfer_complete_listener, terra_responder.stop)
+        lifecycle.add_flush('TransferProgressMonitor', progress_monitor.stop)
     return terra_exporter_listener_process, terra_transfer_complete_listener
 
 
@@ -4,12 +4,16 @@ from exporter.ingest.service import IngestService
 from exporter.terra.exceptions import SubmissionDoesNotHaveRequiredAction
 from exporter.terra.exceptions import SubmissionDoesNotHaveStagingArea
 from exporter.terra.transfer import TerraTransferClient
+from .progress import TransferProgressMonitor
 
 
 class TerraSubmissionExporter:
-    def __init__(self, ingest_service: IngestService, terra_client: TerraTransferClient, logger_name: str = __name__):
+    def __init__(self, ingest_service: IngestService, terra_client: TerraTransferClient, logger_name: str = __name__,
+                 list_data_files: bool = False, progress_monitor: TransferProgressMonitor = None):
         self.ingest_service = ingest_service
         self.terra_client = terra_client
+        self.list_data_files = list_data_files
+        self.progress_monitor = progress_monitor
         self.logger = logging.getLogger(logger_name)
 
     def start_data_file_transfer(self, job_id: str, submission_uuid: str, project_uuid: str):
@@ -23,4 +27,11 @@ class TerraSubmissionExporter:
         if not upload_area:
             self.logger.error(f"Could not find: stagingDetails.stagingAreaLocation.value: {submission}")
             raise SubmissionDoesNotHaveStagingArea()
-        self.terra_client.transfer_data_files(upload_area, project_uuid, job_id)
+        if self.list_data_files:
+            files = self.ingest_service.get_submission_data_files(submission)
+            transfer_job_names = self.terra_client.transfer_data_files(upload_area, project_uuid, job_id, files)
+        else:
+            transfer_job_names = self.terra_client.transfer_data_files(upload_area, project_uuid, job_id)
+        if transfer_job_names and self.progress_monitor:
+            self.progress_monitor.watch(job_id, transfer_job_names)
+        return transfer_job_names
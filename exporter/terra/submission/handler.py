@@ -35,7 +35,11 @@ class TerraSubmissionHandler(MessageHandler):
         if job.data_file_transfer != ExportContextState.NOT_STARTED:
             self.logger.info(f'Data transfer has already started / finished. Acknowledging message')
             return msg.ack()
-        self.submission_exporter.start_data_file_transfer(export.job_id, export.submission_uuid, export.project_uuid)
+        started = self.submission_exporter.start_data_file_transfer(export.job_id, export.submission_uuid, export.project_uuid)
+        if not started:
+            self.logger.info('No data files to transfer, informing ingest that data transfer is complete')
+            self.ingest_service.set_data_file_transfer(export.job_id, ExportContextState.COMPLETE)
+            return msg.ack()
         self.logger.info('Started data transfer, informing ingest')
         self.ingest_service.set_data_file_transfer(export.job_id, ExportContextState.STARTED)
         self.logger.info('Acknowledging data transfer message')
@@ -0,0 +1,128 @@
+import json
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional
+
+from exporter.ingest.service import IngestService
+from exporter.session_context import SessionContext
+from exporter.terra.gcs.transfer_status import TransferCounters, TransferStatusTracker
+
+
+@dataclass
+class TransferProgress:
+    export_job_id: str
+    objects_found: int
+    objects_copied: int
+    objects_failed: int
+    bytes_found: int
+    bytes_copied: int
+    bytes_failed: int
+    bytes_per_second: float
+    eta_seconds: Optional[float]
+    done: bool
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+@dataclass
+class _WatchedTransfer:
+    job_names: List[str]
+    last_sample: float
+    last_bytes_copied: int = 0
+    bytes_per_second: float = 0
+
+
+class TransferProgressMonitor:
+    """
+    Follows the data file transfers of export jobs from their transfer operation counters.
+    Every interval seconds the progress of each watched export job, with the copy rate and the estimated time
+    until completion, is logged as a metrics line and, with write_to_job, written to the export job context.
+    The rate is smoothed over samples, since operation counters are only updated every few minutes.
+    """
+    def __init__(self, status_tracker: TransferStatusTracker, ingest_service: IngestService = None,
+                 interval: float = 60, write_to_job: bool = False, smoothing: float = 0.3,
+                 logger_name: str = 'TransferProgress'):
+        self.status_tracker = status_tracker
+        self.ingest_service = ingest_service
+        self.interval = interval
+        self.write_to_job = write_to_job
+        self.smoothing = smoothing
+        self.logger = SessionContext.register_logger(logger_name)
+        self.watched: Dict[str, _WatchedTransfer] = {}
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.reporter: Optional[threading.Thread] = None
+
+    def watch(self, export_job_id: str, job_names: List[str]):
+        with self.lock:
+            self.watched[export_job_id] = _WatchedTransfer(list(job_names), time.monotonic())
+            if not self.reporter or not self.reporter.is_alive():
+                self.reporter = threading.Thread(target=self.__run_reports, name='TransferProgressMonitor', daemon=True)
+                self.reporter.start()
+
+    def progress(self, export_job_id: str) -> Optional[TransferProgress]:
+        with self.lock:
+            watched = self.watched.get(export_job_id)
+        if not watched:
+            return None
+        statuses = [self.status_tracker.status(job_name) for job_name in watched.job_names]
+        counters = TransferCounters()
+        for status in statuses:
+            counters += status.counters
+        now = time.monotonic()
+        elapsed = now - watched.last_sample
+        if elapsed > 0 and counters.bytes_copied >= watched.last_bytes_copied:
+            rate = (counters.bytes_copied - watched.last_bytes_copied) / elapsed
+            watched.bytes_per_second = rate if not watched.bytes_per_second else \
+                self.smoothing * rate + (1 - self.smoothing) * watched.bytes_per_second
+        watched.last_sample = now
+        watched.last_bytes_copied = counters.bytes_copied
+        remaining = max(counters.bytes_found - counters.bytes_copied - counters.bytes_failed, 0)
+        return TransferProgress(
+            export_job_id=export_job_id,
+            objects_found=counters.objects_found,
+            objects_copied=counters.objects_copied,
+            objects_failed=counters.objects_failed,
+            bytes_found=counters.bytes_found,
+            bytes_copied=counters.bytes_copied,
+            bytes_failed=counters.bytes_failed,
+            bytes_per_second=round(watched.bytes_per_second, 1),
+            eta_seconds=round(remaining / watched.bytes_per_second) if watched.bytes_per_second else None,
+            done=len(statuses) > 0 and all(status.done for status in statuses)
+        )
+
+    def report(self):
+        with self.lock:
+            export_job_ids = list(self.watched)
+        for export_job_id in export_job_ids:
+            try:
+                self.__report(export_job_id)
+            except Exception as e:
+                self.logger.error(f'Could not report transfer progress of export job {export_job_id}: '
+                                  f'{str(e) if str(e) else e.__class__.__name__}')
+
+    def stop(self, timeout: float = None):
+        self.stopped.set()
+        if self.reporter:
+            self.reporter.join(timeout)
+
+    def __report(self, export_job_id: str):
+        progress = self.progress(export_job_id)
+        if not progress:
+            return
+        self.logger.info(f'transfer_progress {json.dumps(progress.to_dict())}')
+        if self.write_to_job and self.ingest_service:
+            self.ingest_service.set_data_file_transfer_progress(export_job_id, progress.to_dict())
+        if progress.done:
+            with self.lock:
+                self.watched.pop(export_job_id, None)
+
+    def __run_reports(self):
+        while not self.stopped.wait(self.interval):
+            self.report()
+            with self.lock:
+                if not self.watched:
+                    self.reporter = None
+                    return
@@ -1,22 +1,49 @@
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 
 from google.api_core.exceptions import AlreadyExists
 from google.cloud.pubsub_v1 import SubscriberClient
 from google.cloud.pubsub_v1.subscriber.message import Message
+from google.cloud.pubsub_v1.subscriber.scheduler import ThreadScheduler
+from google.cloud.pubsub_v1.types import FlowControl
 from google.oauth2.service_account import Credentials
 
 from exporter.ingest.export_job import ExportContextState, ExportJob
 from exporter.ingest.service import IngestService
 from exporter.session_context import SessionContext
 from exporter.terra.gcs.config import GcpConfig
+from exporter.terra.gcs.transfer_shards import TransferJobName
+from exporter.terra.transfer import TerraTransferClient
 
 
 class TerraTransferResponder:
-    def __init__(self, ingest_service: IngestService, gcp_config: GcpConfig):
+    """
+    Handles the Storage Transfer Service notifications that a transfer job has finished.
+    At most max_messages messages, of at most max_bytes in total, are leased at once
+    and handled by a pool of callback_threads threads.
+    The Pub/Sub client already batches the acknowledgements of handled messages into periodic requests.
+    When the stream fails, the subscriber reconnects with an exponential backoff of up to max_backoff seconds,
+    the backoff is reset once a stream has stayed up for max_backoff seconds.
+    The notification of a transfer shard whose other shards are still copying is redelivered after shard_wait seconds,
+    at most 600 as allowed for an ack deadline.
+    """
+    def __init__(self, ingest_service: IngestService, gcp_config: GcpConfig, transfer_client: TerraTransferClient,
+                 max_messages: int = 20, max_bytes: int = 10 * 1024 * 1024, callback_threads: int = 10,
+                 min_backoff: float = 1, max_backoff: float = 60, shard_wait: int = 60):
         self.ingest = ingest_service
+        self.transfer_client = transfer_client
+        self.flow_control = FlowControl(max_messages=max_messages, max_bytes=max_bytes)
+        self.callback_threads = callback_threads
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.shard_wait = shard_wait
         self.subscription_path = SubscriberClient.subscription_path(gcp_config.gcp_project, gcp_config.gcp_topic)
         topic_path = SubscriberClient.topic_path(gcp_config.gcp_project, gcp_config.gcp_topic)
         self.logger = SessionContext.register_logger("TerraTransferResponder")
+        self.stopping = threading.Event()
 
         with open(gcp_config.gcp_credentials_path) as source:
             credentials_file = json.load(source)
@@ -31,25 +58,51 @@ class TerraTransferResponder:
                 self.logger.info(f'Cannot check whether subscription exists: {self.subscription_path} due to {str(e) if str(e) else e.__class__.__name__}')
 
     def listen(self):
-        while True:
-            with SubscriberClient(credentials=self.credentials) as subscriber:
-                future = subscriber.subscribe(self.subscription_path, callback=self.handle_message)
-                try:
-                    self.logger.info(f'Running Google Data Transfer Listener')
-                    future.result()
-                except Exception as e:
-                    self.logger.error(f'Google Data Transfer Listener stopped due to: {str(e) if str(e) else e.__class__.__name__}')
-                    future.cancel()
+        backoff = self.min_backoff
+        while not self.stopping.is_set():
+            started = time.monotonic()
+            self.__subscribe()
+            if time.monotonic() - started >= self.max_backoff:
+                backoff = self.min_backoff
+            if self.stopping.is_set():
+                break
+            self.logger.info(f'Reconnecting Google Data Transfer Listener in {backoff} seconds')
+            self.stopping.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+        self.logger.info(f'Google Data Transfer Listener stopped')
+
+    def __subscribe(self):
+        scheduler = ThreadScheduler(executor=ThreadPoolExecutor(
+            max_workers=self.callback_threads,
+            thread_name_prefix='TerraTransferResponder'
+        ))
+        with SubscriberClient(credentials=self.credentials) as subscriber:
+            future = subscriber.subscribe(self.subscription_path, callback=self.handle_message,
+                                          flow_control=self.flow_control, scheduler=scheduler,
+                                          await_callbacks_on_shutdown=True)
+            try:
+                self.logger.info(f'Running Google Data Transfer Listener')
+                while not self.stopping.wait(1):
+                    if future.done():
+                        future.result()
+                        break
+            except Exception as e:
+                self.logger.error(f'Google Data Transfer Listener stopped due to: {str(e) if str(e) else e.__class__.__name__}')
+            # Blocks until the messages being handled are done
+            future.cancel()
+
+    def stop(self, drain_timeout: float = None):
+        self.stopping.set()
 
     def handle_message(self, message: Message):
         if message.attributes.get("eventType", "") != "TRANSFER_OPERATION_SUCCESS":
             self.logger.error(f'Received unexpected message: {message.attributes}')
             return message.nack()
-        transfer_name = message.attributes.get("transferJobName", "")
-        if not transfer_name.startswith('transferJobs/'):
+        transfer_job_name = TransferJobName.parse(message.attributes.get("transferJobName", ""))
+        if not transfer_job_name:
             self.logger.error(f'Could not parse message: {message.attributes}')
             return message.nack()
-        export_job_id = transfer_name.replace('transferJobs/', '')
+        export_job_id = transfer_job_name.export_job_id
         with SessionContext(logger=self.logger, context={'export_job_id': export_job_id}):
             job = self.ingest.get_job_if_exists(export_job_id)
             if not job:
@@ -61,6 +114,17 @@ class TerraTransferResponder:
             if job.data_file_transfer == ExportContextState.COMPLETE:
                 self.logger.info(f'Export Job data file transfer already complete. Acknowledging message')
                 return message.ack()
+            if transfer_job_name.is_shard:
+                shard_statuses = self.transfer_client.other_shard_statuses(transfer_job_name)
+                failed_shards = [status.job_name for status in shard_statuses if status.failed]
+                if failed_shards:
+                    return self.handle_data_transfer_failed(message, job, failed_shards)
+                if not all(status.done for status in shard_statuses):
+                    # Redelivered until the other shards look done, so the notification of the last shard is never lost.
+                    # A nack would be redelivered immediately, the lease is released to expire after shard_wait instead
+                    self.logger.info(f'Data transfer shard {transfer_job_name.shard} of {transfer_job_name.shard_count} complete, waiting for the other shards. Redelivering message in {self.shard_wait} seconds')
+                    message.modify_ack_deadline(self.shard_wait)
+                    return message.drop()
             self.handle_data_transfer_complete(message, job)
 
     def handle_data_transfer_complete(self, message: Message, export_job: ExportJob):
@@ -68,3 +132,9 @@ class TerraTransferResponder:
         self.ingest.set_data_file_transfer(export_job.job_id, ExportContextState.COMPLETE)
         self.logger.info(f'Acknowledging data transfer complete message')
         message.ack()
+
+    def handle_data_transfer_failed(self, message: Message, export_job: ExportJob, failed_shards: List[str]):
+        # The data file transfer is left incomplete, the files of the failed shards are missing from the sink
+        self.logger.error(f'Data transfer shards failed: {", ".join(failed_shards)}. Failing export job')
+        self.ingest.fail_job(export_job.job_id)
+        message.ack()
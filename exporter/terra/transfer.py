@@ -1,13 +1,20 @@
+import logging
 import os
-from typing import Tuple
+from typing import Dict, List, Tuple
 
+from exporter.metadata.datafile import DataFile
 from .gcs.config import GcpConfig
+from .gcs.exceptions import FileTransferAlreadyExists
+from .gcs.storage import GcsStorage
 from .gcs.transfer import GcsTransfer
 from .gcs.transfer_job import TransferJob
+from .gcs.transfer_shards import MAX_INCLUDE_PREFIXES, TransferJobName, TransferShardPlanner
+from .gcs.transfer_status import TransferStatusTracker, TransferStatus
 
 
 class TerraTransferClient:
-    def __init__(self, gcs_transfer: GcsTransfer, aws_access_key_id: str, aws_access_key_secret: str, gcs_project_id: str, gcs_dest_bucket: str, gcs_dest_prefix: str, notification_topic: str):
+    def __init__(self, gcs_transfer: GcsTransfer, aws_access_key_id: str, aws_access_key_secret: str, gcs_project_id: str, gcs_dest_bucket: str, gcs_dest_prefix: str, notification_topic: str,
+                 shards: int = 1, shard_threshold: int = 10000, delta: bool = False, gcs_storage: GcsStorage = None):
         self.gcs_transfer = gcs_transfer
         self.aws_access_key_id = aws_access_key_id
         self.aws_access_key_secret = aws_access_key_secret
@@ -15,6 +22,13 @@ class TerraTransferClient:
         self.gcs_dest_bucket = gcs_dest_bucket
         self.gcs_bucket_prefix = gcs_dest_prefix
         self.notification_topic = notification_topic
+        self.shards = shards
+        self.shard_threshold = shard_threshold
+        self.delta = delta
+        # Files already in the sink with a matching crc32c are skipped by delta transfers when given
+        self.gcs_storage = gcs_storage
+        self.status_tracker = TransferStatusTracker(gcs_transfer, gcs_project_id)
+        self.logger = logging.getLogger(__name__)
 
     @staticmethod
     def from_env():
@@ -24,35 +38,116 @@ class TerraTransferClient:
         gcs_transfer = GcsTransfer(gcp_config.gcp_credentials_path)
         terra_bucket_name = os.environ['TERRA_BUCKET_NAME']
         terra_bucket_prefix = os.environ['TERRA_BUCKET_PREFIX']
+        shards = int(os.environ.get('TERRA_TRANSFER_SHARDS', '1'))
+        shard_threshold = int(os.environ.get('TERRA_TRANSFER_SHARD_THRESHOLD', '10000'))
+        delta = os.environ.get('TERRA_TRANSFER_DELTA', 'false').lower() == 'true'
+        skip_unchanged = os.environ.get('TERRA_TRANSFER_SKIP_UNCHANGED', 'false').lower() == 'true'
+        gcs_storage = GcsStorage(gcp_config.gcp_project, gcp_config.gcp_credentials_path) if delta and skip_unchanged else None
 
-        return TerraTransferClient(gcs_transfer, aws_access_key_id, aws_access_key_secret, gcp_config.gcp_project, terra_bucket_name, terra_bucket_prefix, gcp_config.gcp_topic)
+        return TerraTransferClient(gcs_transfer, aws_access_key_id, aws_access_key_secret, gcp_config.gcp_project, terra_bucket_name, terra_bucket_prefix, gcp_config.gcp_topic,
+                                   shards=shards, shard_threshold=shard_threshold, delta=delta, gcs_storage=gcs_storage)
 
-    def transfer_data_files(self, upload_area: str, project_uuid, export_job_id: str):
-        transfer_job = self.__get_transfer_job(upload_area, project_uuid, export_job_id)
+    @property
+    def sharding_enabled(self) -> bool:
+        return self.shards > 1
+
+    @property
+    def needs_file_list(self) -> bool:
+        return self.sharding_enabled or self.delta
+
+    def transfer_data_files(self, upload_area: str, project_uuid, export_job_id: str, files: List[DataFile] = None) -> List[str]:
+        """
+        :param files: the data files of the submission, when given the transfer is either
+                      limited to these files in delta mode or split into shards from shard_threshold files
+        :return: the names of the transfer jobs, empty if there was nothing to transfer
+        """
+        if self.delta and files is not None:
+            return self.__transfer_delta(upload_area, project_uuid, export_job_id, files)
+        if self.sharding_enabled and files and len(files) >= self.shard_threshold:
+            return self.__transfer_data_file_shards(upload_area, project_uuid, export_job_id, self.__sizes_by_name(files), self.shards)
+        transfer_job = self.__get_transfer_job(upload_area, project_uuid, TransferJobName(export_job_id))
         self.gcs_transfer.start_job(transfer_job)
+        self.status_tracker.track(transfer_job.name)
+        return [transfer_job.name]
+
+    def other_shard_statuses(self, transfer_job_name: TransferJobName) -> List[TransferStatus]:
+        """
+        The statuses of the other shards of the group of transfer_job_name. The shard of transfer_job_name is
+        the one that notified its completion, so it is done even before its operation is listed as done.
+        """
+        other_shards = [shard.name for shard in transfer_job_name.group() if shard.name != transfer_job_name.name]
+        statuses = self.status_tracker.job_statuses(other_shards) if other_shards else {}
+        return list(statuses.values())
+
+    def __transfer_delta(self, upload_area: str, project_uuid: str, export_job_id: str, files: List[DataFile]) -> List[str]:
+        if self.gcs_storage:
+            files = self.__changed_files(project_uuid, files)
+        if not files:
+            self.logger.info(f'All data files are already in the sink, nothing to transfer')
+            return []
+        # Like a full transfer, the changed files are only sharded when they do not fit in one job
+        fits_one_job = len(files) < self.shard_threshold and len(files) <= MAX_INCLUDE_PREFIXES
+        shards = 1 if fits_one_job else self.shards
+        return self.__transfer_data_file_shards(upload_area, project_uuid, export_job_id, self.__sizes_by_name(files), shards)
+
+    def __changed_files(self, project_uuid: str, files: List[DataFile]) -> List[DataFile]:
+        sink_crc32c = self.gcs_storage.list_crc32c(self.gcs_dest_bucket, self.__dest_path(project_uuid))
+        changed = [
+            file for file in files
+            if file.file_name not in sink_crc32c or sink_crc32c[file.file_name] != file.checksums.crc32c_base64()
+        ]
+        self.logger.info(f'{len(files) - len(changed)} of {len(files)} data files are unchanged in the sink')
+        return changed
 
-    def is_transfer_done(self, export_job_id: str):
-        return self.gcs_transfer.is_job_complete(self.gcs_project_id, export_job_id)
+    @staticmethod
+    def __sizes_by_name(files: List[DataFile]) -> Dict[str, int]:
+        return {file.file_name: file.size for file in files}
+
+    def __transfer_data_file_shards(self, upload_area: str, project_uuid: str, export_job_id: str, files: Dict[str, int],
+                                    shard_count: int) -> List[str]:
+        shards = TransferShardPlanner(shard_count).plan(files)
+        job_names = []
+        self.logger.info(f'Transferring {len(files)} data files in {len(shards)} shards')
+        for shard, include_prefixes in enumerate(shards, start=1):
+            if len(shards) == 1:
+                transfer_job_name = TransferJobName(export_job_id)
+            else:
+                transfer_job_name = TransferJobName(export_job_id, shard, len(shards))
+            transfer_job = self.__get_transfer_job(upload_area, project_uuid, transfer_job_name, include_prefixes)
+            try:
+                self.gcs_transfer.start_job(transfer_job)
+            except FileTransferAlreadyExists:
+                # Started before the message was redelivered
+                self.logger.info(f'Transfer job already exists: {transfer_job.name}')
+            self.status_tracker.track(transfer_job.name)
+            job_names.append(transfer_job.name)
+        return job_names
 
-    def __get_transfer_job(self, upload_area: str, project_uuid: str, export_job_id: str) -> TransferJob:
+    def __get_transfer_job(self, upload_area: str, project_uuid: str, transfer_job_name: TransferJobName,
+                           include_prefixes: List[str] = None) -> TransferJob:
         source_bucket, upload_area_key = self.bucket_and_key_for_upload_area(upload_area)
+        description = f'Transfer job for ingest upload-service area {upload_area_key} and export-job-id {transfer_job_name.export_job_id}'
+        if transfer_job_name.is_shard:
+            description = f'{description}, shard {transfer_job_name.shard} of {transfer_job_name.shard_count}'
         return TransferJob(
-            name=f'transferJobs/{export_job_id}',
-            description=f'Transfer job for ingest upload-service area {upload_area_key} and export-job-id {export_job_id}',
+            name=transfer_job_name.name,
+            description=description,
             project_id=self.gcs_project_id,
             source_bucket=source_bucket,
             source_path=f'{upload_area_key}/',
             aws_access_key_id=self.aws_access_key_id,
             aws_access_key_secret=self.aws_access_key_secret,
             dest_bucket=self.gcs_dest_bucket,
-            dest_path=f'{self.gcs_bucket_prefix}/{project_uuid}/data/',
-            notification_topic=self.notification_topic
+            dest_path=self.__dest_path(project_uuid),
+            notification_topic=self.notification_topic,
+            include_prefixes=include_prefixes
         )
 
+    def __dest_path(self, project_uuid: str) -> str:
+        return f'{self.gcs_bucket_prefix}/{project_uuid}/data/'
+
     @staticmethod
     def bucket_and_key_for_upload_area(upload_area: str) -> Tuple[str, str]:
         bucket_and_key_str = upload_area.split("//")[1]
         bucket_and_key_list = bucket_and_key_str.split("/", 1)
         return bucket_and_key_list[0], bucket_and_key_list[1].split("/")[0]
-
-
@@ -1,18 +1,22 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from threading import Thread
 
 from hca_ingest.api.ingestapi import IngestApi
 from kombu import Connection
 
-from exporter.graph.crawler import GraphCrawler
+from exporter.graph.crawler import EXPERIMENT_GRAPH_CACHE, GraphCrawler
+from exporter.lifecycle import LifecycleManager
 from exporter.metadata.service import MetadataService
 from exporter.queue.config import QueueConfig
+from exporter.queue.publisher import QueuePublisher
 from manifest.exporter import ManifestExporter
 from manifest.generator import ManifestGenerator
 from manifest.receiver import ManifestReceiver
 
 DEFAULT_RABBIT_URL = os.path.expandvars(
     os.environ.get('RABBIT_URL', 'amqp://localhost:5672'))
+PUBLISH_CONFIRMS = os.environ.get('RABBIT_PUBLISH_CONFIRMS', 'false').lower() == 'true'
 EXCHANGE = 'ingest.exporter.exchange'
 RETRY_POLICY = {
     'interval_start': 0,
@@ -37,14 +41,26 @@ ASSAY_COMPLETE_CONFIG = QueueConfig(
 )
 
 
-def setup_manifest_receiver() -> Thread:
+def setup_manifest_receiver(lifecycle: LifecycleManager = None) -> Thread:
     ingest_client = IngestApi()
+    workers = int(os.environ.get('MANIFEST_WORKERS', '4'))
+    prefetch_count = int(os.environ.get('MANIFEST_PREFETCH', str(workers)))
+    metadata_batch_pages = os.environ.get('METADATA_BATCH_PAGES', 'true').lower() == 'true'
 
     with Connection(DEFAULT_RABBIT_URL) as conn:
-        manifest_generator = ManifestGenerator(ingest_client, GraphCrawler(MetadataService(ingest_client)))
+        manifest_generator = ManifestGenerator(ingest_client, GraphCrawler(MetadataService(ingest_client, metadata_batch_pages), EXPERIMENT_GRAPH_CACHE))
         exporter = ManifestExporter(ingest_api=ingest_client, manifest_generator=manifest_generator)
-        manifest_receiver = ManifestReceiver(conn, [ASSAY_QUEUE_CONFIG], exporter=exporter, publish_config=ASSAY_COMPLETE_CONFIG)
-        manifest_process = Thread(target=manifest_receiver.run)
+        publisher = QueuePublisher(DEFAULT_RABBIT_URL, confirm_publish=PUBLISH_CONFIRMS, logger_name='ManifestExporter')
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ManifestExporter') if workers > 1 else None
+        manifest_receiver = ManifestReceiver(conn, [ASSAY_QUEUE_CONFIG], exporter=exporter,
+                                             publish_config=ASSAY_COMPLETE_CONFIG, publisher=publisher,
+                                             executor=executor, prefetch_count=prefetch_count)
+        manifest_process = Thread(target=manifest_receiver.run, daemon=True)
         manifest_process.start()
 
+        if lifecycle:
+            lifecycle.add_worker('ManifestExporter', manifest_process, manifest_receiver.stop)
+            lifecycle.add_flush('ManifestExporter publisher', publisher.close)
+            if executor:
+                lifecycle.add_flush('ManifestExporter executor', lambda _: executor.shutdown(wait=False))
         return manifest_process
@@ -1,4 +1,5 @@
 import logging
+from functools import cached_property
 
 from hca_ingest.api.ingestapi import IngestApi
 
@@ -12,7 +13,19 @@ class ManifestExporter:
         self.manifest_generator = manifest_generator
 
     def export(self, process_uuid: str, submission_uuid: str):
-        assay_manifest = self.manifest_generator.generate_manifest(process_uuid, submission_uuid)
-        assay_manifest_resource = self.ingest_api.create_bundle_manifest(assay_manifest)
+        assay_manifest_json = self.manifest_generator.generate_manifest_json(process_uuid, submission_uuid)
+        assay_manifest_resource = self.create_bundle_manifest(assay_manifest_json)
         assay_manifest_url = assay_manifest_resource['_links']['self']['href']
         self.logger.info(f"Assay manifest was created: {assay_manifest_url}")
+
+    @cached_property
+    def bundle_manifests_url(self) -> str:
+        # Looked up once, the links of the ingest root do not change
+        bundle_manifests_link = self.ingest_api.get_link_from_resource_url(self.ingest_api.url, 'bundleManifests')
+        return bundle_manifests_link.rsplit('{')[0]
+
+    def create_bundle_manifest(self, assay_manifest_json: str) -> dict:
+        # IngestApi.create_bundle_manifest serializes a manifest object, the payload here is already serialized
+        response = self.ingest_api.post(self.bundle_manifests_url, data=assay_manifest_json.encode('utf-8'),
+                                        headers=self.ingest_api.get_headers())
+        return response.json()
@@ -1,12 +1,10 @@
-from typing import Dict, List
-
 from hca_ingest.api.ingestapi import IngestApi
 
 from exporter.graph.crawler import GraphCrawler
 from exporter.graph.experiment import ExperimentGraph
 from exporter.metadata.datafile import DataFile
 from exporter.metadata.resource import MetadataResource
-from manifest.manifests import AssayManifest
+from manifest.manifests import AssayManifest, AssayManifestBuilder
 
 
 class ManifestGenerator:
@@ -15,13 +13,17 @@ class ManifestGenerator:
         self.graph_crawler = graph_crawler
 
     def generate_manifest(self, process_uuid: str, submission_uuid: str) -> AssayManifest:
+        return self.generate_manifest_builder(process_uuid, submission_uuid).build()
+
+    def generate_manifest_json(self, process_uuid: str, submission_uuid: str) -> str:
+        return self.generate_manifest_builder(process_uuid, submission_uuid).to_json()
+
+    def generate_manifest_builder(self, process_uuid: str, submission_uuid: str) -> AssayManifestBuilder:
         process = self.get_process(process_uuid)
         project = self.project_for_process(process)
 
         experiment_graph = self.graph_crawler.generate_complete_experiment_graph(process, project)
-        assay_manifest = ManifestGenerator.assay_manifest_from_experiment_graph(experiment_graph, submission_uuid)
-
-        return assay_manifest
+        return ManifestGenerator.assay_manifest_builder_from_experiment_graph(experiment_graph, submission_uuid)
 
     def get_process(self, process_uuid: str) -> MetadataResource:
         return MetadataResource.from_dict(self.ingest_client.get_entity_by_uuid('processes', process_uuid))
@@ -31,20 +33,12 @@ class ManifestGenerator:
 
     @staticmethod
     def assay_manifest_from_experiment_graph(experiment_graph: ExperimentGraph, submission_uuid: str) -> AssayManifest:
-        assay_manifest = AssayManifest()
-        assay_manifest.envelopeUuid = submission_uuid
-
-        assay_manifest.fileProjectMap.update(ManifestGenerator.metadata_uuid_map_from_graph(experiment_graph, "project"))
-        assay_manifest.fileBiomaterialMap.update(ManifestGenerator.metadata_uuid_map_from_graph(experiment_graph, "biomaterial"))
-        assay_manifest.fileProcessMap.update(ManifestGenerator.metadata_uuid_map_from_graph(experiment_graph, "process"))
-        assay_manifest.fileProtocolMap.update(ManifestGenerator.metadata_uuid_map_from_graph(experiment_graph, "protocol"))
-        assay_manifest.fileFilesMap.update(ManifestGenerator.metadata_uuid_map_from_graph(experiment_graph, "file"))
-
-        assay_manifest.dataFiles = [DataFile.from_file_metadata(m).uuid for m in experiment_graph.nodes.get_nodes()
-                                    if m.metadata_type == "file"]
-
-        return assay_manifest
+        return ManifestGenerator.assay_manifest_builder_from_experiment_graph(experiment_graph, submission_uuid).build()
 
     @staticmethod
-    def metadata_uuid_map_from_graph(experiment_graph: ExperimentGraph, metadata_type: str) -> Dict[str, List[str]]:
-        return dict([(m.uuid, [m.uuid]) for m in experiment_graph.nodes.get_nodes() if m.metadata_type == metadata_type])
+    def assay_manifest_builder_from_experiment_graph(experiment_graph: ExperimentGraph, submission_uuid: str) -> AssayManifestBuilder:
+        builder = AssayManifestBuilder(submission_uuid)
+        for metadata_type, nodes in experiment_graph.nodes.nodes_by_type().items():
+            builder.add_uuids(metadata_type, (m.uuid for m in nodes))
+        builder.add_data_files(DataFile.data_file_uuid(m) for m in experiment_graph.nodes.nodes_of_type("file"))
+        return builder
@@ -1,3 +1,6 @@
+from json.encoder import encode_basestring_ascii
+from typing import Dict, Iterable, List
+
 _BUNDLE_FILE_TYPE_DATA = 'data'
 _BUNDLE_FILE_TYPE_LINKS = 'links'
 
@@ -9,6 +12,9 @@ _metadata_type_attr_map = {
     'protocol': 'fileProtocolMap',
 }
 
+# In the order of the attributes of AssayManifest
+_manifest_map_attrs = ['fileBiomaterialMap', 'fileProcessMap', 'fileFilesMap', 'fileProjectMap', 'fileProtocolMap']
+
 
 class ProcessInfo:
     def __init__(self):
@@ -29,7 +35,7 @@ class ProcessInfo:
 # Use Bundle Manifest for now, bundle uuid and version will be null
 class AssayManifest:
     def __init__(self, envelopeUuid=None):
-        self.envelopeUuid = envelopeUuid if envelopeUuid is not None else ''
+        self.envelopeUuid = envelopeUuid
         self.dataFiles = []
         self.fileBiomaterialMap = {}
         self.fileProcessMap = {}
@@ -51,3 +57,40 @@ class AssayManifest:
                 raise KeyError(f'Cannot map unknown metadata type [{metadata_type}].')
 
 
+class AssayManifestBuilder:
+    """
+    Collects the uuids of an assay manifest as one list per metadata type, instead of a dict of single uuid lists,
+    and writes the JSON payload of the manifest directly from them.
+    """
+    def __init__(self, envelopeUuid=None):
+        self.envelopeUuid = envelopeUuid
+        self.dataFiles: List[str] = []
+        self.uuids: Dict[str, List[str]] = {attr: [] for attr in _manifest_map_attrs}
+
+    def add_uuids(self, metadata_type: str, uuids: Iterable[str]):
+        attr_mapping = _metadata_type_attr_map.get(metadata_type)
+        if attr_mapping:
+            self.uuids[attr_mapping].extend(uuids)
+
+    def add_data_files(self, data_file_uuids: Iterable[str]):
+        self.dataFiles.extend(data_file_uuids)
+
+    def build(self) -> AssayManifest:
+        assay_manifest = AssayManifest(self.envelopeUuid)
+        assay_manifest.dataFiles = list(self.dataFiles)
+        for attr, uuids in self.uuids.items():
+            setattr(assay_manifest, attr, {uuid: [uuid] for uuid in uuids})
+        return assay_manifest
+
+    def to_json(self) -> str:
+        """
+        The manifest as serialized by json.dumps(self.build().__dict__), without building it
+        """
+        parts = [
+            '{"envelopeUuid": ', 'null' if self.envelopeUuid is None else encode_basestring_ascii(self.envelopeUuid),
+            ', "dataFiles": [', ', '.join(map(encode_basestring_ascii, self.dataFiles)), ']'
+        ]
+        for attr, uuids in self.uuids.items():
+            parts += [', "', attr, '": {', ', '.join(f'{uuid}: [{uuid}]' for uuid in map(encode_basestring_ascii, uuids)), '}']
+        parts.append('}')
+        return ''.join(parts)
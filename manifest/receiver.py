@@ -1,51 +1,134 @@
 import json
+import queue
+import threading
 import time
-from typing import List, Type
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, List, Set, Type
 
 from kombu import Consumer
 from kombu.mixins import ConsumerProducerMixin
 
 from exporter.queue.config import QueueConfig
+from exporter.queue.publisher import QueuePublisher
 from exporter.session_context import SessionContext
 from manifest.exporter import ManifestExporter
 
 
 class Worker(ConsumerProducerMixin):
-    def __init__(self, connection, queues, callback):
+    def __init__(self, connection, queues, callback, prefetch_count: int = None):
         self.connection = connection
         self.queues = queues
         self.callback = callback
+        self.prefetch_count = prefetch_count
         self.logger = SessionContext.register_logger('ManifestExporter')
 
     def get_consumers(self, consumer: Type[Consumer], channel):
-        return [consumer(queues=self.queues, callbacks=[self.callback])]
+        return [consumer(queues=self.queues, callbacks=[self.callback], prefetch_count=self.prefetch_count)]
+
+    def stop(self, drain_timeout: float = None):
+        # Messages are handled on the consuming thread, so the message being handled finishes before the loop exits
+        self.should_stop = True
 
 
 class Receiver(Worker):
-    def __init__(self, connection, queues, callback):
-        super().__init__(connection, queues, callback)
+    def __init__(self, connection, queues, callback, prefetch_count: int = None):
+        super().__init__(connection, queues, callback, prefetch_count)
 
 
 class ManifestReceiver(Receiver):
-    def __init__(self, connection, queues: List[QueueConfig], exporter: ManifestExporter, publish_config: QueueConfig):
-        super().__init__(connection, [q.queue_from_config() for q in queues], self.on_message)
+    """
+    Exports the manifest of every process message received.
+    Without an executor messages are handled one at a time on the consuming thread.
+    With an executor they are handled by its worker threads, while the broker delivers at most prefetch_count
+    unacknowledged messages, so consumption slows down once the workers fall behind.
+    kombu channels must not be used from other threads, so the acks and rejects of worker threads
+    are queued and carried out by the consuming thread between deliveries.
+    """
+    def __init__(self, connection, queues: List[QueueConfig], exporter: ManifestExporter, publish_config: QueueConfig,
+                 publisher: QueuePublisher = None, executor: ThreadPoolExecutor = None, prefetch_count: int = None):
+        super().__init__(connection, [q.queue_from_config() for q in queues], self.on_message, prefetch_count)
         self.publish_config = publish_config
         self.exporter = exporter
+        self.publisher = publisher
+        self.executor = executor
+        self.in_flight: Set[Future] = set()
+        self.in_flight_lock = threading.Lock()
+        self.settlements: queue.SimpleQueue = queue.SimpleQueue()
+        self.consumer_thread = threading.get_ident()
+        self.drain_timeout = None
 
     def run(self, **kwargs):
         self.logger.info(f'Running {__name__}')
+        self.consumer_thread = threading.get_ident()
         super().run(**kwargs)
 
+    def stop(self, drain_timeout: float = None):
+        """
+        Stops consuming new messages. Messages already being handled are given drain_timeout seconds to finish
+        before the connection is closed, so that their acknowledgements reach the broker.
+        """
+        self.drain_timeout = drain_timeout
+        self.should_stop = True
+
+    def drain(self, timeout: float = None) -> bool:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        drained = True
+        while True:
+            # Handled messages may still be waiting for their notification, which adds to the in-flight futures
+            with self.in_flight_lock:
+                in_flight = set(self.in_flight)
+            if not in_flight:
+                break
+            self.logger.info(f'Waiting for {len(in_flight)} in-flight manifest messages to be handled')
+            remaining = max(deadline - time.monotonic(), 0) if deadline is not None else None
+            _, not_done = wait(in_flight, remaining)
+            if not_done:
+                self.logger.error(f'{len(not_done)} in-flight manifest messages were not handled before the drain deadline')
+                drained = False
+                break
+        self.settle_pending()
+        return drained
+
+    def on_iteration(self):
+        self.settle_pending()
+
+    def on_consume_end(self, connection, channel):
+        self.drain(self.drain_timeout)
+        super().on_consume_end(connection, channel)
+
+    def settle_pending(self):
+        while True:
+            try:
+                settle = self.settlements.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                settle()
+            except Exception as e:
+                self.logger.error(f'Failed to acknowledge manifest message: {str(e) if str(e) else e.__class__.__name__}')
+
     def notify_state_tracker(self, body_dict):
-        self.publish_config.send_message(self.producer, body_dict)
-        self.logger.info("Notified!")
+        return self.publish_config.send_message(self.publisher if self.publisher else self.producer, body_dict)
 
     def on_message(self, body, message):
+        if not self.executor:
+            return self.handle_message(body, message)
+        future = self.executor.submit(self.handle_message, body, message)
+        self.__track(future)
+        return future
+
+    def handle_message(self, body, message):
         self.logger.info(f'Message received: {body}')
         success = False
         start = time.perf_counter()
-        body_dict = json.loads(body)
-        submission_uuid = body_dict["envelopeUuid"]
+        try:
+            body_dict = json.loads(body)
+            submission_uuid = body_dict["envelopeUuid"]
+        except Exception as e:
+            # Settled here as well, a message raising in an executor thread would stay unacknowledged
+            self.logger.error(f"Rejecting malformed export manifest message: {body} due to error: {str(e) if str(e) else e.__class__.__name__}")
+            self.__settle(lambda: message.reject(requeue=False))
+            return
         with SessionContext(logger=self.logger, context={'submission_uuid': submission_uuid}):
             try:
                 self.logger.info('process received ' + body_dict["callbackLink"])
@@ -57,15 +140,56 @@ class ManifestReceiver(Receiver):
                 success = True
             except Exception as e:
                 self.logger.error(f"Rejecting export manifest message: {body} due to error: {str(e)}")
-                message.reject(requeue=False)
+                self.__settle(lambda: message.reject(requeue=False))
                 self.logger.exception(str(e))
 
             if success:
                 self.logger.info(f"Notifying state tracker of completed manifest: {body}")
-                self.notify_state_tracker(body_dict)
-                self.logger.info(f'Acknowledging export manifest message: {body}')
-                message.ack()
+                if self.publisher:
+                    published = self.notify_state_tracker(body_dict)
+                else:
+                    # The producer of this receiver belongs to the consuming thread
+                    published = None
+                    self.__settle(lambda: self.notify_state_tracker(body_dict))
+                if isinstance(published, Future):
+                    self.__ack_when_published(published, body, message)
+                else:
+                    self.logger.info(f'Acknowledging export manifest message: {body}')
+                    self.__settle(message.ack)
                 end = time.perf_counter()
                 time_to_export = end - start
                 self.logger.info('Finished! ' + str(message.delivery_tag))
-                self.logger.info('Export time (ms): ' + str(time_to_export))
\ No newline at end of file
+                self.logger.info('Export time (ms): ' + str(time_to_export))
+
+    def __ack_when_published(self, published: Future, body, message):
+        """
+        The message is acknowledged once the state tracker is notified, or rejected when the notification failed
+        """
+        def on_published(future: Future):
+            error = future.exception()
+            if error:
+                self.logger.error(f"Rejecting export manifest message: {body}, the state tracker was not notified: "
+                                  f"{str(error) if str(error) else error.__class__.__name__}")
+                self.__settle(lambda: message.reject(requeue=False))
+            else:
+                self.logger.info(f'Acknowledging export manifest message: {body}')
+                self.__settle(message.ack)
+
+        # Queue the settlement before the message leaves the in-flight futures, so draining settles it
+        published.add_done_callback(on_published)
+        self.__track(published)
+
+    def __settle(self, settle: Callable):
+        if threading.get_ident() == self.consumer_thread:
+            settle()
+        else:
+            self.settlements.put(settle)
+
+    def __track(self, future: Future):
+        with self.in_flight_lock:
+            self.in_flight.add(future)
+        future.add_done_callback(self.__on_handled)
+
+    def __on_handled(self, future: Future):
+        with self.in_flight_lock:
+            self.in_flight.discard(future)
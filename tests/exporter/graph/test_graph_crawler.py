@@ -3,6 +3,7 @@ from unittest import TestCase
 from hca_ingest.api.ingestapi import IngestApi
 from mock import MagicMock
 
+from exporter.cache import SingleFlightTtlCache
 from exporter.graph.crawler import GraphCrawler
 from exporter.metadata.resource import MetadataResource
 from exporter.metadata.service import MetadataService
@@ -66,6 +67,25 @@ class GraphCrawlerTest(TestCase):
         self.assertEqual(len(experiment_graph.links.get_links()), len(expected_links.get('links', [])))
         self.assertEqual(experiment_graph.links.to_dict(), expected_links)
 
+    def test_crawlers_sharing_a_graph_cache_crawl_a_process_version_once(self):
+        # given
+        graph_cache = SingleFlightTtlCache(ttl=60)
+        manifest_ingest_client = MagicMock(spec=IngestApi, wraps=MockIngestAPI(mock_entity_retriever=self.mock_files))
+        manifest_crawler = GraphCrawler(MetadataService(manifest_ingest_client), graph_cache)
+        terra_crawler = GraphCrawler(MetadataService(self.mock_ingest), graph_cache)
+
+        test_assay_process = MetadataResource.from_dict(self.mock_files.get_entity('processes', 'mock-assay-process'))
+        test_project = MetadataResource.from_dict(self.mock_files.get_entity('projects', 'mock-project'))
+
+        # when
+        manifest_graph = manifest_crawler.generate_complete_experiment_graph(test_assay_process, test_project)
+        terra_graph = terra_crawler.generate_complete_experiment_graph(test_assay_process, test_project)
+
+        # then
+        self.assertIs(terra_graph, manifest_graph)
+        self.assertTrue(manifest_ingest_client.method_calls)
+        self.assertFalse(self.mock_ingest.method_calls)
+
     def _get_nodes(self, expected_links):
         nodes = set()
         for link in expected_links.get('links', []):
@@ -0,0 +1,122 @@
+import uuid
+from unittest.mock import Mock
+
+import pytest
+from assertpy import assert_that
+
+from exporter.ingest.completion import ExportJobCompletionTracker
+from exporter.ingest.export_job import ExportJob
+from exporter.ingest.service import IngestService
+
+
+@pytest.fixture
+def export_job_id() -> str:
+    return str(uuid.uuid4()).replace('-', '')
+
+
+@pytest.fixture
+def expected_assays() -> int:
+    return 3
+
+
+@pytest.fixture
+def mock_ingest(export_job_id, expected_assays):
+    ingest = Mock(spec=IngestService)
+    job = ExportJob({})
+    job.job_id = export_job_id
+    job.num_expected_assays = expected_assays
+    ingest.get_job.return_value = job
+    return ingest
+
+
+@pytest.fixture
+def tracker(mock_ingest):
+    tracker = ExportJobCompletionTracker(mock_ingest, check_interval=60)
+    yield tracker
+    tracker.stopped.set()
+
+
+def test_single_assay_job_is_completed(tracker, mock_ingest, export_job_id):
+    # given
+    mock_ingest.get_job.return_value.num_expected_assays = 1
+    mock_ingest.get_num_complete_entities_for_job.return_value = 1
+
+    # when
+    tracker.record_exported(export_job_id)
+
+    # then
+    mock_ingest.complete_job.assert_called_once_with(export_job_id)
+    assert_that(tracker.pending_jobs()).is_empty()
+
+
+def test_counts_are_not_requested_until_job_could_be_complete(tracker, mock_ingest, export_job_id):
+    # given
+    mock_ingest.get_num_complete_entities_for_job.return_value = 1
+
+    # when
+    tracker.record_exported(export_job_id)
+    tracker.record_exported(export_job_id)
+
+    # then
+    mock_ingest.get_job.assert_called_once_with(export_job_id)
+    mock_ingest.get_num_complete_entities_for_job.assert_called_once_with(export_job_id)
+    mock_ingest.complete_job.assert_not_called()
+    assert_that(tracker.pending_jobs()).is_equal_to([export_job_id])
+
+    # when
+    mock_ingest.get_num_complete_entities_for_job.return_value = 3
+    tracker.record_exported(export_job_id)
+
+    # then
+    assert_that(mock_ingest.get_num_complete_entities_for_job.call_count).is_equal_to(2)
+    mock_ingest.get_job.assert_called_once_with(export_job_id)
+    mock_ingest.complete_job.assert_called_once_with(export_job_id)
+
+
+def test_assays_exported_elsewhere_are_found_by_pending_checks(tracker, mock_ingest, export_job_id):
+    # given
+    mock_ingest.get_num_complete_entities_for_job.return_value = 1
+    tracker.record_exported(export_job_id)
+    tracker.record_exported(export_job_id)
+
+    # when
+    mock_ingest.get_num_complete_entities_for_job.return_value = 3
+    tracker.check_pending_jobs()
+
+    # then
+    mock_ingest.complete_job.assert_called_once_with(export_job_id)
+    assert_that(tracker.pending_jobs()).is_empty()
+
+
+def test_job_is_completed_once(tracker, mock_ingest, export_job_id):
+    # given
+    mock_ingest.get_job.return_value.num_expected_assays = 1
+    mock_ingest.get_num_complete_entities_for_job.return_value = 1
+    tracker.record_exported(export_job_id)
+
+    # when
+    tracker.record_exported(export_job_id)
+    tracker.check_pending_jobs()
+
+    # then
+    mock_ingest.complete_job.assert_called_once_with(export_job_id)
+    mock_ingest.get_num_complete_entities_for_job.assert_called_once_with(export_job_id)
+
+
+def test_failed_check_is_retried(tracker, mock_ingest, export_job_id):
+    # given
+    mock_ingest.get_job.return_value.num_expected_assays = 1
+    mock_ingest.get_num_complete_entities_for_job.side_effect = [RuntimeError('ingest unavailable'), 1]
+
+    # when
+    tracker.record_exported(export_job_id)
+
+    # then
+    mock_ingest.complete_job.assert_not_called()
+    assert_that(tracker.pending_jobs()).is_equal_to([export_job_id])
+
+    # when
+    tracker.check_pending_jobs()
+
+    # then
+    mock_ingest.complete_job.assert_called_once_with(export_job_id)
@@ -0,0 +1,165 @@
+import threading
+import time
+import uuid
+from unittest.mock import Mock
+
+import pytest
+from assertpy import assert_that
+from requests import HTTPError
+
+from exporter.ingest.completion import ExportJobCompletionTracker
+from exporter.ingest.entity_writer import ExportEntityWriter
+from exporter.ingest.export_job import ExportEntity
+from exporter.ingest.service import IngestService
+
+
+@pytest.fixture
+def export_job_id() -> str:
+    return str(uuid.uuid4()).replace('-', '')
+
+
+@pytest.fixture
+def mock_ingest():
+    return Mock(spec=IngestService)
+
+
+@pytest.fixture
+def tracker():
+    return Mock(spec=ExportJobCompletionTracker)
+
+
+@pytest.fixture
+def entities():
+    return [ExportEntity(str(uuid.uuid4()).replace('-', ''), []) for _ in range(3)]
+
+
+@pytest.fixture
+def writer(mock_ingest, tracker):
+    writer = ExportEntityWriter(mock_ingest, tracker, batch_size=10, flush_interval=60)
+    yield writer
+    writer.close()
+
+
+def test_entities_are_buffered_until_flushed(writer, mock_ingest, tracker, export_job_id, entities):
+    # when
+    written = [writer.add(export_job_id, entity) for entity in entities]
+
+    # then
+    mock_ingest.post_export_entity.assert_not_called()
+    assert_that([future.done() for future in written]).does_not_contain(True)
+
+    # when
+    writer.flush()
+
+    # then
+    assert_that(mock_ingest.post_export_entity.call_count).is_equal_to(len(entities))
+    for entity in entities:
+        mock_ingest.post_export_entity.assert_any_call(export_job_id, entity)
+    tracker.record_exported.assert_called_once_with(export_job_id, len(entities))
+    assert_that([future.result(0) for future in written]).is_equal_to(entities)
+
+
+def test_entities_are_written_on_close(writer, mock_ingest, tracker, export_job_id, entities):
+    # given
+    for entity in entities:
+        writer.add(export_job_id, entity)
+
+    # when
+    writer.close()
+
+    # then
+    assert_that(mock_ingest.post_export_entity.call_count).is_equal_to(len(entities))
+    tracker.record_exported.assert_called_once_with(export_job_id, len(entities))
+
+
+def test_close_does_not_wait_past_its_timeout_for_a_flush_in_progress(writer, mock_ingest, export_job_id, entities):
+    # given a flush stuck writing the first entity
+    release = threading.Event()
+    mock_ingest.post_export_entity.side_effect = lambda job_id, entity: release.wait(5)
+    writer.add(export_job_id, entities[0])
+    flushing = threading.Thread(target=writer.flush)
+    flushing.start()
+    time.sleep(0.05)
+    buffered = writer.add(export_job_id, entities[1])
+
+    # when
+    start = time.monotonic()
+    writer.close(timeout=0.1)
+
+    # then
+    assert_that(time.monotonic() - start).is_less_than(1)
+    assert_that(buffered.exception(0)).is_instance_of(RuntimeError)
+    release.set()
+    flushing.join()
+
+
+def test_failed_entities_are_retried_after_a_backoff(mock_ingest, tracker, export_job_id, entities):
+    # given
+    writer = ExportEntityWriter(mock_ingest, tracker, batch_size=10, flush_interval=60, retry_backoff=0.1)
+    failing_entity = entities[0]
+
+    def post_export_entity(job_id, entity):
+        if entity is failing_entity:
+            raise RuntimeError('ingest unavailable')
+
+    mock_ingest.post_export_entity.side_effect = post_export_entity
+    for entity in entities:
+        writer.add(export_job_id, entity)
+
+    # when
+    writer.flush()
+
+    # then
+    tracker.record_exported.assert_called_once_with(export_job_id, len(entities) - 1)
+    assert_that([pending.entity for pending in writer.buffer]).is_equal_to([failing_entity])
+
+    # when flushed again before the backoff
+    mock_ingest.post_export_entity.side_effect = None
+    writer.flush()
+
+    # then
+    assert_that(mock_ingest.post_export_entity.call_count).is_equal_to(len(entities))
+    assert_that([pending.entity for pending in writer.buffer]).is_equal_to([failing_entity])
+
+    # when
+    time.sleep(0.1)
+    writer.flush()
+
+    # then
+    tracker.record_exported.assert_called_with(export_job_id, 1)
+    assert_that(writer.buffer).is_empty()
+    writer.close()
+
+
+def test_entities_are_given_up_after_max_attempts(mock_ingest, tracker, export_job_id, entities):
+    # given
+    writer = ExportEntityWriter(mock_ingest, tracker, batch_size=10, flush_interval=60, max_attempts=2, retry_backoff=0)
+    mock_ingest.post_export_entity.side_effect = RuntimeError('ingest unavailable')
+    written = writer.add(export_job_id, entities[0])
+
+    # when
+    writer.flush()
+    writer.flush()
+
+    # then
+    assert_that(mock_ingest.post_export_entity.call_count).is_equal_to(2)
+    assert_that(writer.buffer).is_empty()
+    with pytest.raises(RuntimeError):
+        written.result(0)
+    tracker.record_exported.assert_not_called()
+    writer.close()
+
+
+def test_client_errors_are_not_retried(writer, mock_ingest, tracker, export_job_id, entities):
+    # given
+    response = Mock(status_code=404)
+    mock_ingest.post_export_entity.side_effect = HTTPError('export job not found', response=response)
+    written = writer.add(export_job_id, entities[0])
+
+    # when
+    writer.flush()
+
+    # then
+    assert_that(writer.buffer).is_empty()
+    with pytest.raises(HTTPError):
+        written.result(0)
@@ -0,0 +1,50 @@
+import base64
+import hashlib
+import io
+
+import crc32c
+from assertpy import assert_that
+
+from exporter.metadata.checksums import FileChecksums, StreamingChecksums
+
+
+def test_crc32c_base64_matches_cloud_storage_format():
+    # given
+    data = b'some file content'
+    value = crc32c.crc32c(data)
+    checksums = FileChecksums('sha256', f'{value:08x}', 'sha1', 's3_etag')
+
+    # when
+    crc32c_base64 = checksums.crc32c_base64()
+
+    # then
+    assert_that(crc32c_base64).is_equal_to(base64.b64encode(value.to_bytes(4, 'big')).decode())
+
+
+def test_crc32c_base64_of_invalid_checksum():
+    assert_that(FileChecksums('sha256', 'crc32c', 'sha1', 's3_etag').crc32c_base64()).is_none()
+
+
+def test_streaming_checksums_match_whole_file_checksums():
+    # given
+    data = bytes(range(256)) * 1000
+
+    # when
+    digest = StreamingChecksums().read(io.BytesIO(data), chunk_size=1000)
+    checksums = digest.file_checksums(s3_etag='n/a')
+
+    # then
+    assert_that(digest.size).is_equal_to(len(data))
+    assert_that(checksums.sha256).is_equal_to(hashlib.sha256(data).hexdigest())
+    assert_that(checksums.sha1).is_equal_to(hashlib.sha1(data).hexdigest())
+    assert_that(checksums.crc32c).is_equal_to(f'{crc32c.crc32c(data):08x}')
+    assert_that(checksums.s3_etag).is_equal_to('n/a')
+
+
+def test_streaming_checksums_of_empty_file():
+    # when
+    digest = StreamingChecksums().read(io.BytesIO(b''))
+
+    # then
+    assert_that(digest.size).is_equal_to(0)
+    assert_that(digest.file_checksums().crc32c).is_equal_to('00000000')
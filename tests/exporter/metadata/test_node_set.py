@@ -0,0 +1,52 @@
+import pytest
+from assertpy import assert_that
+
+from exporter.metadata.node_set import MetadataNodeSet
+from exporter.metadata.resource import MetadataResource
+
+
+def node(metadata_type: str, uuid: str) -> MetadataResource:
+    return MetadataResource.from_dict({
+        'type': metadata_type.capitalize(),
+        'uuid': {'uuid': uuid},
+        'dcpVersion': '2022-05-29T13:51:08.593000Z',
+        'submissionDate': '2022-03-28T13:51:08.593000Z',
+        'updateDate': '2022-05-28T13:51:08.593000Z',
+        'content': {'describedBy': f'https://schema.humancellatlas.org/type/{metadata_type}/1.0.0/{metadata_type}'}
+    })
+
+
+@pytest.fixture
+def node_set() -> MetadataNodeSet:
+    node_set = MetadataNodeSet()
+    node_set.add_nodes([
+        node('biomaterial', 'donor'),
+        node('file', 'file-1'),
+        node('process', 'process'),
+        node('biomaterial', 'donor'),
+        node('file', 'file-2'),
+        node('biomaterial', 'specimen')
+    ])
+    return node_set
+
+
+def test_nodes_of_type_in_insertion_order_without_duplicates(node_set):
+    assert_that([n.uuid for n in node_set.nodes_of_type('biomaterial')]).is_equal_to(['donor', 'specimen'])
+    assert_that([n.uuid for n in node_set.nodes_of_type('file')]).is_equal_to(['file-1', 'file-2'])
+    assert_that(node_set.nodes_of_type('protocol')).is_empty()
+    assert_that(node_set).is_length(5)
+
+
+def test_nodes_by_type_is_read_only(node_set):
+    # when
+    nodes_by_type = node_set.nodes_by_type()
+
+    # then
+    assert_that(list(nodes_by_type)).is_equal_to(['biomaterial', 'file', 'process'])
+    with pytest.raises(TypeError):
+        nodes_by_type['project'] = ()
+
+
+def test_views_share_nodes_and_get_nodes_copies_them(node_set):
+    assert_that(node_set.nodes_of_type('process')[0]).is_same_as(node_set.objs[2])
+    assert_that(node_set.get_nodes()[2]).is_not_same_as(node_set.objs[2])
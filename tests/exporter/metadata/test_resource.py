@@ -3,9 +3,12 @@ from dataclasses import asdict
 from unittest import TestCase
 from unittest.mock import patch, MagicMock
 
+from hca_ingest.utils.date import parse_date_string
+from packaging import version
+
 from exporter.metadata.exceptions import MetadataParseException
 from exporter.metadata.provenance import MetadataProvenance
-from exporter.metadata.resource import MetadataResource
+from exporter.metadata.resource import DCP_VERSION_FORMAT, MetadataResource
 
 
 class MetadataResourceTest(TestCase):
@@ -53,6 +56,21 @@ class MetadataResourceTest(TestCase):
         self.assertEqual(15, metadata_provenance.schema_major_version)
         self.assertEqual(1, metadata_provenance.schema_minor_version)
 
+    def test_provenance_schema_versions_parsed_once_per_schema_url(self):
+        # given:
+        described_by = 'https://schema.humancellatlas.org/type/biomaterial/15.3.7/cell_suspension'
+        entities = [self._create_test_data(str(uuid.uuid4())) for _ in range(3)]
+        for entity in entities:
+            entity['content']['describedBy'] = described_by
+
+        # when:
+        with patch('exporter.metadata.provenance.version.parse', wraps=version.parse) as parse:
+            provenances = [MetadataProvenance.from_dict(entity) for entity in entities]
+
+        # then:
+        self.assertEqual({(15, 3)}, {(p.schema_major_version, p.schema_minor_version) for p in provenances})
+        self.assertEqual(2, parse.call_count)
+
     def test_provenance_from_dict_fail_fast(self):
         # given:
         uuid_value = str(uuid.uuid4())
@@ -153,6 +171,23 @@ class MetadataResourceTest(TestCase):
         # expect:
         self.assertEqual(date_string, MetadataResource.to_dcp_version(date_string))
 
+    def test_to_dcp_version__falls_back_to_date_parsing__given_timezone_offset(self):
+        # given:
+        date_string = '2019-05-23T16:53:40.931+00:00'
+
+        # expect:
+        self.assertEqual('2019-05-23T16:53:40.931000Z', MetadataResource.to_dcp_version(date_string))
+
+    def test_to_dcp_version__matches_date_parsing__given_ingest_dates(self):
+        # given:
+        date_strings = ['2019-05-23T16:53:40Z', '2019-05-23T16:53:40.9Z', '2019-05-23T16:53:40.093Z',
+                        '2019-05-23T16:53:40.000100Z']
+
+        for date_string in date_strings:
+            # expect:
+            self.assertEqual(parse_date_string(date_string).strftime(DCP_VERSION_FORMAT),
+                             MetadataResource.to_dcp_version(date_string))
+
     @staticmethod
     def _create_test_data(uuid_value):
         return {'type': 'Biomaterial',
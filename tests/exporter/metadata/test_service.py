@@ -1,3 +1,4 @@
+import json
 import uuid
 from unittest import TestCase
 from unittest.mock import Mock
@@ -35,3 +36,53 @@ class MetadataServiceTest(TestCase):
         self.assertEqual(MetadataResource.to_dcp_version(raw_metadata['dcpVersion']), metadata_resource.dcp_version)
         self.assertEqual(raw_metadata['submissionDate'], metadata_resource.provenance.submission_date)
         self.assertEqual(raw_metadata['updateDate'], metadata_resource.provenance.update_date)
+
+    def test_get_related_resources_parses_every_page(self):
+        # given:
+        process = MetadataResource.from_dict(self._entity('process', {'derivedFiles': {'href': 'http://ingest/derivedFiles'}}))
+        pages = {
+            'http://ingest/derivedFiles': self._page([self._entity('file-1'), self._entity('file-2')], 'http://ingest/page-2'),
+            'http://ingest/page-2': self._page([self._entity('file-3')])
+        }
+        ingest_client = Mock(name='ingest_client')
+        ingest_client.page_size = 2
+        ingest_client.get = Mock(side_effect=lambda url, **_: Mock(content=json.dumps(pages[url]).encode()))
+
+        # when:
+        files = MetadataService(ingest_client, batch_pages=True).get_derived_files(process)
+
+        # then:
+        self.assertEqual(['file-1', 'file-2', 'file-3'], [file.uuid for file in files])
+        ingest_client.get.assert_any_call('http://ingest/derivedFiles', params={'size': 2})
+        ingest_client.get_related_entities.assert_not_called()
+
+    def test_parse_metadata_page_drops_links_that_are_not_followed(self):
+        # given:
+        page = self._page([self._entity('file-1', {
+            'self': {'href': 'http://ingest/files/1'},
+            'inputToProcesses': {'href': 'http://ingest/files/1/inputToProcesses'},
+            'validationJob': {'href': 'http://ingest/files/1/validationJob'}
+        })])
+
+        # when:
+        files = MetadataService.parse_metadata_page(page, 'files')
+
+        # then:
+        self.assertEqual({'self', 'inputToProcesses'}, set(files[0].full_resource['_links']))
+
+    @staticmethod
+    def _entity(uuid_value: str, links: dict = None) -> dict:
+        return {'type': 'File',
+                'uuid': {'uuid': uuid_value},
+                'content': {'describedBy': "http://some-schema/1.2.3"},
+                'dcpVersion': '2019-12-02T13:40:50.520Z',
+                'submissionDate': 'a submission date',
+                'updateDate': 'an update date',
+                '_links': links if links else {}}
+
+    @staticmethod
+    def _page(entities: list, next_href: str = None) -> dict:
+        links = {'self': {'href': 'http://ingest/page'}}
+        if next_href:
+            links['next'] = {'href': next_href}
+        return {'_embedded': {'files': entities}, '_links': links}
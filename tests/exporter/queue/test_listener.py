@@ -1,4 +1,6 @@
 import logging
+import threading
+from concurrent.futures import Future
 
 import pytest
 import json
@@ -19,6 +21,26 @@ class MockHandler(MessageHandler):
         )
 
 
+class BlockingHandler(MockHandler):
+    def __init__(self, logger_name: str):
+        super().__init__(logger_name)
+        self.release = threading.Event()
+
+    def handle_message(self, body: dict, msg: Message):
+        self.release.wait(5)
+        msg.ack()
+
+
+class DeferredHandler(MockHandler):
+    def __init__(self, logger_name: str):
+        super().__init__(logger_name)
+        self.settled = Future()
+
+    def handle_message(self, body: dict, msg: Message):
+        self.settled.add_done_callback(lambda _: msg.ack())
+        return self.settled
+
+
 class FailingHandler(MockHandler):
     def handle_message(self, body: dict, msg: Message):
         raise Exception('unhandled exception')
@@ -56,3 +78,43 @@ def test_failure(handler_with_error, body: str, message, json_body):
     listener.try_handle_or_reject(body, message)
     # Then
     message.reject.assert_called_once_with(requeue=False)
+
+
+def test_consume_end_drains_in_flight_messages(body: str, message):
+    # Given
+    handler = BlockingHandler(__name__)
+    listener = QueueListener(MagicMock(), handler)
+    future = listener.experiment_message_handler(body, message)
+    listener.stop(drain_timeout=5)
+    # When
+    threading.Timer(0.1, handler.release.set).start()
+    listener.on_consume_end(MagicMock(), MagicMock())
+    # Then
+    assert future.done()
+    message.ack.assert_called_once()
+
+
+def test_drain_gives_up_at_the_deadline(body: str, message):
+    # Given
+    handler = BlockingHandler(__name__)
+    listener = QueueListener(MagicMock(), handler)
+    listener.experiment_message_handler(body, message)
+    # When
+    drained = listener.drain(timeout=0.1)
+    # Then
+    assert not drained
+    message.ack.assert_not_called()
+    handler.release.set()
+
+
+def test_drain_waits_for_messages_settled_after_handling(body: str, message):
+    # Given
+    handler = DeferredHandler(__name__)
+    listener = QueueListener(MagicMock(), handler)
+    listener.experiment_message_handler(body, message).result(5)
+    # When
+    threading.Timer(0.1, lambda: handler.settled.set_result(None)).start()
+    drained = listener.drain(timeout=5)
+    # Then
+    assert drained
+    message.ack.assert_called_once()
@@ -0,0 +1,146 @@
+import threading
+import time
+import uuid
+
+import pytest
+from assertpy import assert_that
+from kombu import Connection
+
+from exporter.queue.config import QueueConfig
+from exporter.queue.publisher import QueuePublisher
+
+BROKER_URL = 'memory://'
+
+
+@pytest.fixture
+def queue_config() -> QueueConfig:
+    name = f'test.publisher.{uuid.uuid4()}'
+    return QueueConfig('test.exchange', name, name=name, exchange_type='direct')
+
+
+@pytest.fixture
+def bound_queue(queue_config):
+    with Connection(BROKER_URL) as connection:
+        queue = queue_config.queue_from_config()(connection)
+        queue.declare()
+        yield queue
+
+
+@pytest.fixture
+def publisher():
+    publisher = QueuePublisher(BROKER_URL, workers=2)
+    yield publisher
+    publisher.close(timeout=5)
+
+
+def received_bodies(queue):
+    bodies = []
+    while message := queue.get(no_ack=True):
+        bodies.append(message.payload)
+    return bodies
+
+
+def test_published_messages_are_delivered(publisher, queue_config, bound_queue):
+    # given
+    messages = [{'index': i} for i in range(20)]
+
+    # when
+    for message in messages:
+        queue_config.send_message(publisher, message)
+    flushed = publisher.flush(timeout=5)
+
+    # then
+    assert_that(flushed).is_true()
+    assert_that(received_bodies(bound_queue)).contains_only(*messages)
+    assert_that(received_bodies(bound_queue)).is_empty()
+
+
+def test_close_publishes_buffered_messages(publisher, queue_config, bound_queue):
+    # given
+    queue_config.send_message(publisher, {'index': 0})
+
+    # when
+    closed = publisher.close(timeout=5)
+
+    # then
+    assert_that(closed).is_true()
+    assert_that(received_bodies(bound_queue)).is_equal_to([{'index': 0}])
+
+
+def test_cannot_publish_after_close(publisher, queue_config):
+    # given
+    publisher.close(timeout=5)
+
+    # when/then
+    with pytest.raises(RuntimeError):
+        queue_config.send_message(publisher, {'index': 0})
+
+
+def test_failed_publish_is_retried_then_reported(mocker, queue_config):
+    # given
+    producer = mocker.patch('exporter.queue.publisher.Producer').return_value
+    producer.publish.side_effect = ConnectionError('broker unavailable')
+    publisher = QueuePublisher(BROKER_URL, max_attempts=3, retry_interval=0)
+
+    # when
+    published = queue_config.send_message(publisher, {'index': 0})
+
+    # then
+    with pytest.raises(ConnectionError):
+        published.result(timeout=5)
+    assert_that(producer.publish.call_count).is_equal_to(3)
+    publisher.close(timeout=5)
+
+
+def test_publish_succeeds_after_a_retry(mocker, queue_config):
+    # given
+    producer = mocker.patch('exporter.queue.publisher.Producer').return_value
+    producer.publish.side_effect = [ConnectionError('broker unavailable'), None]
+    publisher = QueuePublisher(BROKER_URL, max_attempts=3, retry_interval=0)
+
+    # when
+    published = queue_config.send_message(publisher, {'index': 0})
+
+    # then
+    assert_that(published.result(timeout=5)).is_none()
+    assert_that(producer.publish.call_count).is_equal_to(2)
+    publisher.close(timeout=5)
+
+
+def test_stopped_publisher_thread_is_restarted(mocker, queue_config):
+    # given the first publisher thread fails to create its producer
+    producer = mocker.Mock()
+    mocker.patch('exporter.queue.publisher.Producer', side_effect=[RuntimeError('channel error'), producer])
+    publisher = QueuePublisher(BROKER_URL)
+    first = queue_config.send_message(publisher, {'index': 0})
+    publisher.threads[0].join(5)
+
+    # when
+    second = queue_config.send_message(publisher, {'index': 1})
+
+    # then
+    assert_that(first.result(timeout=5)).is_none()
+    assert_that(second.result(timeout=5)).is_none()
+    assert_that(producer.publish.call_count).is_equal_to(2)
+    publisher.close(timeout=5)
+
+
+def test_close_does_not_block_on_a_full_buffer(mocker, queue_config):
+    # given a publisher stuck on the broker with a full buffer
+    release = threading.Event()
+    producer = mocker.patch('exporter.queue.publisher.Producer').return_value
+    producer.publish.side_effect = lambda *args, **kwargs: release.wait(5)
+    publisher = QueuePublisher(BROKER_URL, max_buffer=1)
+    queue_config.send_message(publisher, {'index': 0})
+    while not publisher.buffer.empty():
+        time.sleep(0.01)
+    queue_config.send_message(publisher, {'index': 1})
+
+    # when
+    start = time.monotonic()
+    flushed = publisher.close(timeout=0.1)
+
+    # then
+    assert_that(flushed).is_false()
+    assert_that(time.monotonic() - start).is_less_than(1)
+    release.set()
@@ -1,5 +1,6 @@
 import uuid
 import random
+from concurrent.futures import Future
 from unittest.mock import Mock
 
 import pytest
@@ -86,15 +87,44 @@ def body(process_id, process_uuid, submission_uuid, current_process, total_proce
 
 
 def test_happy_path(handler, body, message, ingest, exporter, queue, process_uuid, export_job_id, process_id):
+    # Given
+    written = Future()
+    ingest.create_export_entity.return_value = written
+
     # When
-    handler.handle_message(body, message)
-    # Then
+    settled = handler.handle_message(body, message)
+
+    # Then the message is not acknowledged before the export entity is written
     exporter.export.assert_called_once_with(process_uuid)
     ingest.create_export_entity.assert_called_once_with(export_job_id, process_id)
+    message.ack.assert_not_called()
+    queue.send_message.assert_not_called()
+
+    # When
+    written.set_result(None)
+
+    # Then
+    assert settled.done()
     queue.send_message.assert_called_once_with(handler.producer, body)
     message.ack.assert_called_once()
 
 
+def test_message_rejected_when_export_entity_not_written(handler, body, message, ingest, queue):
+    # Given
+    written = Future()
+    ingest.create_export_entity.return_value = written
+    settled = handler.handle_message(body, message)
+
+    # When
+    written.set_exception(RuntimeError('export job not found'))
+
+    # Then
+    assert settled.done()
+    message.reject.assert_called_once_with(requeue=False)
+    message.ack.assert_not_called()
+    queue.send_message.assert_not_called()
+
+
 def test_missing_job_or_submission(missing_job_handler, body, message, ingest, exporter, queue):
     # When
     missing_job_handler.handle_message(body, message)
@@ -105,3 +135,22 @@ def test_missing_job_or_submission(missing_job_handler, body, message, ingest, e
     exporter.export.assert_not_called()
     ingest.create_export_entity.assert_not_called()
     queue.send_message.assert_not_called()
+
+
+def test_message_rejected_when_notification_not_published(handler, body, message, ingest, queue):
+    # Given
+    written = Future()
+    written.set_result(None)
+    ingest.create_export_entity.return_value = written
+    published = Future()
+    queue.send_message.return_value = published
+    settled = handler.handle_message(body, message)
+    message.ack.assert_not_called()
+
+    # When
+    published.set_exception(ConnectionError('broker unavailable'))
+
+    # Then
+    assert settled.done()
+    message.reject.assert_called_once_with(requeue=False)
+    message.ack.assert_not_called()
@@ -0,0 +1,166 @@
+import base64
+from unittest.mock import MagicMock
+
+import crc32c
+import pytest
+from assertpy import assert_that
+from google.api_core.exceptions import NotFound
+
+from exporter.terra.exceptions import UploadVerificationException
+from exporter.terra.gcs.storage import GcsStorage
+
+
+@pytest.fixture
+def client(mocker) -> MagicMock:
+    mocker.patch('exporter.terra.gcs.storage.Credentials')
+    return mocker.patch('exporter.terra.gcs.storage.Client').return_value
+
+
+@pytest.fixture
+def credentials_path(tmp_path) -> str:
+    path = tmp_path / 'credentials.json'
+    path.write_text('{}')
+    return str(path)
+
+
+@pytest.fixture
+def bucket(client) -> MagicMock:
+    bucket = client.bucket.return_value
+    blobs = {}
+
+    def blob(name, **kwargs):
+        if name not in blobs:
+            blobs[name] = MagicMock()
+            blobs[name].name = name
+        return blobs[name]
+    bucket.blob.side_effect = blob
+    bucket.blobs = blobs
+    return bucket
+
+
+def composed(blob: MagicMock, content: bytes) -> MagicMock:
+    blob.content_type = None
+
+    def compose(parts):
+        blob.size = len(content)
+        blob.crc32c = base64.b64encode(crc32c.crc32c(content).to_bytes(4, 'big')).decode()
+    blob.compose.side_effect = compose
+    return blob
+
+
+def test_large_files_are_uploaded_in_parts_and_composed(client, bucket, credentials_path, tmp_path):
+    # given
+    storage = GcsStorage('project', credentials_path, composite_threshold=10, composite_part_size=4)
+    spreadsheet = tmp_path / 'spreadsheet.xlsx'
+    spreadsheet.write_bytes(b'0123456789ab')
+    blob = composed(bucket.blob('prefix/data/spreadsheet.xlsx'), b'0123456789ab')
+
+    # when
+    with open(spreadsheet, 'rb') as data_stream:
+        storage.write('bucket', 'prefix/data/spreadsheet.xlsx', data_stream, overwrite=True)
+
+    # then
+    parts = blob.compose.call_args.args[0]
+    assert_that(parts).is_length(3)
+    for part in parts:
+        assert_that(part.name).starts_with('prefix/data/spreadsheet.xlsx.part-')
+        part.upload_from_file.assert_called_once()
+        part.delete.assert_called_once()
+    assert_that([part.upload_from_file.call_args.kwargs['size'] for part in parts]).is_equal_to([4, 4, 4])
+    blob.upload_from_file.assert_not_called()
+    assert_that(blob.content_type).is_equal_to('application/octet-stream')
+    assert_that(blob.metadata).is_equal_to({'export_completed': True})
+
+
+def test_composed_blob_not_matching_the_file_is_not_marked_complete(client, bucket, credentials_path, tmp_path):
+    # given
+    storage = GcsStorage('project', credentials_path, composite_threshold=10, composite_part_size=4)
+    spreadsheet = tmp_path / 'spreadsheet.xlsx'
+    spreadsheet.write_bytes(b'0123456789ab')
+    blob = composed(bucket.blob('prefix/data/spreadsheet.xlsx'), b'01234567ab89')
+
+    # when
+    with pytest.raises(UploadVerificationException):
+        with open(spreadsheet, 'rb') as data_stream:
+            storage.write('bucket', 'prefix/data/spreadsheet.xlsx', data_stream, overwrite=True)
+
+    # then
+    blob.patch.assert_not_called()
+
+
+def test_small_files_are_uploaded_in_one_request(client, bucket, credentials_path, tmp_path):
+    # given
+    storage = GcsStorage('project', credentials_path, composite_threshold=100)
+    spreadsheet = tmp_path / 'spreadsheet.xlsx'
+    spreadsheet.write_bytes(b'0123456789ab')
+
+    # when
+    with open(spreadsheet, 'rb') as data_stream:
+        storage.write('bucket', 'prefix/data/spreadsheet.xlsx', data_stream, overwrite=True)
+
+    # then
+    blob = bucket.blobs['prefix/data/spreadsheet.xlsx']
+    blob.upload_from_file.assert_called_once()
+    blob.compose.assert_not_called()
+
+
+def test_parts_are_deleted_when_an_upload_fails(client, bucket, credentials_path, tmp_path):
+    # given
+    storage = GcsStorage('project', credentials_path, composite_threshold=10, composite_part_size=4)
+    spreadsheet = tmp_path / 'spreadsheet.xlsx'
+    spreadsheet.write_bytes(b'0123456789ab')
+    original_blob = bucket.blob.side_effect
+
+    def failing_blob(name, **kwargs):
+        blob = original_blob(name, **kwargs)
+        if name.endswith('-1'):
+            blob.upload_from_file.side_effect = RuntimeError('part upload problem')
+            blob.delete.side_effect = NotFound('never uploaded')
+        return blob
+    bucket.blob.side_effect = failing_blob
+
+    # when
+    with pytest.raises(RuntimeError):
+        with open(spreadsheet, 'rb') as data_stream:
+            storage.write('bucket', 'prefix/data/spreadsheet.xlsx', data_stream, overwrite=True)
+
+    # then
+    parts = [blob for name, blob in bucket.blobs.items() if '.part-' in name]
+    assert_that(parts).is_length(3)
+    for part in parts:
+        part.delete.assert_called_once()
+    bucket.blobs['prefix/data/spreadsheet.xlsx'].compose.assert_not_called()
+
+
+def test_every_request_of_a_composite_write_is_throttled(client, bucket, credentials_path, tmp_path):
+    # given
+    throttle = MagicMock()
+    storage = GcsStorage('project', credentials_path, composite_threshold=10, composite_part_size=4, throttle=throttle)
+    spreadsheet = tmp_path / 'spreadsheet.xlsx'
+    spreadsheet.write_bytes(b'0123456789ab')
+    composed(bucket.blob('prefix/data/spreadsheet.xlsx'), b'0123456789ab')
+
+    # when
+    with open(spreadsheet, 'rb') as data_stream:
+        storage.write('bucket', 'prefix/data/spreadsheet.xlsx', data_stream, overwrite=True)
+
+    # then 3 part uploads, the compose, 3 part deletes and marking the blob complete
+    assert_that(throttle.call_count).is_equal_to(8)
+
+
+def test_listing_is_throttled_per_page(client, credentials_path):
+    # given
+    throttle = MagicMock()
+    storage = GcsStorage('project', credentials_path, throttle=throttle)
+    pages = [[MagicMock(crc32c='AAAAAA==')], [MagicMock(crc32c='BBBBBB==')]]
+    pages[0][0].name = 'prefix/a.fastq.gz'
+    pages[1][0].name = 'prefix/b.fastq.gz'
+    client.list_blobs.return_value.pages = iter(pages)
+
+    # when
+    crc32c_by_name = storage.list_crc32c('bucket', 'prefix/')
+
+    # then
+    assert_that(crc32c_by_name).is_equal_to({'a.fastq.gz': 'AAAAAA==', 'b.fastq.gz': 'BBBBBB=='})
+    # and once more for the fetch that finds no next page
+    assert_that(throttle.call_count).is_equal_to(3)
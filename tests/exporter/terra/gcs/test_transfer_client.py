@@ -0,0 +1,52 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from assertpy import assert_that
+from google.auth.credentials import AnonymousCredentials
+
+from exporter.terra.gcs.transfer_client import TransferClientFactory
+
+
+@pytest.fixture
+def factory() -> TransferClientFactory:
+    return TransferClientFactory(AnonymousCredentials())
+
+
+def test_service_is_built_once(factory):
+    # when
+    first = factory.service()
+    second = factory.service()
+
+    # then
+    assert_that(first).is_same_as(second)
+
+
+def test_requests_are_built_from_bundled_document(factory):
+    # when
+    request = factory.service().transferOperations().list(
+        name='transferOperations',
+        filter=json.dumps({'project_id': 'project', 'job_names': ['transferJobs/job']})
+    )
+
+    # then
+    assert_that(request.method).is_equal_to('GET')
+    assert_that(request.uri).starts_with('https://storagetransfer.googleapis.com/v1/transferOperations')
+
+
+def test_each_thread_sends_requests_through_its_own_http(factory):
+    # given
+    service = factory.service()
+
+    def request_http():
+        return service.transferJobs().get(jobName='transferJobs/job', projectId='project').http
+
+    # when
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        https = [executor.submit(request_http).result() for _ in range(2)]
+        other_thread_http = https[0]
+    this_thread_http = request_http()
+
+    # then
+    assert_that(this_thread_http).is_same_as(request_http())
+    assert_that(this_thread_http).is_not_same_as(other_thread_http)
@@ -0,0 +1,84 @@
+import pytest
+from assertpy import assert_that
+
+from exporter.terra.gcs.transfer_shards import TransferJobName, TransferShardPlanner
+
+
+def times_included(files, shards) -> set:
+    prefixes = [prefix for shard in shards for prefix in shard]
+    return {len([prefix for prefix in prefixes if name.startswith(prefix)]) for name in files}
+
+
+def test_files_are_included_by_name_when_they_fit():
+    # given
+    files = {f'file_{i}.fastq.gz': 10 for i in range(10)}
+
+    # when
+    shards = TransferShardPlanner(3, max_prefixes=5).plan(files)
+
+    # then
+    assert_that(shards).is_length(3)
+    assert_that(sorted(prefix for shard in shards for prefix in shard)).is_equal_to(sorted(files))
+
+
+def test_shards_are_balanced_by_size():
+    # given
+    files = {'big': 100, 'medium_1': 50, 'medium_2': 50, 'small': 1}
+
+    # when
+    shards = TransferShardPlanner(2).plan(files)
+
+    # then
+    assert_that(shards).contains(['big', 'small'], ['medium_1', 'medium_2'])
+
+
+def test_files_are_grouped_by_prefix_when_too_many_to_list():
+    # given
+    files = {f'{prefix}_{i:04d}.fastq.gz': 1 for prefix in ['SRR1', 'SRR2', 'SRR3'] for i in range(100)}
+
+    # when
+    shards = TransferShardPlanner(2, max_prefixes=10).plan(files)
+
+    # then
+    assert_that(shards).is_length(2)
+    for shard in shards:
+        assert_that(shard).is_not_empty()
+        assert_that(len(shard)).is_less_than_or_equal_to(10)
+    assert_that(times_included(files, shards)).is_equal_to({1})
+
+
+def test_no_file_is_included_by_two_shards():
+    # given
+    files = {'a.fastq': 1, 'a.fastq.gz': 1, 'b.fastq': 1}
+
+    # when
+    shards = TransferShardPlanner(3).plan(files)
+
+    # then
+    assert_that(times_included(files, shards)).is_equal_to({1})
+    assert_that(shards).is_length(2)
+
+
+def test_no_files():
+    assert_that(TransferShardPlanner(3).plan({})).is_empty()
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('transferJobs/abc', TransferJobName('abc')),
+    ('transferJobs/abc-shard-2-of-4', TransferJobName('abc', 2, 4)),
+    ('transferBob', None),
+    ('', None)
+])
+def test_parse_transfer_job_name(name, expected):
+    assert_that(TransferJobName.parse(name)).is_equal_to(expected)
+
+
+def test_transfer_job_name_round_trip():
+    # given
+    name = TransferJobName('abc', 2, 3)
+
+    # then
+    assert_that(TransferJobName.parse(name.name)).is_equal_to(name)
+    assert_that([shard.name for shard in name.group()]).is_equal_to([
+        'transferJobs/abc-shard-1-of-3', 'transferJobs/abc-shard-2-of-3', 'transferJobs/abc-shard-3-of-3'
+    ])
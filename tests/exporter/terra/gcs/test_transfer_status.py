@@ -0,0 +1,138 @@
+from unittest.mock import Mock
+
+import pytest
+from assertpy import assert_that
+
+from exporter.terra.gcs.transfer import GcsTransfer
+from exporter.terra.gcs.transfer_status import TransferStatusTracker, TransferCounters
+
+
+def operation(job_name: str, done: bool, status: str = 'IN_PROGRESS', copied: int = 0) -> dict:
+    return {
+        'name': f'transferOperations/{job_name}-operation',
+        'done': done,
+        'metadata': {
+            'transferJobName': job_name,
+            'status': status,
+            'counters': {
+                'objectsFoundFromSource': '2',
+                'bytesFoundFromSource': '2048',
+                'objectsCopiedToSink': str(copied),
+                'bytesCopiedToSink': str(copied * 1024)
+            }
+        }
+    }
+
+
+@pytest.fixture
+def gcs_transfer():
+    return Mock(spec=GcsTransfer)
+
+
+@pytest.fixture
+def tracker(gcs_transfer) -> TransferStatusTracker:
+    return TransferStatusTracker(gcs_transfer, 'project', ttl=60, batch_size=2)
+
+
+def test_tracked_jobs_are_polled_in_batches(tracker, gcs_transfer):
+    # given
+    job_names = [f'transferJobs/job-{i}' for i in range(3)]
+    for job_name in job_names:
+        tracker.track(job_name)
+    gcs_transfer.list_operations.side_effect = lambda project, names: [operation(name, True) for name in names]
+
+    # when
+    statuses = tracker.refresh()
+
+    # then
+    assert_that(gcs_transfer.list_operations.call_count).is_equal_to(2)
+    gcs_transfer.list_operations.assert_any_call('project', job_names[:2])
+    gcs_transfer.list_operations.assert_any_call('project', job_names[2:])
+    assert_that(statuses).contains_key(*job_names)
+
+
+def test_status_is_cached(tracker, gcs_transfer):
+    # given
+    gcs_transfer.list_operations.return_value = [operation('transferJobs/job', False, copied=1)]
+
+    # when
+    first = tracker.status('transferJobs/job')
+    second = tracker.status('transferJobs/job')
+
+    # then
+    gcs_transfer.list_operations.assert_called_once()
+    assert_that(first).is_same_as(second)
+    assert_that(first.done).is_false()
+    assert_that(first.counters).is_equal_to(TransferCounters(
+        objects_found=2, bytes_found=2048, objects_copied=1, bytes_copied=1024
+    ))
+
+
+def test_job_is_done_only_when_all_operations_are_done(tracker, gcs_transfer):
+    # given
+    gcs_transfer.list_operations.return_value = [
+        operation('transferJobs/job', True, status='SUCCESS', copied=2),
+        operation('transferJobs/job', False)
+    ]
+
+    # when
+    status = tracker.status('transferJobs/job')
+
+    # then
+    assert_that(status.operations).is_equal_to(2)
+    assert_that(status.done).is_false()
+    assert_that(status.counters.objects_copied).is_equal_to(2)
+
+
+def test_job_without_operations_is_not_done(tracker, gcs_transfer):
+    # given
+    gcs_transfer.list_operations.return_value = []
+
+    # when
+    status = tracker.status('transferJobs/job')
+
+    # then
+    assert_that(status.done).is_false()
+    assert_that(status.operations).is_equal_to(0)
+
+
+def test_done_jobs_are_no_longer_polled(tracker, gcs_transfer):
+    # given
+    tracker.track('transferJobs/done')
+    tracker.track('transferJobs/running')
+    gcs_transfer.list_operations.return_value = [
+        operation('transferJobs/done', True, status='SUCCESS'),
+        operation('transferJobs/running', False)
+    ]
+    tracker.refresh()
+
+    # when
+    tracker.refresh()
+
+    # then
+    gcs_transfer.list_operations.assert_called_with('project', ['transferJobs/running'])
+
+
+def test_failed_operations_are_reported(tracker, gcs_transfer):
+    # given
+    gcs_transfer.list_operations.return_value = [operation('transferJobs/job', True, status='FAILED')]
+
+    # when
+    status = tracker.status('transferJobs/job')
+
+    # then
+    assert_that(status.failed).is_true()
+
+
+def test_job_statuses_are_refreshed_once_and_then_cached(tracker, gcs_transfer):
+    # given
+    gcs_transfer.list_operations.side_effect = lambda project, names: [operation(name, False) for name in names]
+
+    # when
+    first = tracker.job_statuses(['transferJobs/shard-1', 'transferJobs/shard-2'])
+    second = tracker.job_statuses(['transferJobs/shard-1', 'transferJobs/shard-2'])
+
+    # then
+    gcs_transfer.list_operations.assert_called_once_with('project', ['transferJobs/shard-1', 'transferJobs/shard-2'])
+    assert_that(first).is_equal_to(second)
+    assert_that(first).contains_key('transferJobs/shard-1', 'transferJobs/shard-2')
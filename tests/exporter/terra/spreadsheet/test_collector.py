@@ -0,0 +1,114 @@
+from unittest.mock import Mock
+
+import pytest
+from assertpy import assert_that
+from hca_ingest.api.ingestapi import IngestApi
+
+from exporter.terra.spreadsheet.collector import ConcurrentDataCollector
+
+API = 'https://api.ingest'
+SCHEMA_BASE = 'https://schema.humancellatlas.org/type'
+
+
+def entity_json(entity_type: str, entity_id: str, schema: str) -> dict:
+    return {
+        'uuid': {'uuid': f'{entity_id}-uuid'},
+        '_links': {'self': {'href': f'{API}/{entity_type}/{entity_id}'}},
+        'content': {'describedBy': f'{SCHEMA_BASE}/{schema}'}
+    }
+
+
+def paged(entity_type: str, entities: list, page: int, total_pages: int) -> dict:
+    return {
+        '_embedded': {entity_type: entities},
+        '_links': {},
+        'page': {'size': 2, 'number': page, 'totalPages': total_pages, 'totalElements': 0}
+    }
+
+
+@pytest.fixture
+def submission() -> dict:
+    return {
+        'uuid': {'uuid': 'submission-uuid'},
+        '_links': {
+            'self': {'href': f'{API}/submissionEnvelopes/submission-id'},
+            'linkingMap': {'href': f'{API}/submissionEnvelopes/submission-id/linkingMap'},
+            **{
+                entity_type: {'href': f'{API}/submissionEnvelopes/submission-id/{entity_type}'}
+                for entity_type in ['biomaterials', 'processes', 'protocols', 'files']
+            }
+        }
+    }
+
+
+@pytest.fixture
+def biomaterials() -> list:
+    return [entity_json('biomaterials', f'donor-{index}', 'biomaterial/15.5.0/donor_organism') for index in range(3)] \
+        + [entity_json('biomaterials', 'specimen', 'biomaterial/10.4.0/specimen_from_organism')]
+
+
+@pytest.fixture
+def responses(submission, biomaterials) -> dict:
+    submission_url = f'{API}/submissionEnvelopes/submission-id'
+    return {
+        (f'{submission_url}/biomaterials', 0): paged('biomaterials', biomaterials[:2], 0, 2),
+        (f'{submission_url}/biomaterials', 1): paged('biomaterials', biomaterials[2:], 1, 2),
+        (f'{submission_url}/processes', 0): paged('processes', [entity_json('processes', 'process', 'process/9.2.0/process')], 0, 1),
+        (f'{submission_url}/protocols', 0): paged('protocols', [entity_json('protocols', 'protocol', 'protocol/biomaterial_collection/9.2.0/collection_protocol')], 0, 1),
+        (f'{submission_url}/files', 0): paged('files', [], 0, 0),
+        (f'{submission_url}/linkingMap', None): {
+            'biomaterials': {
+                'donor-0': {'derivedByProcesses': []},
+                'specimen': {'derivedByProcesses': ['process']}
+            },
+            'files': {},
+            'processes': {
+                'process': {'protocols': ['protocol'], 'inputBiomaterials': ['donor-0', 'donor-1'], 'inputFiles': []}
+            }
+        }
+    }
+
+
+@pytest.fixture
+def ingest_api(submission, responses) -> Mock:
+    api = Mock(spec=IngestApi)
+    api.page_size = 2
+    api.get_submission_by_uuid.return_value = submission
+    api.get_related_project.return_value = entity_json('projects', 'project', 'project/17.0.0/project')
+    api.get_headers.return_value = {'Authorization': 'Bearer token'}
+    api.get.side_effect = lambda url, params=None, **kwargs: Mock(json=Mock(
+        return_value=responses[(url, params.get('page') if params else None)]
+    ))
+    return api
+
+
+def test_collects_every_page_of_every_entity_type_in_order(ingest_api):
+    # when
+    entities = ConcurrentDataCollector(ingest_api, max_workers=4).collect_data_by_submission_uuid('submission-uuid')
+
+    # then
+    assert_that(list(entities)).is_equal_to(
+        ['project', 'donor-0', 'donor-1', 'donor-2', 'specimen', 'process', 'protocol']
+    )
+    ingest_api.get_related_project.assert_called_once_with('submission-id')
+
+
+def test_links_inputs_from_linking_map(ingest_api):
+    # when
+    entities = ConcurrentDataCollector(ingest_api).collect_data_by_submission_uuid('submission-uuid')
+
+    # then
+    specimen = entities['specimen']
+    assert_that(specimen.process).is_same_as(entities['process'])
+    assert_that(specimen.protocols).is_equal_to([entities['protocol']])
+    assert_that([biomaterial.id for biomaterial in specimen.input_biomaterials]).is_equal_to(['donor-0', 'donor-1'])
+    assert_that(entities['donor-0'].process).is_none()
+
+
+def test_missing_project_raises(ingest_api):
+    # given
+    ingest_api.get_related_project.return_value = None
+
+    # expect
+    with pytest.raises(Exception, match='There should be a project'):
+        ConcurrentDataCollector(ingest_api).collect_data_by_submission_uuid('submission-uuid')
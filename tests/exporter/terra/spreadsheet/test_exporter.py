@@ -1,4 +1,5 @@
 import uuid
+from concurrent.futures import Executor, Future
 from datetime import datetime
 from unittest.mock import Mock, ANY
 
@@ -9,10 +10,12 @@ from hca_ingest.utils.date import date_to_json_string, parse_date_string
 from openpyxl.workbook import Workbook
 
 from exporter.ingest.service import IngestService
+from exporter.metadata.checksums import FileChecksums
 from exporter.metadata.descriptor import FileDescriptor
 from exporter.metadata.resource import MetadataResource
 from exporter.schema.resource import SchemaResource
 from exporter.terra.spreadsheet.exporter import SpreadsheetExporter
+from exporter.terra.spreadsheet.worker import SpreadsheetDigest, build_spreadsheet_in_worker
 from exporter.terra.storage import TerraStorageClient
 
 
@@ -40,7 +43,8 @@ def service_with_new_spreadsheet(ingest_service, new_spreadsheet_version):
 
 @pytest.fixture
 def spreadsheet_dcp_version() -> str:
-    return "2022-06-13T14:32:59.593000Z"
+    # As returned by ingest, before normalization to a dcp version
+    return "2022-06-13T14:32:59.593Z"
 
 
 @pytest.fixture
@@ -86,6 +90,7 @@ def project(project_dict) -> MetadataResource:
 @pytest.fixture
 def terra_client(mocker):
     terra_client: TerraStorageClient = mocker.Mock(spec=TerraStorageClient)
+    terra_client.read_file_descriptor.return_value = None
     return terra_client
 
 
@@ -97,21 +102,21 @@ def workbook():
 @pytest.fixture
 def exporter(ingest_service, terra_client, workbook, mocker):
     exporter = SpreadsheetExporter(ingest_service, terra_client)
-    exporter.downloader.get_workbook_from_submission = mocker.Mock(return_value=workbook)
+    exporter.generator.write_workbook_from_submission = mocker.Mock(side_effect=lambda _, path: workbook.save(path))
     return exporter
 
 
 @pytest.fixture
 def exporter_with_new_spreadsheet(service_with_new_spreadsheet, terra_client, workbook, mocker):
     exporter = SpreadsheetExporter(service_with_new_spreadsheet, terra_client)
-    exporter.downloader.get_workbook_from_submission = mocker.Mock(return_value=workbook)
+    exporter.generator.write_workbook_from_submission = mocker.Mock(side_effect=lambda _, path: workbook.save(path))
     return exporter
 
 
 @pytest.fixture()
 def failing_exporter(ingest_service, terra_client, mocker):
     exporter = SpreadsheetExporter(ingest_service, terra_client)
-    exporter.downloader.get_workbook_from_submission = mocker.Mock(
+    exporter.generator.write_workbook_from_submission = mocker.Mock(
         side_effect=RuntimeError('spreadsheet generation problem')
     )
     return exporter
@@ -158,6 +163,117 @@ def test_exception_during_export(failing_exporter: SpreadsheetExporter, project_
         failing_exporter.export_spreadsheet(project_uuid, submission_uuid)
 
 
+def test_spreadsheet_built_in_process_pool(ingest_service, terra_client: Mock, project: MetadataResource,
+                                           submission_uuid: str, mocker):
+    # given
+    built = Future()
+    built.set_result(SpreadsheetDigest(FileChecksums('ab12', '0a1b2c3d', 'cd34', 'n/a - not in s3'), 4096))
+    process_pool = mocker.Mock(spec=Executor)
+    process_pool.submit.return_value = built
+    exporter = SpreadsheetExporter(ingest_service, terra_client, process_pool=process_pool)
+    exporter.generator.write_workbook_from_submission = mocker.Mock()
+
+    # when
+    exporter.export_spreadsheet(project.uuid, submission_uuid)
+
+    # then
+    process_pool.submit.assert_called_once_with(build_spreadsheet_in_worker, submission_uuid, ANY)
+    exporter.generator.write_workbook_from_submission.assert_not_called()
+    file_metadata = terra_client.write_metadata.call_args.args[0]
+    assert_that(file_metadata.full_resource['size']).is_equal_to(4096)
+    assert_that(file_metadata.full_resource['checksums']).is_equal_to(
+        {'sha256': 'ab12', 'crc32c': '0a1b2c3d', 'sha1': 'cd34', 's3_etag': 'n/a - not in s3'}
+    )
+
+
+def test_failed_write_rolls_back_other_writes(exporter: SpreadsheetExporter, terra_client: Mock,
+                                              project: MetadataResource, submission_uuid: str):
+    # given nothing is staged yet
+    terra_client.staging_object_crc32c.return_value = None
+    terra_client.write_links.side_effect = RuntimeError('links write problem')
+
+    # when
+    with pytest.raises(RuntimeError, match='links write problem'):
+        exporter.export_spreadsheet(project.uuid, submission_uuid)
+
+    # then
+    file_metadata = terra_client.write_metadata.call_args.args[0]
+    deleted = [call.args[0] for call in terra_client.delete_from_staging_bucket.call_args_list]
+    assert_that(deleted).contains_only(
+        TerraStorageClient.metadata_object_key(file_metadata, project.uuid),
+        TerraStorageClient.file_descriptor_object_key(file_metadata, project.uuid),
+        TerraStorageClient.links_object_key(file_metadata.uuid, file_metadata.dcp_version, project.uuid),
+        f'{project.uuid}/data/{file_metadata.full_resource["fileName"]}'
+    )
+
+
+def test_failed_spreadsheet_upload_keeps_previous_spreadsheet(exporter: SpreadsheetExporter, terra_client: Mock,
+                                                              project: MetadataResource, submission_uuid: str):
+    # given only a previous spreadsheet is staged
+    terra_client.staging_object_crc32c.side_effect = lambda key: 'ChssPQ==' if '/data/' in key else None
+    terra_client.write_to_staging_bucket.side_effect = RuntimeError('upload problem')
+
+    # when
+    with pytest.raises(RuntimeError, match='upload problem'):
+        exporter.export_spreadsheet(project.uuid, submission_uuid)
+
+    # then
+    deleted = [call.args[0] for call in terra_client.delete_from_staging_bucket.call_args_list]
+    assert_that(deleted).is_length(3)
+    assert_that([key for key in deleted if '/data/' in key]).is_empty()
+
+
+def test_failed_write_keeps_objects_staged_before_the_attempt(exporter: SpreadsheetExporter, terra_client: Mock,
+                                                              project: MetadataResource, submission_uuid: str):
+    # given the metadata and descriptor of this version were staged by an earlier attempt
+    terra_client.write_links.side_effect = RuntimeError('links write problem')
+    terra_client.staging_object_crc32c.side_effect = lambda key: None if '/links/' in key else 'ChssPQ=='
+
+    # when
+    with pytest.raises(RuntimeError, match='links write problem'):
+        exporter.export_spreadsheet(project.uuid, submission_uuid)
+
+    # then
+    file_metadata = terra_client.write_metadata.call_args.args[0]
+    deleted = [call.args[0] for call in terra_client.delete_from_staging_bucket.call_args_list]
+    assert_that(deleted).contains_only(
+        TerraStorageClient.links_object_key(file_metadata.uuid, file_metadata.dcp_version, project.uuid)
+    )
+
+
+def test_unchanged_spreadsheet_is_not_regenerated(exporter: SpreadsheetExporter, terra_client: Mock,
+                                                   project: MetadataResource, submission_uuid: str,
+                                                   spreadsheet_dcp_version: str):
+    # given the spreadsheet of this submission version was exported and is still in the staging area
+    terra_client.read_file_descriptor.return_value = {'file_name': 'Test_Project_metadata_13-06-2022.xlsx', 'crc32c': '0a1b2c3d'}
+    terra_client.staging_object_crc32c.return_value = 'ChssPQ=='
+
+    # when
+    exporter.export_spreadsheet(project.uuid, submission_uuid)
+
+    # then
+    terra_client.read_file_descriptor.assert_called_once_with(
+        project.uuid, 'supplementary_file', SpreadsheetExporter.metadata_uuid(submission_uuid), '2022-06-13T14:32:59.593000Z'
+    )
+    terra_client.staging_object_crc32c.assert_called_once_with(f'{project.uuid}/data/Test_Project_metadata_13-06-2022.xlsx')
+    exporter.generator.write_workbook_from_submission.assert_not_called()
+    terra_client.write_metadata.assert_not_called()
+    terra_client.write_to_staging_bucket.assert_not_called()
+
+
+def test_spreadsheet_is_regenerated_when_staged_file_differs(exporter: SpreadsheetExporter, terra_client: Mock,
+                                                             project: MetadataResource, submission_uuid: str):
+    # given the staged spreadsheet was overwritten since this submission version was exported
+    terra_client.read_file_descriptor.return_value = {'file_name': 'Test_Project_metadata_13-06-2022.xlsx', 'crc32c': '0a1b2c3d'}
+    terra_client.staging_object_crc32c.return_value = 'AAAAAA=='
+
+    # when
+    unchanged = exporter.is_spreadsheet_unchanged(project.uuid, submission_uuid, '2022-06-13T14:32:59.593000Z')
+
+    # then
+    assert_that(unchanged).is_false()
+
+
 def test_spreadsheet_metadata_on_submission_update(initial_supplementary_file, supplementary_file_from_new_export):
     check_file_prefix_matches(initial_supplementary_file, supplementary_file_from_new_export)
     check_uuids_match(initial_supplementary_file, supplementary_file_from_new_export)
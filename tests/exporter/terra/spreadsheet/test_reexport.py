@@ -0,0 +1,135 @@
+import json
+import time
+from unittest.mock import Mock
+
+import pytest
+from assertpy import assert_that
+from hca_ingest.api.ingestapi import IngestApi
+
+from exporter.terra.spreadsheet.exporter import SpreadsheetExporter
+from exporter.terra.spreadsheet.reexport import CheckpointLedger, RateLimiter, ReexportSummary, ReexportTarget, \
+    SpreadsheetReexporter, query_targets, read_targets
+
+
+@pytest.fixture
+def targets():
+    return [ReexportTarget(f'submission-{index}', f'project-{index % 2}') for index in range(5)]
+
+
+@pytest.fixture
+def ledger(tmp_path) -> CheckpointLedger:
+    return CheckpointLedger(str(tmp_path / 'ledger.jsonl'))
+
+
+@pytest.fixture
+def exporter() -> Mock:
+    return Mock(spec=SpreadsheetExporter)
+
+
+def test_read_targets_skips_blank_and_comment_lines(tmp_path):
+    # given
+    path = tmp_path / 'targets.csv'
+    path.write_text('# submission, project\nsubmission-1, project-1\n\nsubmission-2 project-2\n')
+
+    # when
+    targets = read_targets(str(path))
+
+    # then
+    assert_that(targets).is_equal_to([
+        ReexportTarget('submission-1', 'project-1'),
+        ReexportTarget('submission-2', 'project-2')
+    ])
+
+
+def test_read_targets_rejects_incomplete_lines(tmp_path):
+    # given
+    path = tmp_path / 'targets.csv'
+    path.write_text('submission-1\n')
+
+    # expect
+    with pytest.raises(ValueError, match='line 1'):
+        read_targets(str(path))
+
+
+def test_query_targets_filters_submission_states():
+    # given
+    ingest_api = Mock(spec=IngestApi)
+    ingest_api.get_project_by_uuid.return_value = {'_links': {}}
+    ingest_api.get_related_entities.return_value = iter([
+        {'uuid': {'uuid': 'exported'}, 'submissionState': 'Exported'},
+        {'uuid': {'uuid': 'draft'}, 'submissionState': 'Draft'}
+    ])
+
+    # when
+    targets = query_targets(ingest_api, ['project'], ['Exported'])
+
+    # then
+    assert_that(targets).is_equal_to([ReexportTarget('exported', 'project')])
+
+
+def test_reexports_every_target_and_records_it(exporter, ledger, targets):
+    # when
+    summary = SpreadsheetReexporter(exporter, ledger, workers=3).run(targets)
+
+    # then
+    assert_that(exporter.export_spreadsheet.call_count).is_equal_to(len(targets))
+    assert_that(summary.exported).is_equal_to(len(targets))
+    assert_that(summary.remaining).is_zero()
+    assert_that(ledger.exported()).is_equal_to(set(targets))
+
+
+def test_resumes_from_ledger_and_retries_failures(exporter, ledger, targets):
+    # given a first run that failed for one target
+    def export_spreadsheet(project_uuid, submission_uuid):
+        if submission_uuid == 'submission-3':
+            raise RuntimeError('spreadsheet generation problem')
+    exporter.export_spreadsheet.side_effect = export_spreadsheet
+    first = SpreadsheetReexporter(exporter, ledger).run(targets)
+    exporter.reset_mock()
+    exporter.export_spreadsheet.side_effect = None
+
+    # when
+    second = SpreadsheetReexporter(exporter, ledger).run(targets)
+
+    # then
+    assert_that(first.failed).is_equal_to(1)
+    exporter.export_spreadsheet.assert_called_once_with('project-1', 'submission-3')
+    assert_that(second.skipped).is_equal_to(4)
+    assert_that(second.exported).is_equal_to(1)
+
+
+def test_ledger_ignores_partial_last_line(ledger, targets):
+    # given
+    ledger.record(targets[0], 'exported', 1.0)
+    with open(ledger.path, 'a') as ledger_file:
+        ledger_file.write(json.dumps({'submission_uuid': 'submission-1'})[:10])
+
+    # expect
+    assert_that(ledger.exported()).is_equal_to({targets[0]})
+
+
+def test_rate_limiter_spaces_calls_beyond_burst():
+    # given
+    limiter = RateLimiter(rate=50, burst=2)
+    calls = []
+    target = Mock()
+    target.get = lambda: calls.append(time.monotonic())
+    limiter.limit(target, 'get')
+
+    # when
+    for _ in range(6):
+        target.get()
+
+    # then four calls past the burst wait a fiftieth of a second each
+    assert_that(calls[-1] - calls[0]).is_greater_than_or_equal_to(4 / 50 * 0.9)
+
+
+def test_summary_estimates_time_remaining():
+    # given
+    summary = ReexportSummary(total=10, skipped=2, exported=3, failed=1, elapsed=3600)
+
+    # expect
+    assert_that(summary.remaining).is_equal_to(4)
+    assert_that(summary.per_hour).is_equal_to(4)
+    assert_that(summary.eta_seconds).is_equal_to(3600)
+    assert_that(str(summary)).contains('ETA 60.0 min')
@@ -0,0 +1,145 @@
+from tempfile import NamedTemporaryFile as TempFile
+
+import pytest
+from assertpy import assert_that
+from hca_ingest.downloader.downloader import XlsDownloader
+from hca_ingest.downloader.entity import Entity
+from hca_ingest.downloader.flattener import Flattener
+from openpyxl import load_workbook
+
+from exporter.terra.spreadsheet.workbook import StreamingWorkbookGenerator
+
+SCHEMA_BASE = 'https://schema.humancellatlas.org/type'
+
+
+def entity(entity_id: str, schema: str, content: dict) -> Entity:
+    return Entity({
+        'uuid': {'uuid': f'{entity_id}-uuid'},
+        '_links': {'self': {'href': f'https://api.ingest/entities/{entity_id}'}},
+        'content': {'describedBy': f'{SCHEMA_BASE}/{schema}', **content}
+    })
+
+
+@pytest.fixture
+def schemas() -> dict:
+    return {
+        f'{SCHEMA_BASE}/project/17.0.0/project': {
+            'required': ['project_core'],
+            'properties': {
+                'project_core': {
+                    'required': ['project_short_name'],
+                    'properties': {
+                        'project_short_name': {'user_friendly': 'Project label', 'example': 'CoolOrganProject'},
+                        'project_title': {'user_friendly': 'Project title', 'description': 'The title.'}
+                    }
+                },
+                'contributors': {
+                    'properties': {
+                        'name': {'user_friendly': 'Contact name', 'guidelines': 'Surname,GivenName'},
+                        'email': {'user_friendly': 'Email address'}
+                    }
+                }
+            }
+        },
+        f'{SCHEMA_BASE}/biomaterial/15.5.0/donor_organism': {
+            'properties': {
+                'biomaterial_core': {
+                    'required': ['biomaterial_id'],
+                    'properties': {'biomaterial_id': {'user_friendly': 'Biomaterial ID'}}
+                },
+                'sex': {'user_friendly': 'Biological sex'}
+            }
+        },
+        f'{SCHEMA_BASE}/biomaterial/10.4.0/specimen_from_organism': {
+            'properties': {
+                'biomaterial_core': {
+                    'properties': {'biomaterial_id': {'user_friendly': 'Biomaterial ID'}}
+                }
+            }
+        },
+        f'{SCHEMA_BASE}/protocol/biomaterial_collection/9.2.0/collection_protocol': {
+            'properties': {
+                'protocol_core': {
+                    'properties': {'protocol_id': {'user_friendly': 'Collection protocol ID'}}
+                }
+            }
+        },
+        f'{SCHEMA_BASE}/process/9.2.0/process': {}
+    }
+
+
+@pytest.fixture
+def entities() -> list:
+    project = entity('project', 'project/17.0.0/project', {
+        'project_core': {'project_short_name': 'Test_Project', 'project_title': 'A test project'},
+        'contributors': [
+            {'name': 'Doe,Jane', 'email': 'jane@example.com'},
+            {'name': 'Doe,John'}
+        ]
+    })
+    donors = [
+        entity(f'donor-{index}', 'biomaterial/15.5.0/donor_organism', {
+            'biomaterial_core': {'biomaterial_id': f'donor_{index}'},
+            **({'sex': 'female'} if index % 2 else {})
+        })
+        for index in range(3)
+    ]
+    protocol = entity('protocol', 'protocol/biomaterial_collection/9.2.0/collection_protocol', {
+        'protocol_core': {'protocol_id': 'collection_1'}
+    })
+    process = entity('process', 'process/9.2.0/process', {'process_core': {'process_id': 'process_1'}})
+    specimen = entity('specimen', 'biomaterial/10.4.0/specimen_from_organism', {
+        'biomaterial_core': {'biomaterial_id': 'specimen_1'}
+    })
+    specimen.set_input(input_biomaterials=donors[:2], process=process, protocols=[protocol])
+    return [*donors, specimen, project, protocol, process]
+
+
+def test_streamed_workbook_matches_in_memory_workbook(entities, schemas):
+    # given
+    with TempFile(suffix='.xlsx') as expected_file:
+        XlsDownloader.create_workbook(Flattener().flatten(entities, schemas)).save(expected_file.name)
+        expected = load_workbook(expected_file.name)
+
+    # when
+    with TempFile(suffix='.xlsx') as spreadsheet_file:
+        StreamingWorkbookGenerator(api=None).write_workbook(entities, schemas, spreadsheet_file.name)
+        actual = load_workbook(spreadsheet_file.name)
+
+    # then
+    assert_that(actual.sheetnames).is_equal_to(expected.sheetnames)
+    assert_that(actual.sheetnames[0]).is_equal_to('Project')
+    assert_that(actual.sheetnames[-1]).is_equal_to('Schemas')
+    for title in expected.sheetnames:
+        if title == 'Schemas':
+            continue
+        assert_that(cell_values(actual[title])).described_as(title).is_equal_to(cell_values(expected[title]))
+        assert_that(column_widths(actual[title])).described_as(title).is_equal_to(column_widths(expected[title]))
+        assert_same_header_styles(actual[title], expected[title])
+    assert_that(sorted(cell_values(actual['Schemas']))).is_equal_to(sorted(cell_values(expected['Schemas'])))
+
+
+def test_missing_schemas_raise_value_error(entities):
+    with TempFile(suffix='.xlsx') as spreadsheet_file:
+        with pytest.raises(ValueError):
+            StreamingWorkbookGenerator(api=None).write_workbook(entities, {}, spreadsheet_file.name)
+
+
+def cell_values(worksheet) -> list:
+    return [list(row) for row in worksheet.iter_rows(values_only=True)]
+
+
+def column_widths(worksheet) -> dict:
+    return {letter: dimension.width for letter, dimension in worksheet.column_dimensions.items()}
+
+
+def assert_same_header_styles(actual, expected):
+    for row in range(1, 6):
+        for column in range(1, expected.max_column + 1):
+            actual_cell, expected_cell = actual.cell(row, column), expected.cell(row, column)
+            if expected_cell.value is None:
+                continue
+            assert_that(repr(actual_cell.font)).is_equal_to(repr(expected_cell.font))
+            assert_that(repr(actual_cell.fill)).is_equal_to(repr(expected_cell.fill))
+            assert_that(repr(actual_cell.alignment)).is_equal_to(repr(expected_cell.alignment))
+            assert_that(repr(actual_cell.protection)).is_equal_to(repr(expected_cell.protection))
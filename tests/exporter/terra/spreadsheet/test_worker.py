@@ -0,0 +1,64 @@
+import hashlib
+import threading
+import time
+from concurrent.futures import Executor
+from unittest.mock import Mock
+
+import pytest
+from assertpy import assert_that
+
+from exporter.terra.spreadsheet import worker
+from exporter.terra.spreadsheet.workbook import StreamingWorkbookGenerator
+from exporter.terra.spreadsheet.worker import build_spreadsheet, build_spreadsheet_in_worker, shutdown_process_pool
+
+
+def test_build_spreadsheet_returns_checksums_of_written_file(tmp_path):
+    # given
+    path = str(tmp_path / 'spreadsheet.xlsx')
+    generator = Mock(spec=StreamingWorkbookGenerator)
+    generator.write_workbook_from_submission.side_effect = lambda _, file_path: open(file_path, 'wb').write(b'workbook')
+
+    # when
+    digest = build_spreadsheet(generator, 'submission-uuid', path)
+
+    # then
+    generator.write_workbook_from_submission.assert_called_once_with('submission-uuid', path)
+    assert_that(digest.size).is_equal_to(len(b'workbook'))
+    assert_that(digest.checksums.sha256).is_equal_to(hashlib.sha256(b'workbook').hexdigest())
+    assert_that(digest.checksums.s3_etag).is_equal_to('n/a - not in s3')
+
+
+def test_build_in_uninitialised_worker_raises(tmp_path, monkeypatch):
+    # given
+    monkeypatch.setattr(worker, '_generator', None)
+
+    # expect
+    with pytest.raises(RuntimeError):
+        build_spreadsheet_in_worker('submission-uuid', str(tmp_path / 'spreadsheet.xlsx'))
+
+
+def test_process_pool_shutdown_cancels_queued_builds_at_the_deadline():
+    # given a pool still building spreadsheets
+    release = threading.Event()
+    process_pool = Mock(spec=Executor)
+    process_pool.shutdown.side_effect = lambda wait=True, cancel_futures=False: wait and release.wait(5)
+
+    # when
+    start = time.monotonic()
+    shutdown_process_pool(process_pool, 0.1)
+
+    # then
+    assert_that(time.monotonic() - start).is_less_than(1)
+    process_pool.shutdown.assert_called_with(wait=False, cancel_futures=True)
+    release.set()
+
+
+def test_process_pool_shutdown_waits_for_builds_within_the_deadline():
+    # given
+    process_pool = Mock(spec=Executor)
+
+    # when
+    shutdown_process_pool(process_pool, 5)
+
+    # then
+    process_pool.shutdown.assert_called_once_with()
@@ -4,11 +4,20 @@ from unittest.mock import MagicMock
 
 from google.cloud.pubsub_v1 import SubscriberClient
 
+from exporter.metadata.checksums import FileChecksums
+from exporter.metadata.datafile import DataFile
+from exporter.terra.gcs.storage import GcsStorage
 from exporter.terra.gcs.transfer import GcsTransfer
 from exporter.terra.gcs.transfer_job import TransferJob
+from exporter.terra.gcs.transfer_shards import TransferJobName
 from exporter.terra.transfer import TerraTransferClient
 
 
+def data_file(file_name: str, crc32c: str = '0000abcd') -> DataFile:
+    return DataFile(str(uuid.uuid4()), 'version', file_name, f's3://bucket/key/{file_name}', 'application/gzip', 1024,
+                    FileChecksums('sha256', crc32c, 'sha1', 's3_etag'))
+
+
 class TestTerraTransferClient(unittest.TestCase):
     def setUp(self) -> None:
         self.mock_gcs_start = MagicMock()
@@ -57,6 +66,140 @@ class TestTerraTransferClient(unittest.TestCase):
         # Then
         self.mock_gcs_start.assert_called_once_with(test_job)
 
+    def test_large_transfer_is_sharded(self):
+        # Given
+        upload_area = "s3fake://bucket/key"
+        project_uuid = str(uuid.uuid4())
+        export_job_id = str(uuid.uuid4())
+        files = [data_file(f'file_{i}.fastq.gz') for i in range(10)]
+        terra = TerraTransferClient(
+            self.mock_gcs, 'aws_id', 'aws_secret', 'gcs_project', 'gcs_bucket', 'prefix', 'topic',
+            shards=3, shard_threshold=5
+        )
+
+        # When
+        terra.transfer_data_files(upload_area, project_uuid, export_job_id, files)
+
+        # Then
+        jobs = [call.args[0] for call in self.mock_gcs_start.call_args_list]
+        self.assertEqual(
+            [f'transferJobs/{export_job_id}-shard-{i}-of-3' for i in range(1, 4)],
+            [job.name for job in jobs]
+        )
+        self.assertEqual(sorted(file.file_name for file in files), sorted(prefix for job in jobs for prefix in job.include_prefixes))
+        for job in jobs:
+            self.assertEqual(
+                job.include_prefixes,
+                job.to_dict()['transferSpec']['objectConditions']['includePrefixes']
+            )
+
+    def test_other_shard_statuses_exclude_notifying_shard(self):
+        # Given
+        export_job_id = str(uuid.uuid4())
+        terra = TerraTransferClient(self.mock_gcs, 'aws_id', 'aws_secret', 'gcs_project', 'gcs_bucket', 'prefix', 'topic')
+        terra.status_tracker = MagicMock()
+        other_shard = MagicMock(done=True)
+        terra.status_tracker.job_statuses.return_value = {'transferJobs/other': other_shard}
+
+        # When
+        statuses = terra.other_shard_statuses(TransferJobName(export_job_id, 2, 3))
+
+        # Then
+        self.assertEqual([other_shard], statuses)
+        terra.status_tracker.job_statuses.assert_called_once_with([
+            f'transferJobs/{export_job_id}-shard-1-of-3', f'transferJobs/{export_job_id}-shard-3-of-3'
+        ])
+
+    def test_small_transfer_is_not_sharded(self):
+        # Given
+        export_job_id = str(uuid.uuid4())
+        terra = TerraTransferClient(
+            self.mock_gcs, 'aws_id', 'aws_secret', 'gcs_project', 'gcs_bucket', 'prefix', 'topic',
+            shards=3, shard_threshold=5
+        )
+
+        # When
+        terra.transfer_data_files("s3fake://bucket/key", str(uuid.uuid4()), export_job_id, [data_file('file.fastq.gz')])
+
+        # Then
+        job = self.mock_gcs_start.call_args.args[0]
+        self.assertEqual(f'transferJobs/{export_job_id}', job.name)
+        self.assertNotIn('objectConditions', job.to_dict()['transferSpec'])
+
+    def test_delta_transfer_includes_only_changed_files(self):
+        # Given
+        export_job_id = str(uuid.uuid4())
+        project_uuid = str(uuid.uuid4())
+        unchanged, changed, new = data_file('unchanged.fastq.gz'), data_file('changed.fastq.gz'), data_file('new.fastq.gz')
+        mock_storage = MagicMock(spec=GcsStorage)
+        mock_storage.list_crc32c.return_value = {
+            'unchanged.fastq.gz': unchanged.checksums.crc32c_base64(),
+            'changed.fastq.gz': 'AAAAAA=='
+        }
+        terra = TerraTransferClient(
+            self.mock_gcs, 'aws_id', 'aws_secret', 'gcs_project', 'gcs_bucket', 'prefix', 'topic',
+            delta=True, gcs_storage=mock_storage
+        )
+
+        # When
+        started = terra.transfer_data_files("s3fake://bucket/key", project_uuid, export_job_id, [unchanged, changed, new])
+
+        # Then
+        self.assertTrue(started)
+        mock_storage.list_crc32c.assert_called_once_with('gcs_bucket', f'prefix/{project_uuid}/data/')
+        job = self.mock_gcs_start.call_args.args[0]
+        self.assertEqual(f'transferJobs/{export_job_id}', job.name)
+        self.assertEqual(['changed.fastq.gz', 'new.fastq.gz'], job.include_prefixes)
+
+    def test_small_delta_transfer_runs_in_one_job(self):
+        # Given
+        export_job_id = str(uuid.uuid4())
+        files = [data_file(f'file_{i}.fastq.gz') for i in range(10)]
+        terra = TerraTransferClient(
+            self.mock_gcs, 'aws_id', 'aws_secret', 'gcs_project', 'gcs_bucket', 'prefix', 'topic',
+            shards=4, shard_threshold=100, delta=True
+        )
+
+        # When
+        started = terra.transfer_data_files("s3fake://bucket/key", str(uuid.uuid4()), export_job_id, files)
+
+        # Then
+        self.assertEqual([f'transferJobs/{export_job_id}'], started)
+        job = self.mock_gcs_start.call_args.args[0]
+        self.assertEqual(sorted(file.file_name for file in files), job.include_prefixes)
+
+    def test_large_delta_transfer_is_sharded(self):
+        # Given
+        export_job_id = str(uuid.uuid4())
+        files = [data_file(f'file_{i}.fastq.gz') for i in range(10)]
+        terra = TerraTransferClient(
+            self.mock_gcs, 'aws_id', 'aws_secret', 'gcs_project', 'gcs_bucket', 'prefix', 'topic',
+            shards=4, shard_threshold=5, delta=True
+        )
+
+        # When
+        started = terra.transfer_data_files("s3fake://bucket/key", str(uuid.uuid4()), export_job_id, files)
+
+        # Then
+        self.assertEqual([f'transferJobs/{export_job_id}-shard-{i}-of-4' for i in range(1, 5)], started)
+
+    def test_delta_transfer_without_changes(self):
+        # Given
+        unchanged = data_file('unchanged.fastq.gz')
+        mock_storage = MagicMock(spec=GcsStorage)
+        mock_storage.list_crc32c.return_value = {'unchanged.fastq.gz': unchanged.checksums.crc32c_base64()}
+        terra = TerraTransferClient(
+            self.mock_gcs, 'aws_id', 'aws_secret', 'gcs_project', 'gcs_bucket', 'prefix', 'topic',
+            delta=True, gcs_storage=mock_storage
+        )
+
+        # When
+        started = terra.transfer_data_files("s3fake://bucket/key", str(uuid.uuid4()), str(uuid.uuid4()), [unchanged])
+
+        # Then
+        self.assertFalse(started)
+        self.mock_gcs_start.assert_not_called()
+
     def test_topic_is_expanded(self):
         # Given
         project = 'project'
@@ -101,6 +101,18 @@ def test_happy_path(mock_ingest, handler, body, message, job, project_uuid, subm
     message.ack.assert_called_once()
 
 
+def test_nothing_to_transfer(mock_ingest, handler, body, message, job):
+    # Given
+    handler.submission_exporter.start_data_file_transfer.return_value = False
+
+    # When
+    handler.handle_message(body, message)
+
+    # Then
+    mock_ingest.set_data_file_transfer.assert_called_once_with(job.job_id, ExportContextState.COMPLETE)
+    message.ack.assert_called_once()
+
+
 def test_missing_job_or_submission(mock_ingest, handler, body, message, job_without_submission):
     # When
     handler.handle_message(body, message)
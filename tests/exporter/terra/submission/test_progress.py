@@ -0,0 +1,82 @@
+from unittest.mock import Mock
+
+import pytest
+from assertpy import assert_that
+
+from exporter.ingest.service import IngestService
+from exporter.terra.gcs.transfer_status import TransferStatusTracker, TransferStatus, TransferCounters
+from exporter.terra.submission.progress import TransferProgressMonitor
+
+
+def status(job_name: str, bytes_copied: int, done: bool = False) -> TransferStatus:
+    counters = TransferCounters(objects_found=10, bytes_found=1000, objects_copied=bytes_copied // 100,
+                                bytes_copied=bytes_copied)
+    return TransferStatus(job_name, operations=1, done=done, counters=counters)
+
+
+@pytest.fixture
+def tracker():
+    return Mock(spec=TransferStatusTracker)
+
+
+@pytest.fixture
+def mock_ingest():
+    return Mock(spec=IngestService)
+
+
+@pytest.fixture
+def monitor(tracker, mock_ingest):
+    monitor = TransferProgressMonitor(tracker, mock_ingest, interval=60, write_to_job=True, smoothing=1)
+    yield monitor
+    monitor.stop()
+
+
+def test_progress_adds_up_shards(monitor, tracker):
+    # given
+    tracker.status.side_effect = lambda job_name: status(job_name, 200)
+    monitor.watch('job', ['transferJobs/job-shard-1-of-2', 'transferJobs/job-shard-2-of-2'])
+
+    # when
+    progress = monitor.progress('job')
+
+    # then
+    assert_that(progress.bytes_found).is_equal_to(2000)
+    assert_that(progress.bytes_copied).is_equal_to(400)
+    assert_that(progress.objects_copied).is_equal_to(4)
+    assert_that(progress.done).is_false()
+
+
+def test_rate_and_estimated_completion(monitor, tracker):
+    # given
+    tracker.status.return_value = status('transferJobs/job', 0)
+    monitor.watch('job', ['transferJobs/job'])
+    monitor.progress('job')
+    monitor.watched['job'].last_sample -= 10
+
+    # when
+    tracker.status.return_value = status('transferJobs/job', 500)
+    progress = monitor.progress('job')
+
+    # then
+    assert_that(progress.bytes_per_second).is_close_to(50, 1)
+    assert_that(progress.eta_seconds).is_close_to(10, 1)
+
+
+def test_report_writes_progress_to_job_and_forgets_done_jobs(monitor, tracker, mock_ingest):
+    # given
+    tracker.status.return_value = status('transferJobs/job', 1000, done=True)
+    monitor.watch('job', ['transferJobs/job'])
+
+    # when
+    monitor.report()
+
+    # then
+    mock_ingest.set_data_file_transfer_progress.assert_called_once()
+    job_id, progress = mock_ingest.set_data_file_transfer_progress.call_args.args
+    assert_that(job_id).is_equal_to('job')
+    assert_that(progress).contains_entry({'bytes_copied': 1000}, {'done': True})
+    assert_that(monitor.progress('job')).is_none()
+
+
+def test_unknown_job_has_no_progress(monitor):
+    assert_that(monitor.progress('unknown')).is_none()
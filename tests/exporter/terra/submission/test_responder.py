@@ -1,6 +1,6 @@
 import uuid
 import pytest
-from unittest.mock import Mock
+from unittest.mock import MagicMock, Mock
 
 from google.cloud.pubsub_v1 import SubscriberClient
 from google.cloud.pubsub_v1.subscriber.message import Message
@@ -8,13 +8,23 @@ from google.cloud.pubsub_v1.subscriber.message import Message
 from exporter.ingest.export_job import ExportContextState, ExportJob
 from exporter.ingest.service import IngestService
 from exporter.session_context import SessionContext
+from exporter.terra.gcs.transfer_status import TransferStatus
+from exporter.terra.submission import responder as responder_module
 from exporter.terra.submission.responder import TerraTransferResponder
+from exporter.terra.transfer import TerraTransferClient
 
 
 class MockTerraTransferResponder(TerraTransferResponder):
     # Not calling superclass to skip loading Credentials
-    def __init__(self, ingest_service: IngestService, gcp_project: str, gcp_topic: str):
+    def __init__(self, ingest_service: IngestService, gcp_project: str, gcp_topic: str,
+                 transfer_client: TerraTransferClient = None):
         self.ingest = ingest_service
+        self.transfer_client = transfer_client
+        self.flow_control = None
+        self.callback_threads = 1
+        self.min_backoff = 2
+        self.max_backoff = 8
+        self.shard_wait = 60
         self.subscription_path = SubscriberClient.subscription_path(gcp_project, gcp_topic)
         self.topic_path = SubscriberClient.topic_path(gcp_project, gcp_topic)
         self.logger = SessionContext.register_logger(__name__)
@@ -79,8 +89,13 @@ def mock_ingest():
 
 
 @pytest.fixture
-def responder(mock_ingest, gcp_project, gcp_topic):
-    return MockTerraTransferResponder(mock_ingest, gcp_project, gcp_topic)
+def mock_transfer_client():
+    return Mock(spec=TerraTransferClient)
+
+
+@pytest.fixture
+def responder(mock_ingest, gcp_project, gcp_topic, mock_transfer_client):
+    return MockTerraTransferResponder(mock_ingest, gcp_project, gcp_topic, mock_transfer_client)
 
 
 @pytest.fixture
@@ -93,6 +108,16 @@ def message(export_job_id):
     return msg
 
 
+@pytest.fixture
+def shard_message(export_job_id):
+    msg = Mock(spec=Message)
+    msg.attributes = {
+        "eventType": "TRANSFER_OPERATION_SUCCESS",
+        "transferJobName": f'transferJobs/{export_job_id}-shard-2-of-3'
+    }
+    return msg
+
+
 @pytest.fixture(params=[
     {},
     {"eventType": "TRANSFER_OPERATION_SUCCESS"},
@@ -159,3 +184,80 @@ def test_message_for_completed_job(responder, message, mock_ingest, complete_job
 
     mock_ingest.set_data_file_transfer.assert_not_called()
     message.nack.assert_not_called()
+
+
+def test_last_shard_completes_data_transfer(responder, shard_message, mock_ingest, mock_transfer_client, job: ExportJob):
+    # Given
+    mock_transfer_client.other_shard_statuses.return_value = [
+        TransferStatus('transferJobs/shard-1', operations=1, done=True),
+        TransferStatus('transferJobs/shard-2', operations=1, done=True)
+    ]
+
+    # When
+    responder.handle_message(shard_message)
+
+    # Then
+    mock_ingest.get_job_if_exists.assert_called_once_with(job.job_id)
+    group = mock_transfer_client.other_shard_statuses.call_args.args[0]
+    assert group.shard_count == 3
+    mock_ingest.set_data_file_transfer.assert_called_once_with(job.job_id, ExportContextState.COMPLETE)
+    shard_message.ack.assert_called_once()
+
+
+def test_shard_waits_for_other_shards(responder, shard_message, mock_ingest, mock_transfer_client, job: ExportJob):
+    # Given
+    mock_transfer_client.other_shard_statuses.return_value = [
+        TransferStatus('transferJobs/shard-1', operations=1, done=True),
+        TransferStatus('transferJobs/shard-2', operations=1, done=False)
+    ]
+
+    # When
+    responder.handle_message(shard_message)
+
+    # Then
+    mock_ingest.set_data_file_transfer.assert_not_called()
+    shard_message.modify_ack_deadline.assert_called_once_with(60)
+    shard_message.drop.assert_called_once()
+    shard_message.nack.assert_not_called()
+    shard_message.ack.assert_not_called()
+
+
+def test_failed_shard_fails_export_job(responder, shard_message, mock_ingest, mock_transfer_client, job: ExportJob):
+    # Given the operations of a failed shard are done as well
+    mock_transfer_client.other_shard_statuses.return_value = [
+        TransferStatus('transferJobs/shard-1', operations=1, done=True, failed=True),
+        TransferStatus('transferJobs/shard-2', operations=1, done=True)
+    ]
+
+    # When
+    responder.handle_message(shard_message)
+
+    # Then
+    mock_ingest.set_data_file_transfer.assert_not_called()
+    mock_ingest.fail_job.assert_called_once_with(job.job_id)
+    shard_message.ack.assert_called_once()
+    shard_message.nack.assert_not_called()
+
+
+def test_listen_backs_off_between_reconnects(responder, monkeypatch):
+    # Given
+    failed_stream = Mock()
+    failed_stream.done.return_value = True
+    failed_stream.result.side_effect = RuntimeError('stream closed')
+    subscriber_client = MagicMock()
+    subscriber_client.return_value.__enter__.return_value.subscribe.return_value = failed_stream
+    monkeypatch.setattr(responder_module, 'SubscriberClient', subscriber_client)
+
+    backoffs = []
+    responder.stopping = Mock()
+    responder.stopping.wait.side_effect = lambda timeout: backoffs.append(timeout) if timeout != 1 else False
+    responder.stopping.is_set.side_effect = lambda: len(backoffs) >= 4
+
+    # When
+    responder.listen()
+
+    # Then
+    assert backoffs == [2, 4, 8, 8]
+    assert failed_stream.cancel.call_count == 4
+    subscribe_kwargs = subscriber_client.return_value.__enter__.return_value.subscribe.call_args.kwargs
+    assert subscribe_kwargs['scheduler'] is not None
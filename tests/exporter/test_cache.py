@@ -0,0 +1,111 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+import pytest
+from assertpy import assert_that
+
+from exporter.cache import SingleFlightTtlCache
+
+
+@pytest.fixture
+def cache() -> SingleFlightTtlCache:
+    return SingleFlightTtlCache(ttl=60)
+
+
+def test_value_is_loaded_once(cache):
+    # given
+    loader = Mock(return_value='value')
+
+    # when
+    first = cache.get('key', loader)
+    second = cache.get('key', loader)
+
+    # then
+    assert_that(first).is_equal_to('value')
+    assert_that(second).is_equal_to('value')
+    loader.assert_called_once()
+
+
+def test_concurrent_misses_share_one_load(cache):
+    # given
+    release = threading.Event()
+    calls = []
+
+    def slow_loader():
+        calls.append(1)
+        release.wait(5)
+        return 'value'
+
+    # when
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(cache.get, 'key', slow_loader) for _ in range(8)]
+        time.sleep(0.1)
+        release.set()
+        results = [f.result() for f in futures]
+
+    # then
+    assert_that(results).is_equal_to(['value'] * 8)
+    assert_that(calls).is_length(1)
+
+
+def test_none_is_not_cached(cache):
+    # given
+    loader = Mock(side_effect=[None, 'value'])
+
+    # when
+    first = cache.get('key', loader)
+    second = cache.get('key', loader)
+
+    # then
+    assert_that(first).is_none()
+    assert_that(second).is_equal_to('value')
+
+
+def test_failed_load_is_not_cached(cache):
+    # given
+    loader = Mock(side_effect=[RuntimeError('unavailable'), 'value'])
+
+    # when
+    with pytest.raises(RuntimeError):
+        cache.get('key', loader)
+
+    # then
+    assert_that(cache.get('key', loader)).is_equal_to('value')
+
+
+def test_invalidate(cache):
+    # given
+    cache.get('key', lambda: 'old')
+
+    # when
+    cache.invalidate('key')
+
+    # then
+    assert_that(cache.get('key', lambda: 'new')).is_equal_to('new')
+
+
+def test_put_replaces_value(cache):
+    # given
+    cache.get('key', lambda: 'old')
+
+    # when
+    cache.put('key', 'new')
+
+    # then
+    assert_that(cache.get('key', lambda: 'unused')).is_equal_to('new')
+
+
+def test_load_in_flight_during_invalidation_is_not_cached(cache):
+    # given
+    def loader():
+        cache.invalidate('key')
+        return 'stale'
+
+    # when
+    value = cache.get('key', loader)
+
+    # then
+    assert_that(value).is_equal_to('stale')
+    assert_that(cache.get('key', lambda: 'fresh')).is_equal_to('fresh')
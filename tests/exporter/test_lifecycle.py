@@ -0,0 +1,74 @@
+import threading
+from unittest.mock import Mock
+
+from assertpy import assert_that
+
+from exporter.lifecycle import LifecycleManager
+
+
+def test_shutdown_stops_workers_before_flushing():
+    # given
+    calls = []
+    stopped = threading.Event()
+    worker = threading.Thread(target=lambda: (stopped.wait(5), calls.append('worker exited')))
+    worker.start()
+    lifecycle = LifecycleManager(drain_timeout=5)
+    lifecycle.add_worker('worker', worker, lambda timeout: (calls.append('stop'), stopped.set()))
+    lifecycle.add_flush('publisher', lambda timeout: calls.append('flush publisher'))
+    lifecycle.add_flush('export jobs', lambda timeout: calls.append('flush export jobs'))
+
+    # when
+    lifecycle.shutdown()
+
+    # then
+    assert_that(calls).is_equal_to(['stop', 'worker exited', 'flush publisher', 'flush export jobs'])
+
+
+def test_shutdown_does_not_wait_past_the_deadline():
+    # given
+    release = threading.Event()
+    worker = threading.Thread(target=lambda: release.wait(5))
+    worker.start()
+    flush = Mock()
+    lifecycle = LifecycleManager(drain_timeout=0.1)
+    lifecycle.add_worker('stuck worker', worker, Mock())
+    lifecycle.add_flush('publisher', flush)
+
+    # when
+    lifecycle.shutdown()
+
+    # then
+    assert_that(worker.is_alive()).is_true()
+    flush.assert_called_once_with(0)
+    release.set()
+
+
+def test_failing_step_does_not_stop_shutdown():
+    # given
+    flush = Mock()
+    lifecycle = LifecycleManager(drain_timeout=5)
+    lifecycle.add_flush('failing', Mock(side_effect=RuntimeError('unavailable')))
+    lifecycle.add_flush('publisher', flush)
+
+    # when
+    lifecycle.shutdown()
+
+    # then
+    flush.assert_called_once()
+
+
+def test_run_until_stopped_returns_when_stop_requested():
+    # given
+    lifecycle = LifecycleManager(drain_timeout=5)
+    worker = threading.Thread(target=lambda: lifecycle.stop_requested.wait(5))
+    worker.start()
+    stop = Mock()
+    lifecycle.add_worker('worker', worker, stop)
+    lifecycle.install_signal_handlers = Mock()
+
+    # when
+    threading.Timer(0.1, lifecycle.stop_requested.set).start()
+    lifecycle.run_until_stopped(poll_interval=0.05)
+
+    # then
+    stop.assert_called_once()
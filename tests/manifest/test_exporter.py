@@ -1,3 +1,4 @@
+import json
 from unittest import TestCase
 
 from hca_ingest.api.ingestapi import IngestApi
@@ -21,16 +22,38 @@ class TestExporter(TestCase):
         # given:
         generator = MagicMock(spec=ManifestGenerator)
         exporter = ManifestExporter(self.ingest, generator)
-        generated_manifest = self.files.get_entity('bundleManifests', 'generated-manifest')
-        generator.generate_manifest = MagicMock(return_value=generated_manifest)
+        generated_manifest = json.dumps(self.files.get_entity('bundleManifests', 'generated-manifest'))
+        generator.generate_manifest_json = MagicMock(return_value=generated_manifest)
 
         # and:
         submitted_manifest = self.files.get_entity('bundleManifests', 'mock-input-manifest')
-        exporter.ingest_api.create_bundle_manifest = MagicMock(return_value=submitted_manifest)
+        exporter.create_bundle_manifest = MagicMock(return_value=submitted_manifest)
 
         # when:
         exporter.export(process_uuid='process-uuid', submission_uuid='submission-uuid')
 
         # then:
-        exporter.manifest_generator.generate_manifest.assert_called_with('process-uuid', 'submission-uuid')
-        exporter.ingest_api.create_bundle_manifest.assert_called_with(generated_manifest)
+        exporter.manifest_generator.generate_manifest_json.assert_called_with('process-uuid', 'submission-uuid')
+        exporter.create_bundle_manifest.assert_called_with(generated_manifest)
+
+    def test_create_bundle_manifest_posts_json_to_looked_up_link(self):
+        # given:
+        exporter = ManifestExporter(self.ingest, MagicMock(spec=ManifestGenerator))
+        generated_manifest = json.dumps(self.files.get_entity('bundleManifests', 'generated-manifest'))
+
+        # and:
+        exporter.ingest_api.url = 'http://mock-ingest-api'
+        exporter.ingest_api.get_link_from_resource_url = MagicMock(
+            return_value='http://mock-ingest-api/bundleManifests{?page,size,sort}')
+        exporter.ingest_api.get_headers = MagicMock(return_value={'Content-type': 'application/json'})
+        exporter.ingest_api.post = MagicMock()
+
+        # when:
+        exporter.create_bundle_manifest(generated_manifest)
+        exporter.create_bundle_manifest(generated_manifest)
+
+        # then:
+        exporter.ingest_api.get_link_from_resource_url.assert_called_once_with('http://mock-ingest-api', 'bundleManifests')
+        exporter.ingest_api.post.assert_called_with('http://mock-ingest-api/bundleManifests',
+                                                    data=generated_manifest.encode('utf-8'),
+                                                    headers={'Content-type': 'application/json'})
@@ -1,3 +1,4 @@
+import json
 from unittest import TestCase
 
 from hca_ingest.api.ingestapi import IngestApi
@@ -6,6 +7,7 @@ from mock import MagicMock
 from exporter.graph.crawler import GraphCrawler
 from exporter.metadata.service import MetadataService
 from manifest.generator import ManifestGenerator
+from manifest.manifests import AssayManifestBuilder
 from tests.mocks.files import MockEntityFiles
 from tests.mocks.ingest import MockIngestAPI
 
@@ -30,3 +32,40 @@ class TestGenerator(TestCase):
 
         # then:
         self.assertEqual(example_manifest, actual_manifest.__dict__)
+
+    def test_generate_manifest_json(self):
+        # given:
+        generator = ManifestGenerator(ingest_client=self.ingest,
+                                      graph_crawler=GraphCrawler(MetadataService(self.ingest)))
+        manifest = generator.generate_manifest(process_uuid='mock-assay-process', submission_uuid='mock-submission')
+
+        # when:
+        manifest_json = generator.generate_manifest_json(process_uuid='mock-assay-process',
+                                                         submission_uuid='mock-submission')
+
+        # then:
+        self.assertEqual(json.dumps(manifest.__dict__), manifest_json)
+
+    def test_manifest_json_escapes_non_ascii_like_json_dumps(self):
+        # given:
+        builder = AssayManifestBuilder('envelope-\u00e9')
+        builder.add_data_files(['data-file-\u2603'])
+        builder.add_uuids('project', ['project-\u00fc'])
+
+        # when:
+        manifest_json = builder.to_json()
+
+        # then:
+        self.assertEqual(json.dumps(builder.build().__dict__), manifest_json)
+
+    def test_manifest_json_without_envelope_uuid_is_null(self):
+        # given:
+        builder = AssayManifestBuilder()
+        builder.add_data_files(['data-file-uuid'])
+
+        # when:
+        manifest_json = builder.to_json()
+
+        # then:
+        self.assertEqual(json.dumps(builder.build().__dict__), manifest_json)
+        self.assertIsNone(json.loads(manifest_json)['envelopeUuid'])
@@ -1,6 +1,8 @@
 import datetime
 import json
+import threading
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from unittest import TestCase
 from mock import MagicMock
 from manifest.receiver import ManifestReceiver
@@ -86,3 +88,120 @@ class TestReceiver(TestCase):
         mock_exporter.export.assert_called_with(submission_uuid='submission-uuid', process_uuid='doc-uuid')
         message.reject.assert_called_once_with(requeue=False)
         create_receiver.notify_state_tracker.assert_not_called()
+
+    def test_manifest_receiver_acks_worker_messages_on_consuming_thread(self):
+        # given
+        mock_exporter = MagicMock()
+        executor = ThreadPoolExecutor(max_workers=2)
+        publisher = MagicMock()
+        receiver = ManifestReceiver(MagicMock(), MagicMock(), mock_exporter, MagicMock(),
+                                    publisher=publisher, executor=executor, prefetch_count=2)
+        message = MagicMock(name='message')
+
+        # when
+        receiver.on_message(self.create_message_body, message).result(5)
+
+        # then
+        mock_exporter.export.assert_called_with(submission_uuid='submission-uuid', process_uuid='doc-uuid')
+        receiver.publish_config.send_message.assert_called_once_with(publisher, json.loads(self.create_message_body))
+        message.ack.assert_not_called()
+
+        # when
+        receiver.on_iteration()
+
+        # then
+        message.ack.assert_called_once()
+        executor.shutdown()
+
+    def test_manifest_receiver_rejects_worker_messages_on_consuming_thread(self):
+        # given
+        mock_exporter = MagicMock()
+        mock_exporter.export.side_effect = Exception('unhandled exception')
+        executor = ThreadPoolExecutor(max_workers=2)
+        receiver = ManifestReceiver(MagicMock(), MagicMock(), mock_exporter, MagicMock(), executor=executor)
+        receiver.notify_state_tracker = MagicMock()
+        message = MagicMock(name='message')
+
+        # when
+        receiver.on_message(self.create_message_body, message).result(5)
+        receiver.on_iteration()
+
+        # then
+        message.reject.assert_called_once_with(requeue=False)
+        message.ack.assert_not_called()
+        receiver.notify_state_tracker.assert_not_called()
+        executor.shutdown()
+
+    def test_manifest_receiver_rejects_malformed_worker_messages(self):
+        # given
+        mock_exporter = MagicMock()
+        executor = ThreadPoolExecutor(max_workers=2)
+        receiver = ManifestReceiver(MagicMock(), MagicMock(), mock_exporter, MagicMock(), executor=executor)
+        messages = [MagicMock(name='malformed'), MagicMock(name='incomplete')]
+
+        # when
+        receiver.on_message('{"documentUuid": ', messages[0]).result(5)
+        receiver.on_message('{"documentUuid": "doc-uuid"}', messages[1]).result(5)
+        receiver.on_iteration()
+
+        # then
+        for message in messages:
+            message.reject.assert_called_once_with(requeue=False)
+            message.ack.assert_not_called()
+        mock_exporter.export.assert_not_called()
+        executor.shutdown()
+
+    def test_manifest_receiver_drains_in_flight_messages_before_closing(self):
+        # given
+        release = threading.Event()
+        mock_exporter = MagicMock()
+        mock_exporter.export.side_effect = lambda **_: release.wait(5)
+        executor = ThreadPoolExecutor(max_workers=2)
+        receiver = ManifestReceiver(MagicMock(), MagicMock(), mock_exporter, MagicMock(),
+                                    publisher=MagicMock(), executor=executor)
+        messages = [MagicMock(name=f'message-{i}') for i in range(2)]
+        for message in messages:
+            receiver.on_message(self.create_message_body, message)
+
+        # when
+        threading.Timer(0.1, release.set).start()
+        drained = receiver.drain(5)
+
+        # then
+        self.assertTrue(drained)
+        for message in messages:
+            message.ack.assert_called_once()
+        self.assertEqual(len(receiver.in_flight), 0)
+        executor.shutdown()
+
+    def test_manifest_receiver_consumes_with_prefetch_count(self):
+        # given
+        consumer = MagicMock()
+        receiver = ManifestReceiver(MagicMock(), MagicMock(), MagicMock(), MagicMock(), prefetch_count=4)
+
+        # when
+        receiver.get_consumers(consumer, MagicMock())
+
+        # then
+        consumer.assert_called_once_with(queues=receiver.queues, callbacks=[receiver.on_message], prefetch_count=4)
+
+    def test_manifest_receiver_acks_once_state_tracker_notified(self):
+        # given
+        receiver = ManifestReceiver(MagicMock(), MagicMock(), MagicMock(), MagicMock(), publisher=MagicMock())
+        published = Future()
+        receiver.publish_config.send_message.return_value = published
+        message = MagicMock(name='message')
+
+        # when
+        receiver.on_message(self.create_message_body, message)
+
+        # then
+        message.ack.assert_not_called()
+
+        # when
+        published.set_exception(ConnectionError('broker unavailable'))
+
+        # then
+        message.reject.assert_called_once_with(requeue=False)
+        message.ack.assert_not_called()
+        self.assertEqual(len(receiver.in_flight), 0)